@@ -1,26 +1,37 @@
+import asyncio
 import json
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
+from tools.result_store import get_result_store
+from tracing.tracer import span
 from tools.tool_base import ToolRegistry, Tool
 
-# Conditional imports for backend support
-try:
-    import openai
-except ImportError:
-    openai = None
+from .backends import CompletionBackend, OpenAIBackend
+from .plan_stream import PlanStreamParser
+from .prompt import PromptBuilder
+from .scheduler import AsyncPlanScheduler, PlanScheduler
+
+MAX_TURNS_REPLY = "Reached maximum reasoning turns without a definitive answer."
 
 class Agent:
     """An autonomous agent that uses LLMs and tools to solve tasks."""
 
-    def __init__(self, config, registry: ToolRegistry):
+    def __init__(self, config, registry: ToolRegistry, backend: Optional[CompletionBackend] = None):
         self.config = config
         self.registry = registry
+        self.backend = backend if backend is not None else OpenAIBackend()
         self.system_prompt = self._build_system_prompt()
 
-    def run(self, prompt_text: str):
-        """Entry point to run the agent's reasoning loop."""
-        return self._run_reason_act_loop(prompt_text)
+    def run(self, prompt_text: str) -> str:
+        """Entry point to run the agent's reasoning loop; returns the final answer."""
+        with span("session"):
+            return self._run_reason_act_loop(prompt_text)
+
+    async def arun(self, prompt_text: str) -> str:
+        """Async entry point; many sessions can share one event loop."""
+        with span("session", mode="async"):
+            return await self._arun_reason_act_loop(prompt_text)
 
     def _build_system_prompt(self) -> str:
         """Dynamically builds the system prompt from the tool registry."""
@@ -41,76 +52,327 @@ class Agent:
                         prompt += f"    {name}: {info.get('description', '')}\n"
         return prompt
 
-    def _make_history(self, conv: List[tuple[str, str]]) -> str:
-        """Formats the conversation history and prepends the system prompt."""
-        out = ""
-        for role, text in conv:
-            out += f"{'tool_output' if role == 'tool' else role}: {text}\n"
-        return self.system_prompt + "\n" + out
-
-    def _generate_reply(self, prompt: str) -> str:
-        """Generates a reply using the OpenAI API."""
-        response = openai.chat.completions.create(
-            model="gpt-4.1-mini",
-            messages=[{"role": "user", "content": prompt}],
+    def _new_history(self, prompt_text: str) -> PromptBuilder:
+        """Starts the message history for one run of the loop."""
+        history = PromptBuilder(self.system_prompt, self.config.prompt_token_budget)
+        history.add("user", prompt_text)
+        return history
+
+    def _completion_params(self) -> Dict[str, Any]:
+        """Request parameters passed to the completion backend."""
+        return dict(
+            model=self.config.model,
             max_tokens=self.config.max_tokens or 1024,
             temperature=self.config.temperature if self.config.temperature is not None else 1.0,
         )
-        return response.choices[0].message.content.strip()
+
+    def _generate_reply(self, messages: List[Dict[str, str]]) -> str:
+        """Generates a reply using the completion backend."""
+        with span("llm_call", messages=len(messages)) as s:
+            completion = self.backend.complete(messages, self._completion_params())
+            s.set(prompt_tokens=completion.prompt_tokens, completion_tokens=completion.completion_tokens,
+                  reply_chars=len(completion.text))
+        return completion.text.strip()
+
+    async def _agenerate_reply(self, messages: List[Dict[str, str]]) -> str:
+        """Async `_generate_reply`."""
+        with span("llm_call", messages=len(messages)) as s:
+            completion = await self.backend.acomplete(messages, self._completion_params())
+            s.set(prompt_tokens=completion.prompt_tokens, completion_tokens=completion.completion_tokens,
+                  reply_chars=len(completion.text))
+        return completion.text.strip()
+
+    def _stream_reply(self, messages: List[Dict[str, str]], usage: Optional[Dict[str, int]] = None) -> Iterator[str]:
+        """Yields the reply text as it is generated."""
+        return self.backend.stream(messages, self._completion_params(), usage)
+
+    def _astream_reply(self, messages: List[Dict[str, str]],
+                       usage: Optional[Dict[str, int]] = None) -> AsyncIterator[str]:
+        """Async `_stream_reply`."""
+        return self.backend.astream(messages, self._completion_params(), usage)
+
+    def _echo_text(self, parser: PlanStreamParser, started: bool, final: bool = False) -> bool:
+        """
+        Prints streamed non-plan text; returns whether anything has been
+        printed. Text that may start a plan is held back until `final`.
+        """
+        text = parser.take_text(final)
+        if not text:
+            return started
+        if not started:
+            print("\nAssistant:")
+            text = text.lstrip()
+        print(text, end="", flush=True)
+        return True
 
     def _run_reason_act_loop(self, prompt_text: str):
         """The main synchronous reasoning loop for the agent."""
-        conv = [("user", prompt_text)]
+        history = self._new_history(prompt_text)
         outputs = []
         for turn in range(1, self.config.max_turns + 1):
-            if self.config.debug >= 2:
-                print(f"--- Turn {turn}/{self.config.max_turns}: Generating plan ---")
+            with span("turn", n=turn):
+                if self.config.debug >= 2:
+                    print(f"--- Turn {turn}/{self.config.max_turns}: Generating plan ---")
+
+                messages = history.build()
+                if self.config.debug >= 2:
+                    print(f"--- Prompt: {history.token_count()} est. tokens, "
+                          f"{history.stats['stable_prefix_messages']} cached-prefix messages ---")
+
+                seen = len(outputs)
+                if self.config.stream:
+                    reply, outputs = self._stream_turn(messages, outputs)
+                    if outputs is None:
+                        return reply
+                else:
+                    reply = self._generate_reply(messages)
+
+                    if self.config.debug >= 2:
+                        print(f"--- LLM Raw Reply ---\n{reply}\n---------------------")
 
-            prompt = self._make_history(conv)
-            reply = self._generate_reply(prompt)
+                    plan = self._safe_extract_plan(reply)
+                    if plan is None:
+                        print(f"\nAssistant:\n{reply}")
+                        return reply
+                    outputs = self._execute_plan(plan, outputs)
 
-            if self.config.debug >= 2:
-                print(f"--- LLM Raw Reply ---\n{reply}\n---------------------")
+                history.add("assistant", reply)
+                for result in outputs[seen:]:
+                    history.add("tool", self._tool_message(result))
+
+        print(f"\nAssistant:\n{MAX_TURNS_REPLY}")
+        return MAX_TURNS_REPLY
+
+    async def _arun_reason_act_loop(self, prompt_text: str):
+        """The asynchronous reasoning loop; mirrors `_run_reason_act_loop`."""
+        history = self._new_history(prompt_text)
+        outputs = []
+        for turn in range(1, self.config.max_turns + 1):
+            with span("turn", n=turn):
+                if self.config.debug >= 2:
+                    print(f"--- Turn {turn}/{self.config.max_turns}: Generating plan ---")
+
+                messages = history.build()
+                if self.config.debug >= 2:
+                    print(f"--- Prompt: {history.token_count()} est. tokens, "
+                          f"{history.stats['stable_prefix_messages']} cached-prefix messages ---")
+
+                seen = len(outputs)
+                if self.config.stream:
+                    reply, outputs = await self._astream_turn(messages, outputs)
+                    if outputs is None:
+                        return reply
+                else:
+                    reply = await self._agenerate_reply(messages)
+
+                    if self.config.debug >= 2:
+                        print(f"--- LLM Raw Reply ---\n{reply}\n---------------------")
+
+                    plan = self._safe_extract_plan(reply)
+                    if plan is None:
+                        print(f"\nAssistant:\n{reply}")
+                        return reply
+                    outputs = await self._aexecute_plan(plan, outputs)
+
+                history.add("assistant", reply)
+                for result in outputs[seen:]:
+                    history.add("tool", self._tool_message(result))
+
+        print(f"\nAssistant:\n{MAX_TURNS_REPLY}")
+        return MAX_TURNS_REPLY
+
+    def _tool_message(self, result: Any) -> str:
+        """
+        Renders a tool result for the conversation. Outputs longer than
+        `max_tool_output_chars` stay in the result store; the model sees a
+        preview and a handle it can page through with `read_result`.
+        """
+        text = str(result)
+        limit = self.config.max_tool_output_chars
+        if not limit or len(text) <= limit or "read_result" not in self.registry:
+            return text
+        handle = get_result_store().put(text)
+        preview = text[:limit]
+        return (f"{preview}\n[truncated: showing {len(preview)} of {len(text)} chars. "
+                f"Call read_result with handle \"{handle}\" and offset {len(preview)} for more.]")
+
+    def _page_args(self, tool_name: Any, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Caps `read_result` pages at `max_tool_output_chars`, so they reach the model unwrapped."""
+        limit = self.config.max_tool_output_chars
+        if tool_name != "read_result" or not limit or not isinstance(args, dict):
+            return args
+        try:
+            requested = int(args.get("limit", limit))
+        except (TypeError, ValueError):
+            return args  # left for validation to reject
+        return {**args, "limit": min(requested, limit)}
+
+    def _stream_turn(self, messages: List[Dict[str, str]], prev_outputs: List[Any]) -> Tuple[str, Optional[List[Any]]]:
+        """
+        Streams one reply. Plan steps are dispatched as soon as they are parsed;
+        any other reply is echoed to stdout as it arrives. Returns the reply and
+        the updated outputs, or (reply, None) once a final answer was given.
+        """
+        parser = PlanStreamParser()
+        scheduler = None
+        chunks = []
+        echoed = False
+        usage = {}
+        with span("llm_call", messages=len(messages), stream=True) as s:
+            for delta in self._stream_reply(messages, usage):
+                chunks.append(delta)
+                for step in parser.feed(delta):
+                    if scheduler is None:
+                        scheduler = PlanScheduler(self._run_step, prev_outputs, self.config.max_parallel_tools,
+                                                  self._is_read_only)
+                    scheduler.add(step)
+                echoed = self._echo_text(parser, echoed)
+            s.set(reply_chars=sum(len(c) for c in chunks), **usage)
+        reply = "".join(chunks).strip()
+
+        if self.config.debug >= 2:
+            print(f"\n--- LLM Raw Reply ---\n{reply}\n---------------------")
 
-            plan = self._safe_extract_plan(reply)
-            if plan is None:
+        if scheduler is not None:
+            prev_outputs.extend(scheduler.results())
+            return reply, prev_outputs
+        # a plan wrapped in prose (or one the stream parser rejected) still runs,
+        # just without early dispatch
+        plan = self._safe_extract_plan(reply)
+        if plan is None:
+            if self._echo_text(parser, echoed, final=True):
+                print()
+            else:
                 print(f"\nAssistant:\n{reply}")
-                return
+            return reply, None
+        if echoed:
+            print()  # the prose led into a plan, which is not shown
+        return reply, self._execute_plan(plan, prev_outputs)
 
-            conv.append(("assistant", reply))
-            outputs = self._execute_plan(plan, outputs)
-            for result in outputs:
-                conv.append(("tool", str(result)))
+    async def _astream_turn(self, messages: List[Dict[str, str]], prev_outputs: List[Any]) -> Tuple[str, Optional[List[Any]]]:
+        """Async `_stream_turn`."""
+        parser = PlanStreamParser()
+        scheduler = None
+        chunks = []
+        echoed = False
+        usage = {}
+        with span("llm_call", messages=len(messages), stream=True) as s:
+            async for delta in self._astream_reply(messages, usage):
+                chunks.append(delta)
+                for step in parser.feed(delta):
+                    if scheduler is None:
+                        scheduler = AsyncPlanScheduler(self._arun_step, prev_outputs, self.config.max_parallel_tools,
+                                                       self._is_read_only)
+                    scheduler.add(step)
+                echoed = self._echo_text(parser, echoed)
+            s.set(reply_chars=sum(len(c) for c in chunks), **usage)
+        reply = "".join(chunks).strip()
 
-        print("\nAssistant:\nReached maximum reasoning turns without a definitive answer.")
+        if self.config.debug >= 2:
+            print(f"\n--- LLM Raw Reply ---\n{reply}\n---------------------")
+
+        if scheduler is not None:
+            prev_outputs.extend(await scheduler.results())
+            return reply, prev_outputs
+        plan = self._safe_extract_plan(reply)
+        if plan is None:
+            if self._echo_text(parser, echoed, final=True):
+                print()
+            else:
+                print(f"\nAssistant:\n{reply}")
+            return reply, None
+        if echoed:
+            print()  # the prose led into a plan, which is not shown
+        return reply, await self._aexecute_plan(plan, prev_outputs)
 
     def _execute_plan(self, plan: List[Dict[str, Any]], prev_outputs: List[Any]) -> List[Any]:
-        """Executes a list of tool calls sequentially."""
+        """Executes a list of tool calls, running independent steps in parallel."""
         if self.config.debug >= 2:
             print(f"--- Executing plan with {len(plan)} steps ---")
 
-        results = []
-        for i, step in enumerate(plan):
-            tool_name = step.get("tool")
-            args = self._substitute_args(step.get("args", {}), prev_outputs)
-            
-            if self.config.debug >= 1:
-                print(f"--- Tool Call: {tool_name}({json.dumps(args)}) ---")
-            
-            try:
+        scheduler = PlanScheduler(self._run_step, prev_outputs, self.config.max_parallel_tools,
+                                  self._is_read_only)
+        for step in plan:
+            scheduler.add(step)
+
+        prev_outputs.extend(scheduler.results())
+        return prev_outputs
+
+    def _is_read_only(self, step: Dict[str, Any]) -> bool:
+        """
+        Whether a plan step may run alongside its neighbours, i.e. calls a
+        tool marked read-only. An unknown tool fails without doing
+        anything, so it counts as read-only.
+        """
+        name = step.get("tool") if isinstance(step, dict) else None
+        if not isinstance(name, str) or name not in self.registry:
+            return True
+        return self.registry.describe(name).read_only
+
+    def _run_step(self, i: int, step: Dict[str, Any], outputs: List[Any]) -> Any:
+        """Runs a single plan step; `outputs` holds every result it may reference."""
+        if step.get("error"):
+            # a step the plan parser could not read; it only holds its place
+            return step["error"]
+        tool_name = step.get("tool")
+        args = self._page_args(tool_name, self._substitute_args(step.get("args", {}), outputs))
+
+        if self.config.debug >= 1:
+            print(f"--- Tool Call: {tool_name}({json.dumps(args)}) ---")
+
+        try:
+            with span("tool_call", tool=tool_name, step=i) as s:
                 tool = self.registry.get(tool_name)
                 result = tool.run(args)
-                results.append(result)
-                if self.config.debug >= 1:
-                    print(f"--- Tool Result[{i}]: {result} ---")
-            except Exception as e:
-                results.append(str(e))
-                if self.config.debug >= 1:
-                    print(f"--- Tool Error[{i}]: {e} ---")
-        
-        prev_outputs.extend(results)
+                if asyncio.iscoroutine(result):
+                    # plan steps run on worker threads, which have no event loop
+                    result = asyncio.run(result)
+                s.set(result_chars=len(result) if isinstance(result, str) else None)
+            if self.config.debug >= 1:
+                print(f"--- Tool Result[{i}]: {result} ---")
+            return result
+        except Exception as e:
+            if self.config.debug >= 1:
+                print(f"--- Tool Error[{i}]: {e} ---")
+            return str(e)
+
+    async def _aexecute_plan(self, plan: List[Dict[str, Any]], prev_outputs: List[Any]) -> List[Any]:
+        """Async `_execute_plan`: steps are tasks awaiting `ToolRegistry.invoke`."""
+        if self.config.debug >= 2:
+            print(f"--- Executing plan with {len(plan)} steps ---")
+
+        scheduler = AsyncPlanScheduler(self._arun_step, prev_outputs, self.config.max_parallel_tools,
+                                       self._is_read_only)
+        for step in plan:
+            scheduler.add(step)
+
+        prev_outputs.extend(await scheduler.results())
         return prev_outputs
 
+    async def _arun_step(self, i: int, step: Dict[str, Any], outputs: List[Any]) -> Any:
+        """Async `_run_step`."""
+        if step.get("error"):
+            # a step the plan parser could not read; it only holds its place
+            return step["error"]
+        tool_name = step.get("tool")
+        args = self._page_args(tool_name, self._substitute_args(step.get("args", {}), outputs))
+
+        if self.config.debug >= 1:
+            print(f"--- Tool Call: {tool_name}({json.dumps(args)}) ---")
+
+        try:
+            with span("tool_call", tool=tool_name, step=i) as s:
+                tool = self.registry.get(tool_name)
+                result = await self.registry.invoke(tool, args)
+                s.set(result_chars=len(result) if isinstance(result, str) else None)
+            if self.config.debug >= 1:
+                print(f"--- Tool Result[{i}]: {result} ---")
+            return result
+        except Exception as e:
+            if self.config.debug >= 1:
+                print(f"--- Tool Error[{i}]: {e} ---")
+            return str(e)
+
     def _safe_extract_plan(self, text: str) -> Optional[List[Dict[str, Any]]]:
         """Safely extracts a JSON array plan from the LLM's reply."""
         try:
@@ -0,0 +1,365 @@
+import abc
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Protocol, Tuple, Union, runtime_checkable
+
+try:
+    import openai
+except ImportError:
+    openai = None
+
+Messages = List[Dict[str, str]]
+
+
+@dataclass
+class Completion:
+    text: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+@runtime_checkable
+class CompletionBackend(Protocol):
+    """
+    Where the agent gets its replies from. `params` holds the request
+    settings (model, max_tokens, temperature). Streaming methods yield text
+    deltas and, when given a `usage` dict, fill in the token counts once the
+    stream is exhausted.
+    """
+
+    def complete(self, messages: Messages, params: Dict[str, Any]) -> Completion:
+        ...
+
+    def stream(self, messages: Messages, params: Dict[str, Any],
+               usage: Optional[Dict[str, int]] = None) -> Iterator[str]:
+        ...
+
+    async def acomplete(self, messages: Messages, params: Dict[str, Any]) -> Completion:
+        ...
+
+    def astream(self, messages: Messages, params: Dict[str, Any],
+                usage: Optional[Dict[str, int]] = None) -> AsyncIterator[str]:
+        ...
+
+
+def request_key(messages: Messages, params: Dict[str, Any]) -> str:
+    """Stable hash of a completion request."""
+    payload = json.dumps({"messages": messages, "params": params}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _fill_usage(usage: Optional[Dict[str, int]], completion: Completion) -> None:
+    if usage is not None:
+        usage["prompt_tokens"] = completion.prompt_tokens
+        usage["completion_tokens"] = completion.completion_tokens
+
+
+def _chunks(text: str, size: int = 16) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+class OpenAIBackend(CompletionBackend):
+    """Chat completions from the OpenAI API."""
+
+    def __init__(self):
+        self._async_client = None
+
+    def _aclient(self):
+        if self._async_client is None:
+            self._async_client = openai.AsyncOpenAI(api_key=openai.api_key)
+        return self._async_client
+
+    @staticmethod
+    def _completion(response) -> Completion:
+        usage = response.usage
+        return Completion(
+            text=response.choices[0].message.content or "",
+            prompt_tokens=usage.prompt_tokens if usage else 0,
+            completion_tokens=usage.completion_tokens if usage else 0,
+        )
+
+    @staticmethod
+    def _delta(chunk, usage: Optional[Dict[str, int]]) -> Optional[str]:
+        if chunk.usage is not None and usage is not None:
+            usage["prompt_tokens"] = chunk.usage.prompt_tokens
+            usage["completion_tokens"] = chunk.usage.completion_tokens
+        if chunk.choices and chunk.choices[0].delta.content:
+            return chunk.choices[0].delta.content
+        return None
+
+    def complete(self, messages: Messages, params: Dict[str, Any]) -> Completion:
+        return self._completion(openai.chat.completions.create(messages=messages, **params))
+
+    def stream(self, messages: Messages, params: Dict[str, Any],
+               usage: Optional[Dict[str, int]] = None) -> Iterator[str]:
+        stream = openai.chat.completions.create(
+            messages=messages, stream=True, stream_options={"include_usage": True}, **params)
+        for chunk in stream:
+            delta = self._delta(chunk, usage)
+            if delta:
+                yield delta
+
+    async def acomplete(self, messages: Messages, params: Dict[str, Any]) -> Completion:
+        return self._completion(await self._aclient().chat.completions.create(messages=messages, **params))
+
+    async def astream(self, messages: Messages, params: Dict[str, Any],
+                      usage: Optional[Dict[str, int]] = None) -> AsyncIterator[str]:
+        stream = await self._aclient().chat.completions.create(
+            messages=messages, stream=True, stream_options={"include_usage": True}, **params)
+        async for chunk in stream:
+            delta = self._delta(chunk, usage)
+            if delta:
+                yield delta
+
+
+class CompletionStore:
+    """
+    Append-only JSONL file of recorded completions keyed by request hash.
+
+    Only the hash is stored, not the prompt. A request that was recorded
+    several times is replayed in the order it was recorded.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursor: Dict[str, int] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self._records.setdefault(record["key"], []).append(record)
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._records.values())
+
+    def append(self, key: str, completion: Completion, elapsed: float) -> None:
+        record = {
+            "key": key,
+            "text": completion.text,
+            "prompt_tokens": completion.prompt_tokens,
+            "completion_tokens": completion.completion_tokens,
+            "elapsed": round(elapsed, 4),
+        }
+        with self._lock:
+            self._records.setdefault(key, []).append(record)
+            dir_name = os.path.dirname(self.path)
+            if dir_name:
+                os.makedirs(dir_name, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def next(self, key: str) -> Dict[str, Any]:
+        """Returns the next recording for `key`; the last one repeats."""
+        with self._lock:
+            records = self._records.get(key)
+            if not records:
+                raise LookupError(f"no recorded completion for request {key[:12]}")
+            i = self._cursor.get(key, 0)
+            self._cursor[key] = i + 1
+            return records[min(i, len(records) - 1)]
+
+
+class RecordingBackend(CompletionBackend):
+    """Forwards to another backend and records every completion to a store."""
+
+    def __init__(self, inner: CompletionBackend, store: CompletionStore):
+        self.inner = inner
+        self.store = store
+
+    def complete(self, messages: Messages, params: Dict[str, Any]) -> Completion:
+        start = time.perf_counter()
+        completion = self.inner.complete(messages, params)
+        self.store.append(request_key(messages, params), completion, time.perf_counter() - start)
+        return completion
+
+    def stream(self, messages: Messages, params: Dict[str, Any],
+               usage: Optional[Dict[str, int]] = None) -> Iterator[str]:
+        start = time.perf_counter()
+        usage = usage if usage is not None else {}
+        parts = []
+        for delta in self.inner.stream(messages, params, usage):
+            parts.append(delta)
+            yield delta
+        completion = Completion("".join(parts), usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+        self.store.append(request_key(messages, params), completion, time.perf_counter() - start)
+
+    async def acomplete(self, messages: Messages, params: Dict[str, Any]) -> Completion:
+        start = time.perf_counter()
+        completion = await self.inner.acomplete(messages, params)
+        self.store.append(request_key(messages, params), completion, time.perf_counter() - start)
+        return completion
+
+    async def astream(self, messages: Messages, params: Dict[str, Any],
+                      usage: Optional[Dict[str, int]] = None) -> AsyncIterator[str]:
+        start = time.perf_counter()
+        usage = usage if usage is not None else {}
+        parts = []
+        async for delta in self.inner.astream(messages, params, usage):
+            parts.append(delta)
+            yield delta
+        completion = Completion("".join(parts), usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+        self.store.append(request_key(messages, params), completion, time.perf_counter() - start)
+
+
+class _SimulatedBackend(CompletionBackend):
+    """Shared plumbing for backends that produce replies locally."""
+
+    @abc.abstractmethod
+    def _next(self, messages: Messages, params: Dict[str, Any]) -> Tuple[Completion, float]:
+        """The next reply and how many seconds it should take to arrive."""
+
+    def complete(self, messages: Messages, params: Dict[str, Any]) -> Completion:
+        completion, latency = self._next(messages, params)
+        if latency:
+            time.sleep(latency)
+        return completion
+
+    def stream(self, messages: Messages, params: Dict[str, Any],
+               usage: Optional[Dict[str, int]] = None) -> Iterator[str]:
+        completion, latency = self._next(messages, params)
+        parts = _chunks(completion.text)
+        for part in parts:
+            if latency:
+                time.sleep(latency / len(parts))
+            yield part
+        _fill_usage(usage, completion)
+
+    async def acomplete(self, messages: Messages, params: Dict[str, Any]) -> Completion:
+        completion, latency = self._next(messages, params)
+        if latency:
+            await asyncio.sleep(latency)
+        return completion
+
+    async def astream(self, messages: Messages, params: Dict[str, Any],
+                      usage: Optional[Dict[str, int]] = None) -> AsyncIterator[str]:
+        completion, latency = self._next(messages, params)
+        parts = _chunks(completion.text)
+        for part in parts:
+            if latency:
+                await asyncio.sleep(latency / len(parts))
+            yield part
+        _fill_usage(usage, completion)
+
+
+class ReplayBackend(_SimulatedBackend):
+    """
+    Serves completions from a `CompletionStore`. `latency` overrides the
+    recorded response time; with `None` each reply takes as long as it did
+    when recorded, and with 0 replies are instant.
+    """
+
+    def __init__(self, store: CompletionStore, latency: Optional[float] = None):
+        self.store = store
+        self.latency = latency
+
+    def _next(self, messages: Messages, params: Dict[str, Any]) -> Tuple[Completion, float]:
+        record = self.store.next(request_key(messages, params))
+        completion = Completion(record["text"], record.get("prompt_tokens", 0), record.get("completion_tokens", 0))
+        return completion, record.get("elapsed", 0.0) if self.latency is None else self.latency
+
+
+class ScriptedBackend(_SimulatedBackend):
+    """
+    Returns canned replies in order, for tests and benchmarks. A reply may be
+    a callable taking the request messages, so a script can react to tool
+    output. Token counts are estimated from text length.
+    """
+
+    def __init__(self, replies: List[Union[str, Callable[[Messages], str]]], latency: float = 0.0):
+        self.replies = list(replies)
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _next(self, messages: Messages, params: Dict[str, Any]) -> Tuple[Completion, float]:
+        with self._lock:
+            if self.calls >= len(self.replies):
+                raise LookupError("scripted backend ran out of replies")
+            reply = self.replies[self.calls]
+            self.calls += 1
+        text = reply(messages) if callable(reply) else reply
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        return Completion(text, prompt_tokens, len(text) // 4), self.latency
+
+
+class MeteredBackend(CompletionBackend):
+    """Forwards to another backend, counting calls and tokens."""
+
+    def __init__(self, inner: CompletionBackend):
+        self.inner = inner
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def _count(self, prompt_tokens: int, completion_tokens: int) -> None:
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+
+    def complete(self, messages: Messages, params: Dict[str, Any]) -> Completion:
+        completion = self.inner.complete(messages, params)
+        self._count(completion.prompt_tokens, completion.completion_tokens)
+        return completion
+
+    def stream(self, messages: Messages, params: Dict[str, Any],
+               usage: Optional[Dict[str, int]] = None) -> Iterator[str]:
+        usage = usage if usage is not None else {}
+        yield from self.inner.stream(messages, params, usage)
+        self._count(usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+
+    async def acomplete(self, messages: Messages, params: Dict[str, Any]) -> Completion:
+        completion = await self.inner.acomplete(messages, params)
+        self._count(completion.prompt_tokens, completion.completion_tokens)
+        return completion
+
+    async def astream(self, messages: Messages, params: Dict[str, Any],
+                      usage: Optional[Dict[str, int]] = None) -> AsyncIterator[str]:
+        usage = usage if usage is not None else {}
+        async for delta in self.inner.astream(messages, params, usage):
+            yield delta
+        self._count(usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+
+
+class RateLimitedBackend(CompletionBackend):
+    """Spaces requests to another backend at most `rate` per second, across all callers."""
+
+    def __init__(self, inner: CompletionBackend, rate: float):
+        self.inner = inner
+        self.interval = 1.0 / rate
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Claims the next free slot and returns how long to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+            return slot - now
+
+    def complete(self, messages: Messages, params: Dict[str, Any]) -> Completion:
+        time.sleep(self._reserve())
+        return self.inner.complete(messages, params)
+
+    def stream(self, messages: Messages, params: Dict[str, Any],
+               usage: Optional[Dict[str, int]] = None) -> Iterator[str]:
+        time.sleep(self._reserve())
+        yield from self.inner.stream(messages, params, usage)
+
+    async def acomplete(self, messages: Messages, params: Dict[str, Any]) -> Completion:
+        await asyncio.sleep(self._reserve())
+        return await self.inner.acomplete(messages, params)
+
+    async def astream(self, messages: Messages, params: Dict[str, Any],
+                      usage: Optional[Dict[str, int]] = None) -> AsyncIterator[str]:
+        await asyncio.sleep(self._reserve())
+        async for delta in self.inner.astream(messages, params, usage):
+            yield delta
@@ -0,0 +1,124 @@
+import json
+from typing import Any, List, Optional
+
+
+class PlanStreamParser:
+    """
+    Incremental parser for a streamed reply that may be a JSON plan array.
+
+    Feed it chunks as they arrive; `feed()` returns every top-level array
+    element that closed within the chunk, so tool calls can be dispatched
+    while the model is still writing the rest of the plan. A leading
+    markdown code fence is skipped. If the reply does not open with `[`,
+    it is treated as plain text and `take_text()` hands it back in pieces,
+    up to the first `[` or backtick: from there on it may be a plan wrapped
+    in prose, so the rest is only handed back once the reply is `final`.
+    An element that is not valid JSON closes as a step with no tool and an
+    `error`, so the steps after it keep their `$N` numbers.
+    """
+
+    def __init__(self):
+        self.is_plan: Optional[bool] = None  # None until the first significant char
+        self.done = False
+        self.elements: List[Any] = []
+        self._head = ""       # text seen before the mode is known
+        self._unread = ""     # text-mode output not yet taken
+        self._holding = False  # text-mode output is held back until the reply ends
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._element: List[str] = []
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Consumes a chunk and returns the plan elements it completed."""
+        if self.is_plan is None:
+            self._head += chunk
+            chunk = self._detect()
+            if self.is_plan is not True:
+                return []
+        elif self.is_plan is False:
+            self._unread += chunk
+            return []
+        return self._scan(chunk)
+
+    def take_text(self, final: bool = False) -> str:
+        """
+        Returns text-mode output received since the last call that cannot
+        be part of a plan, or all of it once the reply is `final`.
+        """
+        if self._holding and not final:
+            return ""
+        end = len(self._unread)
+        if not final:
+            end = min((i for i in (self._unread.find("["), self._unread.find("`")) if i != -1), default=end)
+            self._holding = end < len(self._unread)
+        text, self._unread = self._unread[:end], self._unread[end:]
+        return text
+
+    def _detect(self) -> str:
+        head = self._head.lstrip()
+        if head.startswith("`"):
+            if not "```".startswith(head[:3]):
+                return self._as_text()
+            newline = head.find("\n")
+            if newline == -1:
+                return ""
+            head = head[newline + 1:].lstrip()
+        if not head:
+            return ""
+        if head[0] != "[":
+            return self._as_text()
+        self.is_plan = True
+        self._head = ""
+        return head
+
+    def _as_text(self) -> str:
+        self.is_plan = False
+        self._unread, self._head = self._head, ""
+        return ""
+
+    def _scan(self, chunk: str) -> List[Any]:
+        closed = []
+        for ch in chunk:
+            if self.done:
+                break
+            if self._in_string:
+                self._element.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if self._depth == 0:
+                if ch == "[":
+                    self._depth = 1
+                continue
+            if self._depth == 1 and ch in ",]":
+                self._close_element(closed)
+                if ch == "]":
+                    self._depth = 0
+                    self.done = True
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                self._depth += 1
+            elif ch in "]}":
+                self._depth -= 1
+            if self._element or not ch.isspace():
+                self._element.append(ch)
+        return closed
+
+    def _close_element(self, closed: List[Any]) -> None:
+        text = "".join(self._element).strip()
+        self._element = []
+        if not text:
+            return
+        try:
+            element = json.loads(text)
+        except ValueError as e:
+            element = {"tool": None, "args": {}, "error": f"Invalid plan step {text[:80]!r}: {e}"}
+        self.elements.append(element)
+        closed.append(element)
@@ -0,0 +1,126 @@
+import hashlib
+from typing import Any, Dict, List, Optional
+
+_ROLES = {"user": "user", "assistant": "assistant", "tool": "user"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 chars per token); good enough for budgeting."""
+    return (len(text) + 3) // 4
+
+
+class PromptBuilder:
+    """
+    Append-only chat history for the reason-act loop.
+
+    The system prompt and every earlier turn stay as separate, unchanged
+    messages, so consecutive requests share a byte-identical prefix that
+    provider-side prompt caching can reuse. Each message is hashed once and
+    chained, which makes the shared prefix cheap to measure per request.
+
+    When `token_budget` is set and the history grows past it, old tool
+    outputs are truncated (and, if that is not enough, elided) down to a
+    low-water mark, so compaction breaks the cached prefix only occasionally.
+    """
+
+    def __init__(self, system_prompt: str, token_budget: Optional[int] = None,
+                 keep_recent: int = 4, elide_head_chars: int = 400, low_water: float = 0.75):
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.elide_head_chars = elide_head_chars
+        self.low_water = low_water
+        self._messages: List[Dict[str, str]] = []
+        self._tokens: List[int] = []
+        self._hashes: List[str] = []
+        self._is_tool: List[bool] = []
+        self._compacted: List[bool] = []
+        self._last_sent: List[str] = []
+        self.stats: Dict[str, Any] = {
+            "requests": 0,
+            "prefix_hits": 0,
+            "stable_prefix_messages": 0,
+            "reused_tokens": 0,
+            "sent_tokens": 0,
+            "compactions": 0,
+        }
+        self._append("system", system_prompt, False)
+
+    def add(self, role: str, text: str) -> None:
+        """Appends a turn; `role` is user, assistant or tool."""
+        if role == "tool":
+            self._append(_ROLES[role], f"tool_output: {text}", True)
+        else:
+            self._append(_ROLES[role], text, False)
+
+    def build(self) -> List[Dict[str, str]]:
+        """Returns the messages for the next request and updates prefix metrics."""
+        if self.token_budget is not None and sum(self._tokens) > self.token_budget:
+            self._compact()
+
+        stable = 0
+        for sent, current in zip(self._last_sent, self._hashes):
+            if sent != current:
+                break
+            stable += 1
+        self.stats["requests"] += 1
+        if self._last_sent and stable == len(self._last_sent):
+            self.stats["prefix_hits"] += 1
+        self.stats["stable_prefix_messages"] = stable
+        self.stats["reused_tokens"] += sum(self._tokens[:stable])
+        self.stats["sent_tokens"] += sum(self._tokens)
+        self._last_sent = list(self._hashes)
+        return list(self._messages)
+
+    def prefix_hashes(self) -> List[str]:
+        """Chained hash of every message prefix, oldest first."""
+        return list(self._hashes)
+
+    def token_count(self) -> int:
+        return sum(self._tokens)
+
+    def _append(self, role: str, content: str, is_tool: bool) -> None:
+        self._messages.append({"role": role, "content": content})
+        self._tokens.append(estimate_tokens(content))
+        self._is_tool.append(is_tool)
+        self._compacted.append(False)
+        self._hashes.append(self._chain(len(self._messages) - 1))
+
+    def _chain(self, i: int) -> str:
+        prev = self._hashes[i - 1] if i > 0 else ""
+        msg = self._messages[i]
+        return hashlib.sha256(f"{prev}\x00{msg['role']}\x00{msg['content']}".encode()).hexdigest()
+
+    def _compact(self) -> None:
+        target = int(self.token_budget * self.low_water)
+        total = sum(self._tokens)
+        candidates = [i for i in range(len(self._messages) - self.keep_recent) if self._is_tool[i]]
+        first_changed = None
+
+        # pass 1 truncates old tool outputs to a short head; pass 2 drops them
+        for full in (False, True):
+            for i in candidates:
+                if total <= target:
+                    break
+                content = self._messages[i]["content"]
+                if full:
+                    replacement = "tool_output: [elided]"
+                elif self._compacted[i]:
+                    continue
+                else:
+                    head = content[:self.elide_head_chars]
+                    if len(head) == len(content):
+                        continue
+                    replacement = f"{head} ... [elided {len(content) - len(head)} chars]"
+                if replacement == content:
+                    continue
+                self._messages[i] = {"role": self._messages[i]["role"], "content": replacement}
+                total -= self._tokens[i]
+                self._tokens[i] = estimate_tokens(replacement)
+                total += self._tokens[i]
+                self._compacted[i] = True
+                first_changed = i if first_changed is None else min(first_changed, i)
+
+        if first_changed is not None:
+            self.stats["compactions"] += 1
+            for i in range(first_changed, len(self._messages)):
+                self._hashes[i] = self._chain(i)
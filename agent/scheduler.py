@@ -0,0 +1,161 @@
+import asyncio
+import contextvars
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+_REF_RE = re.compile(r"^\$(\d+)\.output$")
+
+
+def step_dependencies(step: Dict[str, Any], index: int, offset: int) -> Set[int]:
+    """
+    Returns the indices of earlier steps in the same plan that `step` reads
+    through `$N.output` placeholders.
+
+    `$N` is numbered across the whole session (see `Agent._substitute_args`),
+    so `offset` is the number of outputs produced by previous plans. References
+    to those outputs, or to the step itself and later ones, are not edges.
+    """
+    deps = set()
+    args = step.get("args", {}) if isinstance(step, dict) else None
+    if not isinstance(args, dict):
+        return deps
+    for val in args.values():
+        if not isinstance(val, str):
+            continue
+        match = _REF_RE.match(val)
+        if match:
+            dep = int(match.group(1)) - 1 - offset
+            if 0 <= dep < index:
+                deps.add(dep)
+    return deps
+
+
+class _Barriers:
+    """
+    Orders steps with side effects. A step whose tool is not read-only waits
+    for every earlier step, and every later step waits for it, so a write
+    and the reads or runs of what it wrote keep their plan order.
+    """
+
+    def __init__(self, read_only: Optional[Callable[[Dict[str, Any]], bool]]):
+        self._read_only = read_only or (lambda step: True)
+        self._last: Optional[int] = None
+
+    def dependencies(self, step: Dict[str, Any], index: int) -> Set[int]:
+        if not self._read_only(step):
+            self._last = index
+            return set(range(index))
+        return set() if self._last is None or self._last == index else {self._last}
+
+
+class PlanScheduler:
+    """
+    Runs the steps of a plan on a bounded thread pool, starting each step as
+    soon as the steps it references have finished.
+
+    Steps are added one at a time with `add()`, so a caller may start
+    executing a plan before it has seen the whole of it. `results()` blocks
+    until every added step is done and returns their outputs in plan order.
+    Steps for which `read_only` returns False run alone, in plan order.
+    """
+
+    def __init__(self, run_step: Callable[[int, Dict[str, Any], List[Any]], Any],
+                 prev_outputs: List[Any], max_workers: int = 4,
+                 read_only: Optional[Callable[[Dict[str, Any]], bool]] = None):
+        self._run_step = run_step
+        self._prev = list(prev_outputs)
+        self._barriers = _Barriers(read_only)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="plan")
+        self._lock = threading.Lock()
+        self._steps: List[Dict[str, Any]] = []
+        self._futures: List[Future] = []
+        self._results: Dict[int, Any] = {}
+        self._waiting: Dict[int, Set[int]] = {}
+        self._dependents: Dict[int, List[int]] = {}
+
+    def add(self, step: Dict[str, Any]) -> int:
+        """Schedules a step and returns its index within the plan."""
+        with self._lock:
+            index = len(self._steps)
+            self._steps.append(step)
+            self._futures.append(Future())
+            deps = step_dependencies(step, index, len(self._prev)) | self._barriers.dependencies(step, index)
+            pending = {d for d in deps if d not in self._results}
+            if pending:
+                self._waiting[index] = pending
+                for dep in pending:
+                    self._dependents.setdefault(dep, []).append(index)
+                return index
+        self._submit(index)
+        return index
+
+    def results(self) -> List[Any]:
+        """Waits for all scheduled steps and returns their outputs in order."""
+        try:
+            return [f.result() for f in self._futures]
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def _submit(self, index: int) -> None:
+        with self._lock:
+            outputs = self._prev + [self._results.get(j) for j in range(index)]
+        # carry the caller's context so tracing spans nest under it
+        self._pool.submit(contextvars.copy_context().run, self._run, index, outputs)
+
+    def _run(self, index: int, outputs: List[Any]) -> None:
+        try:
+            result = self._run_step(index, self._steps[index], outputs)
+        except Exception as e:
+            result = str(e)
+        ready = []
+        with self._lock:
+            self._results[index] = result
+            for dependent in self._dependents.pop(index, []):
+                pending = self._waiting[dependent]
+                pending.discard(index)
+                if not pending:
+                    del self._waiting[dependent]
+                    ready.append(dependent)
+        self._futures[index].set_result(result)
+        for dependent in ready:
+            self._submit(dependent)
+
+
+class AsyncPlanScheduler:
+    """
+    asyncio counterpart of `PlanScheduler`: each step is a task that awaits
+    the tasks it references, with at most `max_concurrency` steps running.
+    """
+
+    def __init__(self, run_step: Callable[[int, Dict[str, Any], List[Any]], Awaitable[Any]],
+                 prev_outputs: List[Any], max_concurrency: int = 4,
+                 read_only: Optional[Callable[[Dict[str, Any]], bool]] = None):
+        self._run_step = run_step
+        self._prev = list(prev_outputs)
+        self._barriers = _Barriers(read_only)
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._tasks: List[asyncio.Task] = []
+
+    def add(self, step: Dict[str, Any]) -> int:
+        """Schedules a step and returns its index within the plan."""
+        index = len(self._tasks)
+        deps = step_dependencies(step, index, len(self._prev)) | self._barriers.dependencies(step, index)
+        deps = [self._tasks[d] for d in sorted(deps)]
+        self._tasks.append(asyncio.ensure_future(self._run(index, step, deps)))
+        return index
+
+    async def results(self) -> List[Any]:
+        """Waits for all scheduled steps and returns their outputs in order."""
+        return list(await asyncio.gather(*self._tasks))
+
+    async def _run(self, index: int, step: Dict[str, Any], deps: List[asyncio.Task]) -> Any:
+        if deps:
+            await asyncio.wait(deps)
+        outputs = self._prev + [t.result() if t.done() else None for t in self._tasks[:index]]
+        async with self._semaphore:
+            try:
+                return await self._run_step(index, step, outputs)
+            except Exception as e:
+                return str(e)
@@ -0,0 +1,111 @@
+"""
+End-to-end benchmarks for the agent loop, tool dispatch, embeddings, exact and
+approximate FAISS search and the sandbox, with no network and no API key.
+
+    python bench/run.py run --out bench_results.json --files 10000 --vectors 1000,100000
+    python bench/run.py compare old.json new.json --threshold 0.1
+
+Results are p50/p95/p99 latencies per metric as JSON; `compare` exits with
+status 1 when a metric regressed past the threshold.
+"""
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bench import scenarios
+from bench.stats import Recorder, compare
+from bench.workspace import make_workspace
+
+ALL_SCENARIOS = ["agent", "dispatch", "faiss", "ann", "embed", "sandbox"]
+
+
+def _agent_config(args: argparse.Namespace) -> SimpleNamespace:
+    return SimpleNamespace(
+        model="bench", max_turns=args.turns + 1, max_tokens=256, temperature=0.0, debug=0,
+        max_parallel_tools=4, stream=False, prompt_token_budget=24000, max_tool_output_chars=4000,
+    )
+
+
+def run(args: argparse.Namespace) -> None:
+    recorder = Recorder()
+    meta = {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "files": args.files,
+        "vectors": args.vectors,
+        "scenarios": args.scenarios,
+    }
+    wanted = args.scenarios.split(",")
+
+    if "agent" in wanted:
+        with tempfile.TemporaryDirectory() as root:
+            with recorder.time("setup.workspace"):
+                paths = make_workspace(root, args.files)
+            meta.update(scenarios.agent_scenario(recorder, _agent_config(args), paths,
+                                                 sessions=args.sessions, turns=args.turns))
+    if "dispatch" in wanted:
+        scenarios.dispatch_scenario(recorder)
+    if "faiss" in wanted:
+        for n in (int(v) for v in args.vectors.split(",") if v):
+            scenarios.faiss_scenario(recorder, n)
+    if "ann" in wanted:
+        for n in (int(v) for v in args.vectors.split(",") if v):
+            meta.update(scenarios.ann_scenario(recorder, n))
+    if "embed" in wanted:
+        meta.update(scenarios.embed_scenario(recorder, args.embedding_model))
+    if "sandbox" in wanted:
+        scenarios.sandbox_scenario(recorder)
+
+    result = {"meta": meta, "metrics": recorder.summary()}
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+    for name, m in result["metrics"].items():
+        print(f"{name:<32} n={m['n']:<6} p50={m['p50_ms']:9.3f}ms p95={m['p95_ms']:9.3f}ms p99={m['p99_ms']:9.3f}ms")
+    for name, value in meta.items():
+        if name.startswith("ann.recall"):
+            print(f"{name:<32} {value:.4f}")
+        elif name.startswith("ann.bytes_per_vector"):
+            print(f"{name:<32} {value:.1f}")
+    print(f"wrote {args.out}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="Run scenarios and write a results file.")
+    p_run.add_argument("--out", default="bench_results.json")
+    p_run.add_argument("--scenarios", default=",".join(ALL_SCENARIOS))
+    p_run.add_argument("--files", type=int, default=10000, help="Files in the generated workspace.")
+    p_run.add_argument("--vectors", default="1000,100000", help="Comma-separated FAISS store sizes.")
+    p_run.add_argument("--sessions", type=int, default=20)
+    p_run.add_argument("--turns", type=int, default=3)
+    p_run.add_argument("--embedding-model", default="all-MiniLM-L6-v2")
+
+    p_cmp = sub.add_parser("compare", help="Flag regressions between two results files.")
+    p_cmp.add_argument("base")
+    p_cmp.add_argument("new")
+    p_cmp.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown.")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        regressions = compare(args.base, args.new, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if not regressions:
+            print("no regressions")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
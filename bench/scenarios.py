@@ -0,0 +1,194 @@
+import contextlib
+import json
+import os
+import random
+import time
+from typing import Any, Dict, List
+
+from agent.agent import Agent
+from agent.backends import ScriptedBackend
+from bench.stats import Recorder
+from bench.workspace import make_vectors
+from tools.tool_base import Tool, ToolRegistry, get_global_registry, jsonschema
+
+class TimedAgent(Agent):
+    """Agent that records prompt-build, turn, plan and per-tool latencies."""
+
+    def __init__(self, recorder: Recorder, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.recorder = recorder
+
+    def _new_history(self, prompt_text: str):
+        history = super()._new_history(prompt_text)
+        build = history.build
+        recorder = self.recorder
+        last = []
+
+        def _timed_build():
+            # a turn spans from one prompt build to the next
+            now = time.perf_counter()
+            if last:
+                recorder.add("agent.turn", now - last[0])
+            last[:] = [now]
+            with recorder.time("agent.prompt_build"):
+                return build()
+
+        history.build = _timed_build
+        return history
+
+    def _execute_plan(self, plan, prev_outputs):
+        with self.recorder.time("agent.plan"):
+            return super()._execute_plan(plan, prev_outputs)
+
+    def _run_step(self, i, step, outputs):
+        with self.recorder.time(f"tool.{step.get('tool')}"):
+            return super()._run_step(i, step, outputs)
+
+    def _run_reason_act_loop(self, prompt_text):
+        with self.recorder.time("agent.session"):
+            return super()._run_reason_act_loop(prompt_text)
+
+
+def _plan(rng: random.Random, paths: List[str]) -> str:
+    subdir = os.path.dirname(rng.choice(paths))
+    return json.dumps([
+        {"tool": "file_search", "args": {"regex": "NEEDLE_[0-9]+", "path": subdir, "max_hits": 20}},
+        {"tool": "file_read", "args": {"path": rng.choice(paths), "start_line": 1, "end_line": 10}},
+        {"tool": "list_directory", "args": {"path": subdir}},
+        {"tool": "find_path", "args": {"pattern": f"f{rng.randrange(100)}.txt", "root": subdir}},
+    ])
+
+
+def agent_scenario(recorder: Recorder, config: Any, paths: List[str],
+                   sessions: int = 20, turns: int = 3, seed: int = 0) -> Dict[str, Any]:
+    """
+    Drives Agent.run against a scripted LLM issuing filesystem plans over the
+    workspace. LLM time is zero, so turns measure prompt building and tool
+    execution only. Returns the tool cache counters.
+    """
+    import tools.file_read, tools.file_search, tools.list_directory, tools.find_path  # noqa: F401,E401
+
+    registry = get_global_registry()
+    registry.cache.clear()
+    before = dict(registry.cache.stats)
+    rng = random.Random(seed)
+    for _ in range(sessions):
+        replies = [_plan(rng, paths) for _ in range(turns)] + ["done"]
+        agent = TimedAgent(recorder, config, registry, ScriptedBackend(replies))
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            agent.run("explore the workspace")
+    return {"tool_cache": {k: v - before[k] for k, v in registry.cache.stats.items()}}
+
+
+def faiss_scenario(recorder: Recorder, n_vectors: int, queries: int = 200, k: int = 5, dim: int = 384) -> None:
+    """Brute-force search latency over a generated store of `n_vectors`."""
+    import faiss
+    import numpy as np
+
+    vecs = make_vectors(n_vectors, dim)
+    index = faiss.IndexIDMap(faiss.IndexFlatL2(dim))
+    with recorder.time(f"faiss.build.{n_vectors}"):
+        index.add_with_ids(vecs, np.arange(n_vectors, dtype=np.int64))
+    query_vecs = make_vectors(queries, dim, seed=1)
+    for q in query_vecs:
+        with recorder.time(f"faiss.search.{n_vectors}"):
+            index.search(q[None, :], k)
+
+
+def ann_scenario(recorder: Recorder, n_vectors: int, queries: int = 200, k: int = 10,
+                 dim: int = 384, nprobe: int = 16, ef_search: int = 64) -> Dict[str, float]:
+    """
+    Search latency, recall@k and size of each FaissStore index type and
+    vector storage against the exact float32 flat index. Vectors are drawn
+    around topic centres, like real embeddings, and queries are perturbed
+    copies of stored vectors.
+    """
+    import faiss
+    import numpy as np
+    from memory import ann
+
+    rng = np.random.default_rng(1)
+    centres = make_vectors(max(1, n_vectors // 100), dim)
+    vecs = centres[rng.integers(len(centres), size=n_vectors)] + 0.05 * rng.standard_normal((n_vectors, dim), dtype=np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    ids = np.arange(n_vectors, dtype=np.int64)
+    picks = rng.choice(n_vectors, queries, replace=False)
+    query_vecs = vecs[picks] + 0.01 * rng.standard_normal((queries, dim), dtype=np.float32)
+    spec = ann.IndexSpec(nprobe=nprobe, ef_search=ef_search)
+
+    flat = ann.empty_index("flat", dim, spec)
+    flat.add_with_ids(vecs, ids)
+    _, truth = flat.search(query_vecs, k)
+    recalls = {}
+    # float32 first, then the scalar-quantized variants of each type that has them
+    variants = [(kind, "float32") for kind in ann.KINDS]
+    variants += [(kind, storage) for storage in ann.STORAGES[1:] for kind in ("flat", "ivf_flat", "hnsw")]
+    for kind, storage in variants:
+        name = kind if storage == "float32" else f"{kind}-{storage}"
+        variant = ann.IndexSpec(nprobe=nprobe, ef_search=ef_search, storage=storage)
+        with recorder.time(f"setup.ann.build.{name}.{n_vectors}"):
+            index = flat if name == "flat" else ann.rebuild(flat, kind, variant)
+        found = []
+        for q in query_vecs:
+            with recorder.time(f"ann.search.{name}.{n_vectors}"):
+                _, hits = index.search(q[None, :], k)
+            found.append(hits[0])
+        recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+        recalls[f"ann.recall@{k}.{name}.{n_vectors}"] = round(float(recall), 4)
+        recalls[f"ann.bytes_per_vector.{name}.{n_vectors}"] = round(len(faiss.serialize_index(index)) / n_vectors, 1)
+    return recalls
+
+
+def embed_scenario(recorder: Recorder, model_name: str, batches: List[int] = (1, 32), repeats: int = 10) -> Dict[str, str]:
+    """Sentence-transformer encode latency per batch size; skipped if the model cannot load."""
+    try:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_name)
+    except Exception as e:
+        return {"embed": f"skipped: {e}"}
+    for size in batches:
+        texts = [f"benchmark sentence number {i} about memory and tools" for i in range(size)]
+        model.encode(texts)  # warm-up
+        for _ in range(repeats):
+            with recorder.time(f"embed.batch{size}"):
+                model.encode(texts)
+    return {}
+
+
+def sandbox_scenario(recorder: Recorder, runs: int = 10) -> None:
+    """Round-trip latency of a trivial snippet in the local sandbox."""
+    from sandbox.local import LocalSandbox
+
+    sandbox = LocalSandbox()
+    for _ in range(runs):
+        with recorder.time("sandbox.local"):
+            sandbox.run_code("print(1)")
+
+
+def dispatch_scenario(recorder: Recorder, rounds: int = 200, calls: int = 1000) -> None:
+    """
+    Tool dispatch overhead: `get()` plus argument validation on a trivial
+    tool, timed per `calls` calls. `dispatch.jsonschema_validate` times the
+    uncached `jsonschema.validate` the registry used to run on every call.
+    """
+    schema = {
+        "type": "object",
+        "properties": {
+            "path": {"type": "string", "description": "file to read"},
+            "start_line": {"type": "integer"},
+            "end_line": {"type": "integer"},
+        },
+        "required": ["path"],
+    }
+    registry = ToolRegistry()
+    registry.register(Tool("noop", "returns its path", schema, lambda args: args["path"]))
+    args = {"path": "README.md", "start_line": 1, "end_line": 20}
+    for _ in range(rounds):
+        with recorder.time(f"dispatch.get_and_run.x{calls}"):
+            for _ in range(calls):
+                registry.get("noop").run(args)
+    if jsonschema is not None:
+        for _ in range(rounds // 10 or 1):
+            with recorder.time(f"dispatch.jsonschema_validate.x{calls}"):
+                for _ in range(calls):
+                    jsonschema.validate(args, schema)
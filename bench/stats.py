@@ -0,0 +1,67 @@
+import json
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Linear-interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+class Recorder:
+    """Collects latency samples (in seconds) per metric name."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.samples.setdefault(name, []).append(seconds)
+
+    @contextmanager
+    def time(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per-metric count, mean and p50/p95/p99 in milliseconds."""
+        out = {}
+        for name, values in sorted(self.samples.items()):
+            ordered = sorted(values)
+            out[name] = {
+                "n": len(ordered),
+                "mean_ms": 1000 * sum(ordered) / len(ordered),
+                "p50_ms": 1000 * percentile(ordered, 50),
+                "p95_ms": 1000 * percentile(ordered, 95),
+                "p99_ms": 1000 * percentile(ordered, 99),
+            }
+        return out
+
+
+def compare(base_path: str, new_path: str, threshold: float = 0.10, floor_ms: float = 0.05) -> List[str]:
+    """
+    Returns a line per metric whose p50 or p95 got more than `threshold`
+    slower between two result files. Differences under `floor_ms` are noise,
+    and `setup.*` metrics (fixture generation) are not compared.
+    """
+    with open(base_path) as f:
+        base = json.load(f)["metrics"]
+    with open(new_path) as f:
+        new = json.load(f)["metrics"]
+    regressions = []
+    for name in sorted(set(base) & set(new)):
+        if name.startswith("setup."):
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            old, cur = base[name][key], new[name][key]
+            if cur - old > floor_ms and cur > old * (1 + threshold):
+                regressions.append(f"{name} {key}: {old:.3f} -> {cur:.3f} ms (+{(cur / old - 1) * 100 if old else float('inf'):.0f}%)")
+    return regressions
@@ -0,0 +1,40 @@
+import os
+import random
+from typing import List
+
+_WORDS = ["alpha", "beta", "gamma", "delta", "config", "handler", "request", "error", "index", "memory"]
+
+
+def make_workspace(root: str, n_files: int, fanout: int = 100, lines: int = 20, seed: int = 0) -> List[str]:
+    """
+    Writes `n_files` small text files under `root`, spread over nested
+    directories with at most `fanout` entries each. About one file in fifty
+    contains the marker `NEEDLE_<n>` for search scenarios. Returns the paths.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for i in range(n_files):
+        parts, rest = [], i // fanout
+        while rest:
+            parts.append(f"d{rest % fanout}")
+            rest //= fanout
+        directory = os.path.join(root, *reversed(parts))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"f{i % fanout}.txt")
+        body = [" ".join(rng.choice(_WORDS) for _ in range(8)) for _ in range(lines)]
+        if i % 50 == 0:
+            body[rng.randrange(lines)] += f" NEEDLE_{i}"
+        with open(path, "w") as f:
+            f.write("\n".join(body) + "\n")
+        paths.append(path)
+    return paths
+
+
+def make_vectors(n: int, dim: int = 384, seed: int = 0):
+    """Unit-norm float32 vectors standing in for sentence embeddings."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    vecs = rng.standard_normal((n, dim), dtype=np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    return vecs
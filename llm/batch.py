@@ -0,0 +1,135 @@
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+from agent.agent import Agent
+from agent.backends import MeteredBackend, RateLimitedBackend
+
+
+def _read_prompts(path: str) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Yields (id, prompt, error) from a JSONL file of {"id", "prompt"} objects
+    or bare strings. A line with no usable prompt yields its error instead,
+    so one bad record does not stop the batch.
+    """
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                yield str(lineno), None, f"invalid JSON: {e}"
+                continue
+            if isinstance(item, str):
+                yield str(lineno), item, None
+            elif not isinstance(item, dict):
+                yield str(lineno), None, "expected a JSON object or string"
+            elif not isinstance(item.get("prompt"), str):
+                yield str(item.get("id", lineno)), None, 'missing "prompt" string'
+            else:
+                yield str(item.get("id", lineno)), item["prompt"], None
+
+
+def _completed_ids(path: str) -> Set[str]:
+    """
+    Returns the ids already answered in a previous, possibly interrupted run.
+    A torn last line is cut off so new results start on a fresh line; ids
+    that ended in an error are retried.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    for line in data[:end].decode().splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict) and record.get("id") is not None and record.get("error") is None:
+            done.add(str(record["id"]))
+    return done
+
+
+async def _run_one(base: Agent, prompt_id: str, prompt: str) -> Dict[str, Any]:
+    backend = MeteredBackend(base.backend)
+    agent = Agent(base.config, base.registry, backend)
+    start = time.perf_counter()
+    output, error = None, None
+    try:
+        output = await agent.arun(prompt)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {
+        "id": prompt_id,
+        "output": output,
+        "error": error,
+        "elapsed_s": round(time.perf_counter() - start, 3),
+        "llm_calls": backend.calls,
+        "prompt_tokens": backend.prompt_tokens,
+        "completion_tokens": backend.completion_tokens,
+    }
+
+
+async def run_batch(base: Agent, input_path: str, output_path: str,
+                    concurrency: int = 8, rate_limit: Optional[float] = None) -> Dict[str, int]:
+    """
+    Runs every prompt in `input_path` as its own agent session, at most
+    `concurrency` at a time and, with `rate_limit`, at most that many LLM
+    requests per second overall. Results are appended to `output_path` as
+    they complete; rerunning with the same output file skips finished ids.
+    """
+    if rate_limit:
+        base = Agent(base.config, base.registry, RateLimitedBackend(base.backend, rate_limit))
+    done = _completed_ids(output_path)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    counts = {"skipped": 0, "ok": 0, "error": 0}
+
+    with open(output_path, "a") as out:
+        def _write(record: Dict[str, Any]) -> None:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            counts["error" if record["error"] else "ok"] += 1
+            total = counts["ok"] + counts["error"]
+            print(f"[{total}] {record['id']}: {record['elapsed_s']}s"
+                  f"{' ' + record['error'] if record['error'] else ''}", file=sys.stderr)
+
+        async def _worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                _write(await _run_one(base, *item))
+
+        workers = [asyncio.create_task(_worker()) for _ in range(max(1, concurrency))]
+        for prompt_id, prompt, error in _read_prompts(input_path):
+            if prompt_id in done:
+                counts["skipped"] += 1
+                continue
+            if error:
+                _write({"id": prompt_id, "output": None, "error": error, "elapsed_s": 0.0,
+                        "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+                continue
+            await queue.put((prompt_id, prompt))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    return counts
+
+
+def main_batch(base: Agent, input_path: str, output_path: str,
+               concurrency: int, rate_limit: Optional[float]) -> None:
+    """Runs a batch; the agents' console output is suppressed unless debugging."""
+    with open(os.devnull, "w") as devnull, \
+            contextlib.redirect_stdout(devnull) if not base.config.debug else contextlib.nullcontext():
+        counts = asyncio.run(run_batch(base, input_path, output_path, concurrency, rate_limit))
+    print(f"batch done: {counts['ok']} ok, {counts['error']} failed, {counts['skipped']} already done",
+          file=sys.stderr)
@@ -1,44 +1,54 @@
+import argparse
 import asyncio
-import subprocess
 import sys
-import shlex
 
 # Add project root to the Python path to allow imports from other directories
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-from memory.faiss_store import FaissStore
+from llm.run_remote import _add_agent_args, _build_agent
+from memory.faiss_store import get_store
 from memory.memory_manager import MemoryManager
+from memory.shards import get_sharded_memory
 
-def run_agent(prompt: str) -> str:
-    """Executes the agent script and captures its full output."""
-    cmd = f"python llm/run_remote.py {shlex.quote(prompt)}"
-    result = subprocess.run(
-        cmd,
-        shell=True,
-        capture_output=True,
-        text=True
-    )
-    return result.stdout.strip()
+def _report_ingest_error(future: asyncio.Future) -> None:
+    """Done-callback for a queued memory ingest: reports a failure instead of dropping it."""
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Memory ingest failed: {future.exception()}", file=sys.stderr)
 
 async def main():
     """
     A CLI controller for interacting with the LLM agent continuously,
     enhanced with a multi-layered memory system.
     """
+    parser = argparse.ArgumentParser()
+    _add_agent_args(parser)
+    args = parser.parse_args()
+
+    # The agent, its tools and the API client live for the whole session,
+    # so each turn only pays for the model call and the tools it runs.
+    agent = _build_agent(args)
+
     print("LLM Agent Controller (with Memory)")
     print("Type 'exit' or 'quit' to end the session.")
     print("-" * 30)
 
     # 1. Initialize the memory system
-    long_term_memory = FaissStore()
-    memory_manager = MemoryManager(long_term_memory)
+    # the same store instance backs the memory_ingest/memory_query tools;
+    # with a namespace, the conversation gets a shard of its own
+    if agent.config.memory_namespace:
+        long_term_memory = get_sharded_memory().namespace(agent.config.memory_namespace)
+    else:
+        long_term_memory = get_store()
+    memory_manager = MemoryManager(long_term_memory, message_ttl=agent.config.memory_message_ttl,
+                                   context_tokens=agent.config.memory_context_tokens)
     memory_manager.load()
+    pending = set()  # ingests still in flight
 
     try:
         while True:
             # 2. Get user input
-            user_input = input("You: ")
+            user_input = await asyncio.to_thread(input, "You: ")
             if user_input.lower() in ["exit", "quit"]:
                 break
             if not user_input.strip():
@@ -47,22 +57,31 @@ async def main():
             # 3. Construct a context-rich prompt
             augmented_prompt = await memory_manager.construct_prompt(user_input)
             
-            # 4. Run the agent with the augmented prompt
+            # 4. Run the agent in-process; it prints its reply as it goes
             print("Assistant is thinking...")
-            agent_output = run_agent(augmented_prompt)
-            print(f"Assistant: {agent_output}")
+            try:
+                agent_output = await agent.arun(augmented_prompt)
+            except Exception as e:
+                print(f"Assistant error: {e}")
+                continue
 
-            # 5. Update memory with the new interaction
-            await memory_manager.add_message("user", user_input)
-            await memory_manager.add_message("assistant", agent_output)
+            # 5. Update memory with the new interaction; embedding happens
+            #    in the background, batched with other pending messages
+            for role, text in (("user", user_input), ("assistant", agent_output)):
+                ingest = await memory_manager.add_message(role, text)
+                ingest.add_done_callback(_report_ingest_error)
+                ingest.add_done_callback(pending.discard)
+                pending.add(ingest)
 
             print("\n" + "-" * 30)
 
     except (KeyboardInterrupt, EOFError):
         print("\nExiting controller.")
     finally:
-        # 6. Ensure memory is saved on exit
+        # 6. Ensure memory is saved on exit, once queued messages have landed
+        #    (their futures resolve on this loop, so wait before it closes)
         print("Saving memory...")
+        await asyncio.gather(*pending, return_exceptions=True)
         memory_manager.save()
         print("Done.")
 
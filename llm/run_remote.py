@@ -1,7 +1,10 @@
 import argparse
+import atexit
+import asyncio
 import importlib
 import os
 import sys
+import time
 from pathlib import Path
 
 # Add project root to the Python path
@@ -14,7 +17,11 @@ import yaml
 from dotenv import load_dotenv
 
 from agent.agent import Agent
+from agent.backends import CompletionBackend, CompletionStore, OpenAIBackend, RecordingBackend, ReplayBackend
+from llm.batch import main_batch
+from tools.manifest import load_manifest, tool_from_entry
 from tools.tool_base import ToolRegistry, get_global_registry
+from tracing.tracer import enable_tracing
 
 try:
     import openai
@@ -27,13 +34,35 @@ class Config:
     enabled_tools: List[str] = field(default_factory=list)
     temperature: Optional[float] = None
     max_tokens: Optional[int] = None
+    model: str = "gpt-4.1-mini"
     max_turns: int = 10
+    max_parallel_tools: int = 4
+    stream: bool = False
+    prompt_token_budget: Optional[int] = None
+    tool_cache_size: int = 512
+    max_tool_output_chars: Optional[int] = 4000
     debug: int = 0
     sandbox: str = "local"
     sandbox_opts: dict = field(default_factory=dict)
     memory_backend: str = "faiss_store"
     memory_path: str = ".rag/index.faiss"
     embedding_model: str = "all-MiniLM-L6-v2"
+    memory_index: str = "auto"
+    memory_storage: str = "float32"
+    memory_mmap: bool = False
+    memory_nprobe: int = 16
+    memory_ef_search: int = 64
+    memory_search_workers: int = 4
+    memory_encode_workers: int = 1
+    memory_encode_process: bool = False
+    memory_hybrid: bool = True
+    memory_dedup_threshold: float = 0.97
+    memory_compact_ratio: float = 0.2
+    memory_message_ttl: Optional[float] = None
+    memory_context_tokens: int = 2048
+    memory_namespace: Optional[str] = None
+    memory_search_namespaces: List[str] = field(default_factory=list)
+    memory_shard_ram_mb: int = 1024
 
 def _load_config(cli_args: argparse.Namespace) -> Config:
     """Load config from YAML and merge CLI arguments."""
@@ -44,20 +73,71 @@ def _load_config(cli_args: argparse.Namespace) -> Config:
         enabled_tools=yaml_config.get("enabled_tools", []),
         temperature=cli_args.temperature or yaml_config.get("temperature"),
         max_tokens=cli_args.max_tokens or yaml_config.get("max_tokens"),
+        model=yaml_config.get("model", "gpt-4.1-mini"),
         max_turns=cli_args.max_turns or yaml_config.get("max_turns"),
+        max_parallel_tools=yaml_config.get("max_parallel_tools", 4),
+        stream=cli_args.stream or yaml_config.get("stream", False),
+        prompt_token_budget=yaml_config.get("prompt_token_budget"),
+        tool_cache_size=yaml_config.get("tool_cache_size", 512),
+        max_tool_output_chars=yaml_config.get("max_tool_output_chars", 4000),
         debug=cli_args.debug,
         sandbox=yaml_config.get("sandbox", "local"),
         sandbox_opts=yaml_config.get("sandbox_opts", {}),
         memory_backend=yaml_config.get("memory_backend", "faiss_store"),
         memory_path=yaml_config.get("memory_path", ".rag/index.faiss"),
         embedding_model=yaml_config.get("embedding_model", "all-MiniLM-L6-v2"),
+        memory_index=yaml_config.get("memory_index", "auto"),
+        memory_storage=yaml_config.get("memory_storage", "float32"),
+        memory_mmap=yaml_config.get("memory_mmap", False),
+        memory_nprobe=yaml_config.get("memory_nprobe", 16),
+        memory_ef_search=yaml_config.get("memory_ef_search", 64),
+        memory_search_workers=yaml_config.get("memory_search_workers", 4),
+        memory_encode_workers=yaml_config.get("memory_encode_workers", 1),
+        memory_encode_process=yaml_config.get("memory_encode_process", False),
+        memory_hybrid=yaml_config.get("memory_hybrid", True),
+        memory_dedup_threshold=yaml_config.get("memory_dedup_threshold", 0.97),
+        memory_compact_ratio=yaml_config.get("memory_compact_ratio", 0.2),
+        memory_message_ttl=yaml_config.get("memory_message_ttl"),
+        memory_context_tokens=yaml_config.get("memory_context_tokens", 2048),
+        memory_namespace=yaml_config.get("memory_namespace"),
+        memory_search_namespaces=yaml_config.get("memory_search_namespaces") or [],
+        memory_shard_ram_mb=yaml_config.get("memory_shard_ram_mb", 1024),
     )
 
 def _load_tools(tool_names: List[str]) -> ToolRegistry:
-    """Import tool modules and return the populated global registry."""
+    """
+    Populate and return the global registry. Tools listed in the manifest are
+    registered lazily and imported on first use; others are imported now.
+    """
+    registry = get_global_registry()
+    manifest = load_manifest()
     for name in tool_names:
-        importlib.import_module(f"tools.{name}")
-    return get_global_registry()
+        entry = manifest.get(name)
+        if entry is not None:
+            registry.register_lazy(tool_from_entry(entry), entry["module"])
+        else:
+            importlib.import_module(f"tools.{name}")
+    return registry
+
+def _profile_startup(tool_names: List[str]) -> None:
+    """Print how long importing each enabled tool module takes."""
+    manifest = load_manifest()
+    timings = []
+    for name in tool_names:
+        module = manifest.get(name, {}).get("module", f"tools.{name}")
+        start = time.perf_counter()
+        try:
+            importlib.import_module(module)
+            status = "ok"
+        except Exception as e:
+            status = f"error: {e}"
+        timings.append((time.perf_counter() - start, name, status))
+
+    # shared dependencies are charged to the first tool that imports them
+    print(f"{'tool':<20} {'import ms':>10}  status")
+    for elapsed, name, status in timings:
+        print(f"{name:<20} {elapsed * 1000:>10.1f}  {status}")
+    print(f"{'total':<20} {sum(t[0] for t in timings) * 1000:>10.1f}")
 
 def _setup_api_key() -> str:
     """Load OpenAI API key from .env.local or environment variables."""
@@ -69,29 +149,87 @@ def _setup_api_key() -> str:
         sys.exit(1)
     return api_key
 
-def main():
+def _make_backend(cli_args: argparse.Namespace) -> CompletionBackend:
+    """Pick the completion backend: the live API, optionally recorded, or an offline replay."""
+    if cli_args.replay:
+        return ReplayBackend(CompletionStore(cli_args.replay), latency=cli_args.replay_latency)
     if openai is None:
         print("Error: The 'openai' package is not installed. Please run 'pip install openai'.", file=sys.stderr)
         sys.exit(1)
+    openai.api_key = _setup_api_key()
+    backend = OpenAIBackend()
+    if cli_args.record:
+        backend = RecordingBackend(backend, CompletionStore(cli_args.record))
+    return backend
 
-    parser = argparse.ArgumentParser()
-    parser.add_argument("prompt", type=str, help="The user prompt for the agent.")
+def _add_agent_args(parser: argparse.ArgumentParser) -> None:
+    """Options shared by every entry point that hosts an agent."""
     parser.add_argument("--debug", type=int, default=0, help="Set debug level.")
     parser.add_argument("--max-turns", type=int, default=None, help="Max Reason-Act turns.")
     parser.add_argument("--temperature", type=float, default=None, help="Override model temperature.")
     parser.add_argument("--max-tokens", type=int, default=None, help="Override max completion tokens.")
-    args = parser.parse_args()
+    parser.add_argument("--stream", action="store_true", help="Stream replies and dispatch plan steps as they are parsed.")
+    parser.add_argument("--record", type=str, default=None, help="Record completions to this JSONL file.")
+    parser.add_argument("--replay", type=str, default=None, help="Replay completions from this JSONL file (offline).")
+    parser.add_argument("--replay-latency", type=float, default=None, help="Simulated seconds per replayed reply (default: as recorded).")
+    parser.add_argument("--trace", type=str, default=None, help="Write a trace of sessions, turns and calls here (.json: Chrome format, else JSONL).")
 
-    # --- Initialization ---
-    openai.api_key = _setup_api_key()
-    config = _load_config(args)
+def _build_agent(cli_args: argparse.Namespace) -> Agent:
+    """Load config, backend and tools, and return a ready agent."""
+    backend = _make_backend(cli_args)
+    config = _load_config(cli_args)
     if hasattr(config, 'sandbox'):
         os.environ["SANDBOX_BACKEND"] = config.sandbox
+    os.environ["MEMORY_PATH"] = config.memory_path
+    os.environ["EMBEDDING_MODEL"] = config.embedding_model
+    os.environ["MEMORY_INDEX"] = config.memory_index
+    os.environ["MEMORY_STORAGE"] = config.memory_storage
+    os.environ["MEMORY_MMAP"] = "1" if config.memory_mmap else "0"
+    os.environ["MEMORY_NPROBE"] = str(config.memory_nprobe)
+    os.environ["MEMORY_EF_SEARCH"] = str(config.memory_ef_search)
+    os.environ["MEMORY_SEARCH_WORKERS"] = str(config.memory_search_workers)
+    os.environ["MEMORY_ENCODE_WORKERS"] = str(config.memory_encode_workers)
+    os.environ["MEMORY_ENCODE_PROCESS"] = "1" if config.memory_encode_process else "0"
+    os.environ["MEMORY_HYBRID"] = "1" if config.memory_hybrid else "0"
+    os.environ["MEMORY_DEDUP_THRESHOLD"] = str(config.memory_dedup_threshold)
+    os.environ["MEMORY_COMPACT_RATIO"] = str(config.memory_compact_ratio)
+    os.environ["MEMORY_SHARD_RAM_MB"] = str(config.memory_shard_ram_mb)
+    os.environ["MEMORY_NAMESPACE"] = config.memory_namespace or ""
+    os.environ["MEMORY_SEARCH_NAMESPACES"] = ",".join(config.memory_search_namespaces)
     registry = _load_tools(config.enabled_tools)
-    
+    registry.cache.max_entries = config.tool_cache_size
+    if getattr(cli_args, "trace", None):
+        atexit.register(enable_tracing().export, cli_args.trace)
+    return Agent(config, registry, backend)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("prompt", type=str, nargs="?", help="The user prompt for the agent.")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Run the agent on an asyncio event loop.")
+    parser.add_argument("--profile-startup", action="store_true", help="Report per-tool import times and exit.")
+    parser.add_argument("--batch", type=str, default=None, help="Run every prompt in this JSONL file instead of a single prompt.")
+    parser.add_argument("--output", type=str, default="batch_results.jsonl", help="Batch results file (resumed if it exists).")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent agent sessions in batch mode.")
+    parser.add_argument("--rate-limit", type=float, default=None, help="Max LLM requests per second in batch mode.")
+    _add_agent_args(parser)
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        config = _load_config(args)
+        os.environ["SANDBOX_BACKEND"] = config.sandbox
+        _profile_startup(config.enabled_tools)
+        return
+    if args.prompt is None and args.batch is None:
+        parser.error("a prompt or --batch file is required")
+
     # --- Agent Execution ---
-    agent = Agent(config, registry)
-    agent.run(args.prompt)
+    agent = _build_agent(args)
+    if args.batch:
+        main_batch(agent, args.batch, args.output, args.concurrency, args.rate_limit)
+    elif args.use_async:
+        asyncio.run(agent.arun(args.prompt))
+    else:
+        agent.run(args.prompt)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
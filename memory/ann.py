@@ -0,0 +1,278 @@
+"""
+Index types for FaissStore and the rules for moving between them.
+
+A store starts on an exact flat index. In `auto` mode it is rebuilt as an
+IVF-Flat index once it holds `ivf_at` vectors and as IVF-PQ past `pq_at`;
+naming a type pins it, starting flat only until there is enough data to
+train on. HNSW needs no training and is used from the first vector.
+
+Flat, IVF-Flat and HNSW indexes can store vectors as float16 or int8
+scalar-quantized codes (`storage`), halving or quartering their memory;
+int8 learns per-dimension ranges, so it starts as float32 until
+`sq_min_train` vectors exist. A saved index can be opened memory-mapped
+(`MappedIndex`), leaving its codes in the page cache instead of the heap.
+"""
+import math
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+
+KINDS = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+STORAGES = ("float32", "float16", "int8")
+_QTYPES = {"float16": faiss.ScalarQuantizer.QT_fp16, "int8": faiss.ScalarQuantizer.QT_8bit}
+# auto mode only ever moves a store up this order
+_RANK = {"flat": 0, "ivf_flat": 1, "hnsw": 1, "ivf_pq": 2}
+
+@dataclass
+class IndexSpec:
+    kind: str = "auto"          # auto, or one of KINDS
+    ivf_at: int = 20_000        # auto: flat -> IVF-Flat at this many vectors
+    pq_at: int = 1_000_000      # auto: IVF-Flat -> IVF-PQ
+    nlist: Optional[int] = None  # IVF cells; default ~4*sqrt(n)
+    nprobe: int = 16            # IVF cells visited per query
+    pq_m: Optional[int] = None  # PQ sub-quantizers; default ~d/8
+    hnsw_m: int = 32
+    ef_construction: int = 80
+    ef_search: int = 64
+    storage: str = "float32"    # vector codes of flat, IVF-Flat and HNSW: one of STORAGES
+    sq_min_train: int = 1000    # int8 storage: vectors needed to learn value ranges
+
+    def __post_init__(self):
+        if self.kind != "auto" and self.kind not in KINDS:
+            raise ValueError(f"unknown index type {self.kind!r}; expected auto or one of {', '.join(KINDS)}")
+        if self.storage not in STORAGES:
+            raise ValueError(f"unknown vector storage {self.storage!r}; expected one of {', '.join(STORAGES)}")
+
+    @classmethod
+    def from_env(cls) -> "IndexSpec":
+        """Reads MEMORY_INDEX, MEMORY_STORAGE, MEMORY_NPROBE and MEMORY_EF_SEARCH, as set from the config."""
+        spec = cls(kind=os.getenv("MEMORY_INDEX", "auto"), storage=os.getenv("MEMORY_STORAGE") or "float32")
+        if os.getenv("MEMORY_NPROBE"):
+            spec.nprobe = int(os.environ["MEMORY_NPROBE"])
+        if os.getenv("MEMORY_EF_SEARCH"):
+            spec.ef_search = int(os.environ["MEMORY_EF_SEARCH"])
+        return spec
+
+    def nlist_for(self, n: int) -> int:
+        nlist = self.nlist or int(4 * math.sqrt(n))
+        # faiss wants ~39 training points per cell
+        return max(1, min(nlist, n // 39))
+
+    def min_train(self) -> int:
+        # PQ trains 256 centroids per sub-quantizer
+        return 39 * 256 if self.kind == "ivf_pq" else 39 * (self.nlist or 64)
+
+    def target(self, n: int) -> str:
+        """The index type a store of `n` vectors should use."""
+        if self.kind == "auto":
+            if n >= self.pq_at:
+                return "ivf_pq"
+            return "ivf_flat" if n >= self.ivf_at else "flat"
+        if self.kind.startswith("ivf") and n < self.min_train():
+            return "flat"
+        return self.kind
+
+    def storage_for(self, kind: str, n: int) -> str:
+        """How an index of type `kind` built from `n` vectors stores them."""
+        if kind == "ivf_pq":
+            return "pq"
+        if self.storage == "int8" and n < self.sq_min_train:
+            return "float32"
+        return self.storage
+
+    def migration(self, current: str, n: int, storage: Optional[str] = None) -> Optional[str]:
+        """
+        The type to rebuild a `current` index of `n` vectors as, or None to
+        keep it. Given the index's `storage`, an index whose codes differ
+        from what the spec wants is rebuilt as its own type.
+        """
+        target = self.target(n)
+        if self.kind == "auto" and _RANK[target] <= _RANK[current]:
+            target = current
+        if target == current and (storage is None or storage == self.storage_for(current, n)):
+            return None
+        return target
+
+class MappedIndex:
+    """
+    A saved index memory-mapped read-only, plus an exact in-RAM index of
+    the vectors added since it was written; searches merge the two by
+    distance. Stands in for a faiss index wherever FaissStore uses one.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.base = faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC)
+        self.delta = faiss.IndexIDMap(faiss.IndexFlatL2(self.base.d))
+
+    @property
+    def d(self) -> int:
+        return self.base.d
+
+    @property
+    def ntotal(self) -> int:
+        return self.base.ntotal + self.delta.ntotal
+
+    def add_with_ids(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        self.delta.add_with_ids(vectors, ids)
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        distances, ids = self.base.search(queries, k)
+        if self.delta.ntotal:
+            more_distances, more_ids = self.delta.search(queries, k)
+            distances = np.hstack([distances, more_distances])
+            ids = np.hstack([ids, more_ids])
+            # missing hits have infinite distance and sort last
+            order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+            distances = np.take_along_axis(distances, order, axis=1)
+            ids = np.take_along_axis(ids, order, axis=1)
+        return distances, ids
+
+    def materialize(self) -> faiss.Index:
+        """The whole index in RAM: the file read normally, with the delta added."""
+        index = faiss.read_index(self.path)
+        vectors, ids = contents(self.delta)
+        if len(ids):
+            index.add_with_ids(vectors, ids)
+        return index
+
+def _inner(index) -> faiss.Index:
+    if isinstance(index, MappedIndex):
+        index = index.base
+    return faiss.downcast_index(index.index if isinstance(index, faiss.IndexIDMap) else index)
+
+def kind_of(index: faiss.Index) -> str:
+    inner = _inner(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+def storage_of(index: faiss.Index) -> str:
+    inner = _inner(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        inner = faiss.downcast_index(inner.storage)
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "pq"
+    if isinstance(inner, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return next(name for name, qtype in _QTYPES.items() if qtype == inner.sq.qtype)
+    return "float32"
+
+def ids_of(index: faiss.Index) -> np.ndarray:
+    """The ids held by an ID-mapped (or mapped) index."""
+    if isinstance(index, MappedIndex):
+        return np.concatenate([ids_of(index.base), ids_of(index.delta)])
+    return faiss.vector_to_array(index.id_map).astype(np.int64)
+
+def nbytes(index: faiss.Index) -> int:
+    """Estimated heap bytes of an index; the mapped part of a MappedIndex is not counted."""
+    if isinstance(index, MappedIndex):
+        return nbytes(index.delta) + 8 * index.base.ntotal
+    inner, n = _inner(index), index.ntotal
+    total = 8 * n  # the id map
+    if isinstance(inner, faiss.IndexHNSW):
+        total += faiss.downcast_index(inner.storage).code_size * n + 4 * inner.hnsw.neighbors.size()
+    elif isinstance(inner, faiss.IndexIVF):
+        total += (inner.code_size + 8) * n + 4 * inner.nlist * inner.d
+    else:
+        total += inner.code_size * n
+    return total
+
+def _pq_m(d: int, spec: IndexSpec) -> int:
+    if spec.pq_m:
+        return spec.pq_m
+    m = max(1, d // 8)
+    while d % m:
+        m -= 1
+    return m
+
+def empty_index(kind: str, d: int, spec: IndexSpec, n_train: int = 0) -> faiss.Index:
+    """An untrained ID-mapped index of the given type, storing vectors as the spec says for `n_train` of them."""
+    qtype = _QTYPES.get(spec.storage_for(kind, n_train))
+    if kind == "flat":
+        inner = faiss.IndexFlatL2(d) if qtype is None else faiss.IndexScalarQuantizer(d, qtype, faiss.METRIC_L2)
+    elif kind == "hnsw":
+        inner = faiss.IndexHNSWFlat(d, spec.hnsw_m) if qtype is None else faiss.IndexHNSWSQ(d, qtype, spec.hnsw_m)
+        inner.hnsw.efConstruction = spec.ef_construction
+    else:
+        quantizer = faiss.IndexFlatL2(d)
+        nlist = spec.nlist_for(n_train)
+        if kind == "ivf_pq":
+            inner = faiss.IndexIVFPQ(quantizer, d, nlist, _pq_m(d, spec), 8)
+        elif qtype is None:
+            inner = faiss.IndexIVFFlat(quantizer, d, nlist)
+        else:
+            inner = faiss.IndexIVFScalarQuantizer(quantizer, d, nlist, qtype, faiss.METRIC_L2)
+    # the faiss wrappers keep the sub-indexes passed to them alive
+    index = faiss.IndexIDMap(inner)
+    tune(index, spec)
+    return index
+
+def tune(index: faiss.Index, spec: IndexSpec) -> None:
+    """Applies the query-time knobs (nprobe, efSearch) to a built or loaded index."""
+    inner = _inner(index)
+    if isinstance(inner, faiss.IndexIVF):
+        inner.nprobe = spec.nprobe
+    elif isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = spec.ef_search
+
+def contents(index: faiss.Index) -> Tuple[np.ndarray, np.ndarray]:
+    """All (vectors, ids) held by an ID-mapped index; lossy for IVF-PQ and quantized storage."""
+    if isinstance(index, MappedIndex):
+        base, delta = contents(index.base), contents(index.delta)
+        return np.vstack([base[0], delta[0]]), np.concatenate([base[1], delta[1]])
+    inner = faiss.downcast_index(index.index)
+    n = inner.ntotal
+    if isinstance(inner, faiss.IndexIVF):
+        inner.make_direct_map()
+    vectors = inner.reconstruct_n(0, n) if n else np.zeros((0, index.d), dtype=np.float32)
+    return vectors, faiss.vector_to_array(index.id_map).astype(np.int64)
+
+def rebuild(index: faiss.Index, kind: str, spec: IndexSpec, sample: int = 100_000) -> faiss.Index:
+    """Trains a new index of type `kind` on the contents of `index` and moves them over."""
+    vectors, ids = contents(index)
+    return _build(kind, index.d, spec, vectors, ids, sample)
+
+def remove(index: faiss.Index, ids: np.ndarray, spec: IndexSpec) -> faiss.Index:
+    """
+    Drops `ids` from `index` and returns it. Flat and IVF indexes remove
+    them in place, keeping trained centroids and PQ codes as they are; HNSW
+    cannot remove vectors, so a new graph is built from the survivors.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if isinstance(index, MappedIndex):
+        index = index.materialize()
+    if kind_of(index) == "hnsw":
+        vectors, all_ids = contents(index)
+        keep = ~np.isin(all_ids, ids)
+        return _build("hnsw", index.d, spec, vectors[keep], all_ids[keep])
+    inner = faiss.downcast_index(index.index)
+    if isinstance(inner, faiss.IndexIVF):
+        # the array direct map built by `contents` does not support removal
+        inner.set_direct_map_type(faiss.DirectMap.NoMap)
+    index.remove_ids(ids)
+    return index
+
+def copy(index: faiss.Index) -> faiss.Index:
+    """An in-RAM copy of `index`, which may be a MappedIndex."""
+    if isinstance(index, MappedIndex):
+        return index.materialize()
+    return faiss.clone_index(index)
+
+def _build(kind: str, d: int, spec: IndexSpec, vectors: np.ndarray, ids: np.ndarray,
+           sample: int = 100_000) -> faiss.Index:
+    new = empty_index(kind, d, spec, n_train=len(vectors))
+    if not new.is_trained:
+        train = vectors
+        if len(vectors) > sample:
+            rng = np.random.default_rng(0)
+            train = vectors[rng.choice(len(vectors), sample, replace=False)]
+        new.train(train)
+    if len(vectors):
+        new.add_with_ids(vectors, ids)
+    return new
@@ -0,0 +1,128 @@
+"""
+Incremental BM25 over the texts of a FaissStore.
+
+Dense embeddings blur exact identifiers, paths and error strings, which are
+what agents most often look up; BM25 matches them literally. Postings are
+kept per term as two `array`s (uint32 doc ids, uint16 term counts), about
+6 bytes per (term, document) pair, and scored with numpy.
+"""
+import json
+import math
+import re
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w[\w./:\\-]*\w|\w")
+_PART = re.compile(r"[^\W_]+")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased words, with compound tokens such as `agent/agent.py`,
+    `my_var` or `E1234:` kept whole and also split into their parts.
+    """
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        parts = _PART.findall(token)
+        if len(parts) > 1 or (parts and parts[0] != token):
+            tokens.extend(parts)
+    return tokens
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[int]], k: int = 60) -> List[int]:
+    """
+    Merges ranked id lists; an id scores the sum of 1 / (k + rank) over the
+    lists it is in. Ties keep the order of first appearance.
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda doc_id: -scores[doc_id])
+
+class BM25Index:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.terms: Dict[str, int] = {}
+        self._ids: List[array] = []
+        self._tfs: List[array] = []
+        self.doc_len = array("I")
+        self.n_docs = 0
+        self.total_len = 0
+        self.next_id = 0  # one past the highest id added
+
+    def add(self, doc_id: int, text: str) -> None:
+        counts = Counter(tokenize(text))
+        if doc_id >= len(self.doc_len):
+            self.doc_len.frombytes(bytes(self.doc_len.itemsize * (doc_id + 1 - len(self.doc_len))))
+        length = sum(counts.values())
+        self.doc_len[doc_id] = length
+        self.n_docs += 1
+        self.total_len += length
+        self.next_id = max(self.next_id, doc_id + 1)
+        for term, count in counts.items():
+            t = self.terms.get(term)
+            if t is None:
+                t = self.terms[term] = len(self._ids)
+                self._ids.append(array("I"))
+                self._tfs.append(array("H"))
+            self._ids[t].append(doc_id)
+            self._tfs[t].append(min(count, 0xFFFF))
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top `k` (doc id, score) pairs for `query`, best first."""
+        terms = [self.terms[t] for t in set(tokenize(query)) if t in self.terms]
+        if not terms or not self.n_docs:
+            return []
+        lengths = np.frombuffer(self.doc_len, dtype=np.uint32).astype(np.float32)
+        avg_len = self.total_len / self.n_docs or 1.0
+        norm = self.k1 * (1 - self.b + self.b * lengths / avg_len)
+        scores = np.zeros(len(lengths), dtype=np.float32)
+        for t in terms:
+            ids = np.frombuffer(self._ids[t], dtype=np.uint32)
+            tf = np.frombuffer(self._tfs[t], dtype=np.uint16).astype(np.float32)
+            idf = math.log(1 + (self.n_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+            scores[ids] += idf * tf * (self.k1 + 1) / (tf + norm[ids])
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(int(i), float(scores[i])) for i in hits]
+
+    def nbytes(self) -> int:
+        """Bytes held by postings and document lengths."""
+        postings = sum(a.itemsize * len(a) for a in self._ids) + sum(a.itemsize * len(a) for a in self._tfs)
+        return postings + self.doc_len.itemsize * len(self.doc_len)
+
+    def save(self, f) -> None:
+        """Writes the index to a binary file object as CSR arrays."""
+        offsets = np.zeros(len(self._ids) + 1, dtype=np.int64)
+        np.cumsum([len(a) for a in self._ids], out=offsets[1:])
+        np.savez(
+            f,
+            terms=np.frombuffer(json.dumps(list(self.terms)).encode(), dtype=np.uint8),
+            offsets=offsets,
+            ids=np.frombuffer(b"".join(a.tobytes() for a in self._ids), dtype=np.uint32),
+            tfs=np.frombuffer(b"".join(a.tobytes() for a in self._tfs), dtype=np.uint16),
+            doc_len=np.frombuffer(self.doc_len, dtype=np.uint32),
+            counts=np.array([self.n_docs, self.total_len, self.next_id], dtype=np.int64),
+            params=np.array([self.k1, self.b], dtype=np.float64),
+        )
+
+    @classmethod
+    def load(cls, f) -> "BM25Index":
+        data = np.load(f)
+        k1, b = data["params"].tolist()
+        index = cls(k1, b)
+        offsets = data["offsets"]
+        ids, tfs = data["ids"], data["tfs"]
+        for t, term in enumerate(json.loads(data["terms"].tobytes().decode())):
+            index.terms[term] = t
+            index._ids.append(array("I", ids[offsets[t]:offsets[t + 1]].tobytes()))
+            index._tfs.append(array("H", tfs[offsets[t]:offsets[t + 1]].tobytes()))
+        index.doc_len = array("I", data["doc_len"].tobytes())
+        index.n_docs, index.total_len, index.next_id = (int(v) for v in data["counts"])
+        return index
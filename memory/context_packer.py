@@ -0,0 +1,125 @@
+"""
+Fits retrieved memories and recent conversation into a prompt of bounded size.
+
+Retrieved documents are reordered by maximal marginal relevance, so a
+near-duplicate of a document already chosen ranks below a less similar but
+still relevant one. Documents and messages are then taken greedily, best
+first, until the token budget is spent; an item longer than its share of
+the budget is cut down rather than dropped.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from agent.prompt import estimate_tokens
+
+def mmr(query_vector: np.ndarray, doc_vectors: np.ndarray, k: int,
+        diversity: float = 0.3, duplicate: float = 0.95) -> List[Tuple[int, float]]:
+    """
+    Picks up to `k` documents by maximal marginal relevance: each pick
+    maximizes (1 - diversity) * sim(query, doc) - diversity * max sim(doc,
+    picked). Documents at least `duplicate` cosine-similar to a pick are
+    dropped. Returns (index, relevance) pairs in pick order.
+    """
+    if not len(doc_vectors):
+        return []
+    docs = doc_vectors / np.maximum(np.linalg.norm(doc_vectors, axis=1, keepdims=True), 1e-12)
+    query = query_vector / max(float(np.linalg.norm(query_vector)), 1e-12)
+    relevance = docs @ query
+    redundancy = np.full(len(docs), -np.inf)
+    alive = np.ones(len(docs), dtype=bool)
+    picks = []
+    while len(picks) < k and alive.any():
+        penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+        scores = np.where(alive, (1 - diversity) * relevance - diversity * penalty, -np.inf)
+        best = int(np.argmax(scores))
+        picks.append((best, float(relevance[best])))
+        alive[best] = False
+        similarity = docs @ docs[best]
+        redundancy = np.maximum(redundancy, similarity)
+        alive &= similarity < duplicate
+    return picks
+
+def trim(text: str, max_tokens: int) -> str:
+    """Cuts `text` to about `max_tokens`, marking the cut."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return text[:max(0, max_tokens * 4 - 2)].rstrip() + " …"
+
+class ContextPacker:
+    """
+    Builds the memory-augmented prompt within `token_budget` estimated
+    tokens. The query is always included in full; what remains goes to
+    retrieved documents first, up to `doc_share` of it, and then to the
+    conversation history, newest message first. Either side's unused
+    share is left to the other. No single item takes more than
+    `max_item_share` of the remaining budget.
+    """
+    def __init__(self, token_budget: int = 2048, doc_share: float = 0.5,
+                 max_item_share: float = 0.25, diversity: float = 0.3, min_item_tokens: int = 16):
+        self.token_budget = token_budget
+        self.doc_share = doc_share
+        self.max_item_share = max_item_share
+        self.diversity = diversity
+        self.min_item_tokens = min_item_tokens
+
+    def select(self, docs: List[Dict[str, Any]], k: int, query_vector: Optional[np.ndarray] = None,
+               doc_vectors: Optional[np.ndarray] = None, exclude: Sequence[str] = ()) -> List[Dict[str, Any]]:
+        """
+        The `k` documents to show, in MMR order when vectors are given and in
+        retrieval order otherwise. Documents whose text is in `exclude`
+        (messages already in the history) or repeated are skipped.
+        """
+        seen = set(exclude)
+        keep = []
+        for i, doc in enumerate(docs):
+            text = doc.get("text", "")
+            if text and text not in seen:
+                seen.add(text)
+                keep.append(i)
+        if query_vector is None or doc_vectors is None:
+            return [docs[i] for i in keep[:k]]
+        picks = mmr(np.asarray(query_vector, dtype=np.float32), np.asarray(doc_vectors, dtype=np.float32)[keep],
+                    k, self.diversity)
+        return [docs[keep[i]] for i, _ in picks]
+
+    def pack(self, query: str, docs: List[Dict[str, Any]], history: Sequence[Dict[str, str]]) -> str:
+        """Lays out the prompt from documents (best first) and history (oldest first)."""
+        head = "### Context\nThis is relevant information from past conversations:\n"
+        middle = "\n### Conversation History\nThis is the recent conversation history:\n"
+        tail = f"\n### User Query\n{query}"
+        remaining = max(0, self.token_budget - estimate_tokens(head + middle + tail))
+        item_cap = max(self.min_item_tokens, int(remaining * self.max_item_share))
+
+        doc_lines = [f"- {doc.get('text', '')}" for doc in docs]
+        message_lines = [f"{m['role'].capitalize()}: {m['text']}" for m in history]
+        doc_budget = int(remaining * self.doc_share)
+        chosen_docs, used = self._fill(doc_lines, doc_budget, item_cap)
+        # history is taken newest first but shown in order
+        chosen_messages, used_history = self._fill(message_lines[::-1], remaining - used, item_cap)
+        if used + used_history < remaining and len(chosen_docs) < len(doc_lines):
+            # history left room: give it back to the documents
+            chosen_docs, _ = self._fill(doc_lines, remaining - used_history, item_cap)
+
+        prompt = head
+        for line in chosen_docs:
+            prompt += line + "\n"
+        prompt += middle
+        for line in reversed(chosen_messages):
+            prompt += line + "\n"
+        return prompt + tail
+
+    def _fill(self, lines: List[str], budget: int, item_cap: int) -> Tuple[List[str], int]:
+        """Greedily takes `lines` in order while they fit, trimming any longer than `item_cap`."""
+        chosen, used = [], 0
+        for line in lines:
+            room = min(item_cap, budget - used)
+            cost = estimate_tokens(line + "\n")
+            if cost > room:
+                if room < self.min_item_tokens:
+                    break
+                line = trim(line, room - 1)
+                cost = estimate_tokens(line + "\n")
+            chosen.append(line)
+            used += cost
+        return chosen, used
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, so one writer per cache
+    fcntl = None
+
+_DIGEST_BYTES = 16
+
+def text_digest(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()[:_DIGEST_BYTES]
+
+class EmbeddingCache:
+    """
+    Persistent cache of text embeddings for one model, keyed by a hash of
+    the text.
+
+    Vectors are appended to a float32 file read back through a memory map;
+    a parallel file holds one fixed-size digest per row, so the index is
+    rebuilt at open by reading digests only. Recently used vectors are also
+    kept in an in-RAM LRU. Rows are never rewritten; a torn append from a
+    crash is cut back to the last complete row when the cache is reopened.
+
+    Several processes may share a cache: appends hold an exclusive lock on
+    a `.lock` file and number their rows from the files' actual size,
+    picking up the rows other processes appended first.
+    """
+    def __init__(self, directory: str, model_name: str, ram_entries: int = 4096):
+        os.makedirs(directory, exist_ok=True)
+        stem = os.path.join(directory, re.sub(r"[^\w.-]", "_", model_name))
+        self.model_name = model_name
+        self.ram_entries = ram_entries
+        self.vectors_path = stem + ".f32"
+        self.digests_path = stem + ".idx"
+        self.header_path = stem + ".json"
+        self.lock_path = stem + ".lock"
+        self.dim: Optional[int] = None
+        self.stats = {"ram_hits": 0, "disk_hits": 0, "misses": 0}
+        self._rows: Dict[bytes, int] = {}
+        self._count = 0  # rows on disk, including duplicate digests
+        self._ram: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._mmap: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self._open()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _open(self) -> None:
+        with self._file_lock():
+            self._sync()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Holds the cache files exclusively against other processes."""
+        with open(self.lock_path, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)  # released when the file closes
+            yield
+
+    def _sync(self) -> None:
+        """Indexes rows appended since the last call, by any process; needs `_file_lock`."""
+        if self.dim is None:
+            if not os.path.exists(self.header_path):
+                return
+            with open(self.header_path) as f:
+                self.dim = json.load(f)["dim"]
+        row_bytes = 4 * self.dim
+        vector_rows = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        digest_rows = os.path.getsize(self.digests_path) // _DIGEST_BYTES if os.path.exists(self.digests_path) else 0
+        rows = min(vector_rows, digest_rows)
+        for path, size in ((self.vectors_path, rows * row_bytes), (self.digests_path, rows * _DIGEST_BYTES)):
+            if os.path.exists(path) and os.path.getsize(path) != size:
+                os.truncate(path, size)
+        if rows > self._count:
+            with open(self.digests_path, "rb") as f:
+                f.seek(self._count * _DIGEST_BYTES)
+                data = f.read((rows - self._count) * _DIGEST_BYTES)
+            for offset in range(rows - self._count):
+                self._rows.setdefault(data[offset * _DIGEST_BYTES:(offset + 1) * _DIGEST_BYTES], self._count + offset)
+        self._count = rows
+
+    def _row(self, row: int) -> np.ndarray:
+        if self._mmap is None or row >= self._mmap.shape[0]:
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r").reshape(-1, self.dim)
+        return np.array(self._mmap[row])
+
+    def _remember(self, digest: bytes, vector: np.ndarray) -> None:
+        if self.ram_entries <= 0:
+            return
+        self._ram[digest] = vector
+        self._ram.move_to_end(digest)
+        while len(self._ram) > self.ram_entries:
+            self._ram.popitem(last=False)
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Returns the cached vector for `text`, or None."""
+        digest = text_digest(text)
+        with self._lock:
+            return self._lookup(digest)
+
+    def _lookup(self, digest: bytes) -> Optional[np.ndarray]:
+        vector = self._ram.get(digest)
+        if vector is not None:
+            self._ram.move_to_end(digest)
+            self.stats["ram_hits"] += 1
+            return vector
+        row = self._rows.get(digest)
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        vector = self._row(row)
+        self._remember(digest, vector)
+        self.stats["disk_hits"] += 1
+        return vector
+
+    def put_many(self, digests: List[bytes], vectors: np.ndarray) -> None:
+        """Appends vectors not already cached."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock, self._file_lock():
+            self._sync()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.header_path, "w") as f:
+                    json.dump({"model_name": self.model_name, "dim": self.dim}, f)
+            new = [i for i, digest in enumerate(digests) if digest not in self._rows]
+            new = list({digests[i]: i for i in new}.values())
+            if new:
+                start = self._count
+                with open(self.vectors_path, "ab") as f:
+                    f.write(vectors[new].tobytes())
+                with open(self.digests_path, "ab") as f:
+                    f.write(b"".join(digests[i] for i in new))
+                for offset, i in enumerate(new):
+                    self._rows[digests[i]] = start + offset
+                self._count += len(new)
+            for digest, vector in zip(digests, vectors):
+                self._remember(digest, vector)
+
+    def encode(self, texts: List[str], encode: Callable[[List[str]], Any]) -> np.ndarray:
+        """
+        Embeds `texts`, calling `encode` once with only the distinct texts
+        that are not cached (and not at all when every text is).
+        """
+        digests = [text_digest(text) for text in texts]
+        found: List[Optional[np.ndarray]] = []
+        with self._lock:
+            for digest in digests:
+                found.append(self._lookup(digest))
+        missing = {digest: text for digest, text, vector in zip(digests, texts, found) if vector is None}
+        if missing:
+            computed = np.asarray(encode(list(missing.values())), dtype=np.float32)
+            self.put_many(list(missing), computed)
+            by_digest = dict(zip(missing, computed))
+            found = [by_digest[d] if v is None else v for d, v in zip(digests, found)]
+        if not found:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.stack(found)
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = sum(self.stats.values())
+            hits = self.stats["ram_hits"] + self.stats["disk_hits"]
+            return {
+                **self.stats,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "entries": len(self._rows),
+                "ram_entries": len(self._ram),
+            }
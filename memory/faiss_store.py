@@ -1,65 +1,714 @@
+import asyncio
+import contextvars
+import functools
+import io
+import json
+import multiprocessing
 import os
-import pickle
-from typing import List, Dict, Any, Optional
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List, Dict, Any, Callable, Iterator, Optional, Set, Tuple
 
 import faiss
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
+from tracing.tracer import span
+
+from . import ann
 from .base import Memory
+from .bm25 import BM25Index, reciprocal_rank_fusion
+from .embedding_cache import EmbeddingCache
+from .persistence import MetadataDB, VectorLog, migrate_pickle
+
+DEFAULT_INDEX_PATH = ".rag/index.faiss"
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+class ReadWriteLock:
+    """
+    Many readers or one writer. Writers are preferred: once a writer is
+    waiting, new readers queue behind it so ingests are not starved.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+_models: Dict[str, SentenceTransformer] = {}
+_models_lock = threading.Lock()
+
+def get_model(model_name: str) -> SentenceTransformer:
+    """Returns the process-wide instance of an embedding model, loading it once."""
+    with _models_lock:
+        model = _models.get(model_name)
+        if model is None:
+            model = _models[model_name] = SentenceTransformer(model_name)
+        return model
+
+def _encode_in_worker(model_name: str, texts: List[str]) -> np.ndarray:
+    """Encodes in an encoder process, which keeps its own model instance."""
+    return np.asarray(get_model(model_name).encode(texts), dtype=np.float32)
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
 
 class FaissStore(Memory):
-    def __init__(self, index_path: str = ".rag/index.faiss", meta_path: str = ".rag/meta.pkl", model_name: str = "all-MiniLM-L6-v2"):
+    """
+    FAISS index plus per-vector metadata. The index is loaded from disk (or
+    created) on first use; queries run concurrently with each other and are
+    serialized against ingests, loads and saves. Use `get_store` to share
+    one instance per index path.
+
+    The index type follows `index_spec` (by default from the environment,
+    see `ann.IndexSpec.from_env`): a store is retrained as a faster
+    approximate index when it grows past the spec's thresholds, and keeps
+    float16 or int8 codes instead of float32 vectors if the spec says so.
+    With `mmap` (MEMORY_MMAP), the saved index is memory-mapped rather than
+    read into RAM, and only vectors added since the last snapshot are held
+    in memory.
+
+    With `cache_embeddings`, vectors are cached on disk next to the index by
+    a hash of their text, so repeated texts and queries skip the model.
+    Stores using the same model may share one `embedding_cache`.
+
+    Ingests are durable as soon as they return (see `persistence`); `save()`
+    folds the log into a snapshot, and so does a background checkpoint
+    after every `compact_every` logged vectors.
+    Metadata lives in SQLite next to `meta_path`; a legacy pickle found
+    there is migrated on first load.
+
+    With `hybrid` (MEMORY_HYBRID, on by default) a BM25 index over the same
+    texts is kept alongside, and `query` fuses the lexical and dense
+    rankings with reciprocal rank fusion, so exact identifiers, paths and
+    error strings are found even when their embeddings are not close.
+
+    The async methods never block the event loop: encoding runs on
+    `encode_workers` threads (or, with `encode_process`, in that many
+    encoder processes) and FAISS work on `search_workers` threads, FAISS
+    releasing the GIL while it searches. Defaults come from the
+    MEMORY_SEARCH_WORKERS, MEMORY_ENCODE_WORKERS and MEMORY_ENCODE_PROCESS
+    environment variables.
+
+    Entries can be deleted by id or metadata, or given a TTL at ingest.
+    A deleted or expired entry loses its SQLite row at once and its vector
+    becomes a tombstone that searches skip; once tombstones pass
+    `compact_ratio` of the index, a background job rebuilds the index and
+    the BM25 postings without them (and, when the store has outgrown its
+    index type, as the type the spec wants). With `dedup_threshold` (a cosine
+    similarity, MEMORY_DEDUP_THRESHOLD), a text with the same metadata as a
+    live entry at least that similar is not stored again: `ingest` returns
+    the existing id and extends its TTL.
+    """
+    def __init__(self, index_path: str = DEFAULT_INDEX_PATH, meta_path: str = ".rag/meta.pkl", model_name: str = DEFAULT_MODEL_NAME,
+                 cache_embeddings: bool = True, index_spec: Optional[ann.IndexSpec] = None,
+                 compact_every: int = 50_000, search_workers: Optional[int] = None,
+                 encode_workers: Optional[int] = None, encode_process: Optional[bool] = None,
+                 hybrid: Optional[bool] = None, dedup_threshold: Optional[float] = None,
+                 compact_ratio: Optional[float] = None, mmap: Optional[bool] = None,
+                 embedding_cache: Optional[EmbeddingCache] = None):
         os.makedirs(os.path.dirname(index_path), exist_ok=True)
         self.index_path = index_path
         self.meta_path = meta_path
         self.model_name = model_name
+        self.cache_embeddings = cache_embeddings
+        self.index_spec = index_spec or ann.IndexSpec.from_env()
+        self.compact_every = compact_every
+        self.db_path = os.path.splitext(meta_path)[0] + ".sqlite"
+        self.log_path = index_path + ".wal"
+        self.bm25_path = index_path + ".bm25.npz"
+        self.hybrid = hybrid if hybrid is not None else os.getenv("MEMORY_HYBRID", "1") != "0"
+        self.bm25: Optional[BM25Index] = None
+        self.search_workers = search_workers or _env_int("MEMORY_SEARCH_WORKERS", 4)
+        self.encode_workers = encode_workers or _env_int("MEMORY_ENCODE_WORKERS", 1)
+        self.encode_process = encode_process if encode_process is not None else os.getenv("MEMORY_ENCODE_PROCESS") == "1"
+        self.dedup_threshold = dedup_threshold if dedup_threshold is not None else _env_float("MEMORY_DEDUP_THRESHOLD", 0.0)
+        self.compact_ratio = compact_ratio if compact_ratio is not None else _env_float("MEMORY_COMPACT_RATIO", 0.2)
+        self.mmap = mmap if mmap is not None else os.getenv("MEMORY_MMAP") == "1"
+        self._pools: Dict[str, Executor] = {}
+        self._pools_lock = threading.Lock()
+        self._embedding_cache: Optional[EmbeddingCache] = embedding_cache
+        self._cache_lock = threading.Lock()
         self.model: Optional[SentenceTransformer] = None
         self.index: Optional[faiss.Index] = None
-        self.metadata: List[Dict[str, Any]] = []
+        self.db: Optional[MetadataDB] = None
+        self.log: Optional[VectorLog] = None
+        self._next_id = 0
+        self._logged = 0
+        self._tombstones: Set[int] = set()
+        # adds made while a compaction runs, replayed into its new index
+        self._compaction: Optional[List[Tuple[np.ndarray, np.ndarray]]] = None
+        # one compaction or checkpoint at a time
+        self._maintenance_lock = threading.Lock()
+        self._queued: Set[str] = set()
+        self.lock = ReadWriteLock()
 
     def _get_model(self) -> SentenceTransformer:
-        """Returns the singleton model instance, loading if needed."""
+        """Returns the shared model instance, loading if needed."""
         if self.model is None:
-            self.model = SentenceTransformer(self.model_name)
+            self.model = get_model(self.model_name)
         return self.model
 
+    def _pool(self, name: str) -> Executor:
+        with self._pools_lock:
+            pool = self._pools.get(name)
+            if pool is None:
+                if name == "search":
+                    pool = ThreadPoolExecutor(self.search_workers, thread_name_prefix="faiss-search")
+                elif name == "encode":
+                    pool = ThreadPoolExecutor(self.encode_workers, thread_name_prefix="embed")
+                elif name == "compact":
+                    pool = ThreadPoolExecutor(1, thread_name_prefix="faiss-compact")
+                else:
+                    # spawn, not fork: the parent may already hold torch threads
+                    pool = ProcessPoolExecutor(self.encode_workers, mp_context=multiprocessing.get_context("spawn"))
+                self._pools[name] = pool
+            return pool
+
+    async def _offload(self, pool: str, fn: Callable, *args):
+        """Runs `fn` on one of the store's executors, keeping the tracing context."""
+        call = functools.partial(contextvars.copy_context().run, fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(self._pool(pool), call)
+
+    def close(self) -> None:
+        """Waits for a running compaction and shuts down the store's worker threads and encoder processes."""
+        with self._pools_lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if self.encode_process:
+            return self._pool("encode_process").submit(_encode_in_worker, self.model_name, texts).result()
+        return np.asarray(self._get_model().encode(texts), dtype=np.float32)
+
+    @property
+    def embedding_cache(self) -> Optional[EmbeddingCache]:
+        if self._embedding_cache is None and self.cache_embeddings:
+            with self._cache_lock:
+                if self._embedding_cache is None:
+                    directory = os.path.join(os.path.dirname(self.index_path), "embeddings")
+                    self._embedding_cache = EmbeddingCache(directory, self.model_name)
+        return self._embedding_cache
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embeds texts, through the embedding cache when enabled."""
+        with span("embed", texts=len(texts)) as s:
+            cache = self.embedding_cache
+            if cache is None:
+                return self._encode(texts)
+            misses = cache.stats["misses"]
+            vectors = cache.encode(texts, self._encode)
+            s.set(encoded=cache.stats["misses"] - misses)
+            return vectors
+
+    def _dimension(self) -> int:
+        cache = self.embedding_cache
+        if cache is not None and cache.dim is not None:
+            return cache.dim
+        if self.encode_process:
+            return self._encode(["dimension probe"]).shape[1]
+        return self._get_model().get_sentence_embedding_dimension()
+
+    def _ensure_loaded(self) -> None:
+        if self.index is None:
+            with self.lock.write():
+                if self.index is None:
+                    self._load()
+
     def load(self):
-        """Loads the index and metadata from disk."""
-        model = self._get_model()
+        """Loads the snapshot and replays the write-ahead log."""
+        with self.lock.write():
+            self._load()
+
+    def _load(self) -> None:
+        if self.db is None:
+            self.db = MetadataDB(self.db_path)
+        if os.path.exists(self.meta_path) and not self.db.count():
+            migrate_pickle(self.meta_path, self.db)
         if os.path.exists(self.index_path):
-            self.index = faiss.read_index(self.index_path)
-            with open(self.meta_path, "rb") as f:
-                self.metadata = pickle.load(f)
+            self.index = ann.MappedIndex(self.index_path) if self.mmap else faiss.read_index(self.index_path)
+            ann.tune(self.index, self.index_spec)
         else:
-            d = model.get_sentence_embedding_dimension()
-            self.index = faiss.IndexIDMap(faiss.IndexFlatL2(d))
+            d = self._dimension()
+            self.index = ann.empty_index(self.index_spec.target(0), d, self.index_spec)
+
+        ids = ann.ids_of(self.index)
+        next_id = int(ids.max()) + 1 if len(ids) else 0
+        if self.log is not None:
+            self.log.close()
+        self.log = VectorLog(self.log_path, self.index.d)
+        self._logged = len(self.log)
+        if self._logged:
+            with span("wal_replay", records=self._logged) as s:
+                known = self.db.ids_from(next_id)
+                replayed = []
+                for log_ids, vectors in self.log.replay():
+                    keep = np.array([i >= next_id and i in known for i in log_ids.tolist()], dtype=bool)
+                    if keep.any():
+                        self.index.add_with_ids(vectors[keep], log_ids[keep])
+                        next_id = max(next_id, int(log_ids[keep].max()) + 1)
+                        replayed.append(log_ids[keep])
+                replayed = np.concatenate(replayed) if replayed else np.empty(0, dtype=np.int64)
+                if len(replayed) < self._logged:
+                    # drop records already in the snapshot or deleted since
+                    self.log.rewrite(replayed)
+                    self._logged = len(replayed)
+                s.set(replayed=len(replayed))
+        # metadata committed by an ingest that died before logging its vectors
+        self.db.delete_from(next_id)
+        # ids of deleted entries are never reused, even the newest ones
+        self._next_id = max(next_id, self.db.next_id())
+        # vectors whose rows were deleted since the snapshot was taken
+        ids = ann.ids_of(self.index)
+        self._tombstones = set(np.setdiff1d(ids, np.array(self.db.all_ids(), dtype=np.int64)).tolist())
+        if self.hybrid:
+            self._load_bm25()
+        self._maybe_migrate()
+        self._expire()
+
+    def _load_bm25(self) -> None:
+        """Loads the lexical snapshot and catches it up from SQLite."""
+        if os.path.exists(self.bm25_path):
+            with open(self.bm25_path, "rb") as f:
+                self.bm25 = BM25Index.load(f)
+        else:
+            self.bm25 = BM25Index()
+        with span("bm25_catch_up", first_id=self.bm25.next_id):
+            for rows in self.db.texts_from(self.bm25.next_id):
+                for id_, text in rows:
+                    self.bm25.add(id_, text)
+
+    def _migration(self, index: Optional[faiss.Index] = None) -> Optional[str]:
+        """The index type the spec wants for `index` (the store's by default) at its size, if not its own."""
+        index = index if index is not None else self.index
+        return self.index_spec.migration(ann.kind_of(index), index.ntotal, ann.storage_of(index))
+
+    def _maybe_migrate(self) -> None:
+        """Rebuilds the index as the type the spec wants at its current size; call with the write lock held."""
+        target = self._migration()
+        if target is not None:
+            with span("index_rebuild", source=ann.kind_of(self.index), target=target, ntotal=self.index.ntotal):
+                self.index = ann.rebuild(self.index, target, self.index_spec)
+
+    def unload(self) -> None:
+        """
+        Saves the store and releases its index, postings and open files;
+        the next call that needs them loads them again.
+        """
+        self.close()
+        with self._maintenance_lock, self.lock.write():
+            if self.index is None:
+                return
+            self._snapshot()
+            self.index = self.bm25 = None
+            self._tombstones = set()
+            self.log.close()
+            self.db.close()
+            self.log = self.db = None
+
+    def memory_bytes(self) -> int:
+        """Estimated RAM held by the loaded index and BM25 postings (0 when unloaded)."""
+        index, bm25 = self.index, self.bm25
+        if index is None:
+            return 0
+        total = ann.nbytes(index)
+        if bm25 is not None:
+            # about 6 bytes per posting, bounded by the total token count
+            total += 6 * bm25.total_len + bm25.doc_len.itemsize * len(bm25.doc_len)
+        return total
 
     def save(self):
-        """Saves the index and metadata to disk."""
-        if self.index is not None:
-            faiss.write_index(self.index, self.index_path)
-            with open(self.meta_path, "wb") as f:
-                pickle.dump(self.metadata, f)
-
-    async def ingest(self, texts: List[str], metadatas: List[Dict[str, Any]]):
-        """Ingests texts into the in-memory index."""
-        model = self._get_model()
-        vectors = model.encode(texts)
-        
-        start_index = self.index.ntotal
-        self.index.add_with_ids(np.array(vectors).astype(np.float32), np.arange(start_index, start_index + len(texts)))
-        
-        for text, meta in zip(texts, metadatas):
-            self.metadata.append({"text": text, "metadata": meta})
-
-    async def query(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
-        """Queries the in-memory index."""
-        if self.index is None or self.index.ntotal == 0:
-            return []
-        
-        model = self._get_model()
-        vec = model.encode([query])
-        _, indices = self.index.search(np.array(vec).astype(np.float32), k)
-        
-        return [self.metadata[i] for i in indices[0] if 0 <= i < len(self.metadata)]
+        """Sweeps expired entries, writes a snapshot of the index and empties the write-ahead log."""
+        with self._maintenance_lock, self.lock.write():
+            if self.index is not None:
+                self._expire()
+                self._snapshot()
+
+    def _snapshot(self) -> None:
+        with span("snapshot", ntotal=self.index.ntotal, logged=self._logged):
+            tmp = self.index_path + ".tmp"
+            if not isinstance(self.index, ann.MappedIndex):
+                faiss.write_index(self.index, tmp)
+                os.replace(tmp, self.index_path)
+            elif self.index.delta.ntotal:
+                # folding the delta in loads the whole index for the write
+                faiss.write_index(self.index.materialize(), tmp)
+                os.replace(tmp, self.index_path)
+            if self.mmap:
+                self.index = ann.MappedIndex(self.index_path)
+                ann.tune(self.index, self.index_spec)
+            if self.bm25 is not None:
+                with open(tmp, "wb") as f:
+                    self.bm25.save(f)
+                os.replace(tmp, self.bm25_path)
+            self.log.truncate()
+            self._logged = 0
+
+    def checkpoint(self) -> None:
+        """
+        Writes a snapshot and empties the write-ahead log like `save()`, but
+        only holds the read lock while the index is copied: the copy is
+        written while queries and ingests go on, new ingests logging to a
+        fresh log. Skipped if a compaction, which ends in a checkpoint, is
+        running.
+        """
+        self._ensure_loaded()
+        if not self._maintenance_lock.acquire(blocking=False):
+            return
+        try:
+            self._checkpoint()
+        finally:
+            self._maintenance_lock.release()
+
+    def _checkpoint(self) -> None:
+        """`checkpoint()` with the maintenance lock held."""
+        with self.lock.read():
+            # ingests are excluded while the read lock is held, so the copy
+            # and the rotated log hold the same vectors
+            with span("checkpoint_copy", ntotal=self.index.ntotal):
+                index = ann.copy(self.index)
+            bm25 = None
+            if self.bm25 is not None:
+                bm25 = io.BytesIO()
+                self.bm25.save(bm25)
+            self.log.rotate()
+            self._logged = 0
+            if self.mmap:
+                # adds from here on are replayed into the re-mapped index
+                self._compaction = []
+        try:
+            with span("snapshot", ntotal=index.ntotal, background=True):
+                tmp = self.index_path + ".tmp"
+                faiss.write_index(index, tmp)
+                os.replace(tmp, self.index_path)
+                if bm25 is not None:
+                    with open(tmp, "wb") as f:
+                        f.write(bm25.getbuffer())
+                    os.replace(tmp, self.bm25_path)
+            del index
+            with self.lock.write():
+                if self.mmap:
+                    mapped = ann.MappedIndex(self.index_path)
+                    ann.tune(mapped, self.index_spec)
+                    for ids, vectors in self._compaction:
+                        mapped.add_with_ids(vectors, ids)
+                    self.index = mapped
+                self.log.drop_rotated()
+        finally:
+            if self._compaction is not None:
+                with self.lock.write():
+                    self._compaction = None
+
+    def _background(self, job: Callable[[], None]) -> None:
+        """Queues `job` on the maintenance thread unless it is already queued; call with the write lock held."""
+        name = job.__name__
+        if name in self._queued:
+            return
+        self._queued.add(name)
+
+        def _run() -> None:
+            self._queued.discard(name)
+            job()
+
+        self._pool("compact").submit(contextvars.copy_context().run, _run)
+
+    async def ingest(self, texts: List[str], metadatas: List[Dict[str, Any]],
+                     ttl: Optional[float] = None) -> List[int]:
+        """
+        Ingests texts into the index, to expire after `ttl` seconds if
+        given. Returns each text's id, which for a near-duplicate is the id
+        of the entry it matched.
+        """
+        if self.index is None:
+            await self._offload("search", self._ensure_loaded)
+        vectors = await self._offload("encode", self._embed, texts)
+        expires_at = time.time() + ttl if ttl is not None else None
+        return await self._offload("search", self._add, texts, metadatas,
+                                   np.asarray(vectors, dtype=np.float32), expires_at)
+
+    def _add(self, texts: List[str], metadatas: List[Dict[str, Any]], vectors: np.ndarray,
+             expires_at: Optional[float] = None) -> List[int]:
+        with self.lock.write():
+            norms = np.linalg.norm(vectors, axis=1)
+            ids, first = self._dedup(vectors, norms, metadatas)
+            if (ids >= 0).any():
+                self.db.extend_expiry(np.unique(ids[ids >= 0]).tolist(), expires_at)
+            new = [i for i in range(len(texts)) if ids[i] < 0 and first[i] == i]
+            if new:
+                new_ids = np.arange(self._next_id, self._next_id + len(new), dtype=np.int64)
+                ids[new] = new_ids
+                self.db.add_many(((int(ids[i]), texts[i], metadatas[i]) for i in new),
+                                 norms[new].tolist(), expires_at)
+                self.log.append(new_ids, vectors[new])
+                self.index.add_with_ids(vectors[new], new_ids)
+                if self._compaction is not None:
+                    self._compaction.append((new_ids, vectors[new]))
+                if self.bm25 is not None:
+                    for i in new:
+                        self.bm25.add(int(ids[i]), texts[i])
+                self._next_id += len(new)
+                self._logged += len(new)
+                # rebuilds and snapshots would hold the write lock too long
+                if self._migration() is not None:
+                    self._background(self.compact)
+                if self._logged >= self.compact_every:
+                    self._background(self.checkpoint)
+            return ids[first].tolist()
+
+    def _dedup(self, vectors: np.ndarray, norms: np.ndarray,
+               metadatas: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Matches a batch against the store and itself; call with the write
+        lock held. Only entries with equal metadata can be duplicates. Returns
+        the id of the live entry each vector duplicates (-1 if none) and, per
+        vector, the position of the first vector in the batch it duplicates
+        (its own position if none).
+        """
+        n = len(vectors)
+        ids = np.full(n, -1, dtype=np.int64)
+        first = np.arange(n)
+        if not self.dedup_threshold:
+            return ids, first
+        # metadata as it reads back from SQLite, for comparison with stored entries
+        metadatas = [json.loads(json.dumps(meta, default=str)) for meta in metadatas]
+        if self.index.ntotal:
+            # the nearest hits may be deleted or expired; skip those
+            distances, indices = self.index.search(vectors, min(4, self.index.ntotal))
+            live = [i for i in np.unique(indices) if i >= 0 and i not in self._tombstones]
+            stored = self.db.norms_and_metadata(live)
+            for row in range(n):
+                for d, i in zip(distances[row], indices[row]):
+                    if int(i) not in stored:
+                        continue
+                    other, metadata = stored[int(i)]
+                    # cosine from the squared L2 distance and both norms
+                    denom = 2 * norms[row] * other
+                    if not denom or (norms[row] ** 2 + other ** 2 - d) / denom < self.dedup_threshold:
+                        break
+                    if metadata == metadatas[row]:
+                        ids[row] = i
+                        break
+        unit = vectors / np.maximum(norms, 1e-12)[:, None]
+        similar = unit @ unit.T >= self.dedup_threshold
+        keys = np.array([json.dumps(meta, sort_keys=True) for meta in metadatas], dtype=object)
+        for row in range(1, n):
+            if ids[row] < 0:
+                earlier = np.flatnonzero(similar[row, :row] & (keys[:row] == keys[row])
+                                         & (first[:row] == np.arange(row)))
+                if len(earlier):
+                    first[row] = earlier[0]
+        return ids, first
+
+    async def delete(self, ids: Optional[List[int]] = None, where: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Deletes entries by id and/or by equality on top-level metadata keys
+        (both conditions must hold when both are given). Returns how many
+        were deleted.
+        """
+        if self.index is None:
+            await self._offload("search", self._ensure_loaded)
+        return await self._offload("search", self._delete, ids, where)
+
+    def _delete(self, ids: Optional[List[int]], where: Optional[Dict[str, Any]]) -> int:
+        with self.lock.write():
+            deleted = self.db.delete(ids=ids, where=where)
+            self._tombstones.update(deleted)
+            self._maybe_compact()
+        return len(deleted)
+
+    def _expire(self) -> int:
+        """Deletes entries whose TTL has passed; call with the write lock held."""
+        expired = self.db.delete(expired_before=time.time())
+        if expired:
+            with span("memory_expire", entries=len(expired)):
+                self._tombstones.update(expired)
+                self._maybe_compact()
+        return len(expired)
+
+    def _maybe_compact(self) -> None:
+        """Starts a background compaction if tombstones pass `compact_ratio`; call with the write lock held."""
+        if (not self._maintenance_lock.locked() and self._tombstones
+                and len(self._tombstones) > self.compact_ratio * self.index.ntotal):
+            self._background(self.compact)
+
+    def compact(self) -> None:
+        """
+        Rebuilds the index and BM25 postings without deleted and expired
+        entries, as the index type the spec wants at the resulting size, and
+        checkpoints the result. The rebuild works on copies, so queries and
+        ingests go on meanwhile; only the final swap takes the write lock.
+        """
+        self._ensure_loaded()
+        if not self._maintenance_lock.acquire(blocking=False):
+            return
+        try:
+            with self.lock.write():
+                self._expire()
+                dead = np.array(sorted(self._tombstones), dtype=np.int64)
+                migrate = self._migration() is not None
+            if not len(dead) and not migrate:
+                return
+            with span("memory_compact", tombstones=len(dead)) as s:
+                with self.lock.read():
+                    # ingests from here on are buffered and replayed into the copy
+                    index = ann.copy(self.index)
+                    self._compaction = []
+                if len(dead):
+                    index = ann.remove(index, dead, self.index_spec)
+                target = self._migration(index)
+                if target is not None:
+                    with span("index_rebuild", source=ann.kind_of(index), target=target, ntotal=index.ntotal):
+                        index = ann.rebuild(index, target, self.index_spec)
+                ann.tune(index, self.index_spec)
+                bm25 = None
+                if self.bm25 is not None and len(dead):
+                    bm25 = BM25Index(self.bm25.k1, self.bm25.b)
+                    for rows in self.db.texts_from(0):
+                        for id_, text in rows:
+                            bm25.add(id_, text)
+                with self.lock.write():
+                    for ids, vectors in self._compaction:
+                        index.add_with_ids(vectors, ids)
+                    self._compaction = None
+                    if bm25 is not None:
+                        for rows in self.db.texts_from(bm25.next_id):
+                            for id_, text in rows:
+                                bm25.add(id_, text)
+                        self.bm25 = bm25
+                    self.index = index
+                    self._tombstones.difference_update(dead.tolist())
+                    s.set(ntotal=index.ntotal)
+            self._checkpoint()
+        finally:
+            if self._compaction is not None:
+                with self.lock.write():
+                    self._compaction = None
+            self._maintenance_lock.release()
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeddings of `texts`. Stored texts and recent queries come from the
+        embedding cache, so re-embedding query hits costs no model time.
+        """
+        return await self._offload("encode", self._embed, list(texts))
+
+    async def query(self, query: str, k: int = 5, where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Queries the index; `where` filters results as in `query_many`."""
+        return (await self.query_many([query], k, where))[0]
+
+    async def query_many(self, queries: List[str], k: int = 5,
+                         where: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Top `k` records for each of `queries`, from one batched encode and
+        one search over all of them. `where` keeps only records whose
+        top-level metadata keys equal the given scalar values (a list value
+        accepts any of its items).
+        """
+        if self.index is None:
+            await self._offload("search", self._ensure_loaded)
+        if self.index.ntotal == 0 or not queries:
+            return [[] for _ in queries]
+
+        vecs = await self._offload("encode", self._embed, list(queries))
+        return await self._offload("search", self._search, vecs, k, list(queries), where)
+
+    def _search(self, vecs: np.ndarray, k: int, texts: List[str],
+                where: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        vecs = np.asarray(vecs, dtype=np.float32)
+        # fusion needs deeper candidate lists than the k it returns
+        depth = max(4 * k, 20) if self.bm25 is not None or where else k
+        results: List[List[Dict[str, Any]]] = [[] for _ in texts]
+        with self.lock.read():
+            ntotal = self.index.ntotal
+            depth = min(depth, ntotal)
+            pending = list(range(len(texts)))
+            # queries short of k live hits (tombstones and expired entries
+            # are skipped) are searched again, deeper
+            while pending:
+                with span("faiss_search", k=depth, ntotal=ntotal, queries=len(pending)):
+                    _, indices = self.index.search(vecs[pending], depth)
+                rankings = []
+                for row, q in enumerate(pending):
+                    hits = [int(i) for i in indices[row] if i >= 0 and i not in self._tombstones]
+                    if self.bm25 is not None:
+                        with span("bm25_search", k=depth):
+                            lexical = [doc_id for doc_id, _ in self.bm25.search(texts[q], depth)
+                                       if doc_id not in self._tombstones]
+                        # ties go to the lexical ranking, the more literal of the two
+                        hits = reciprocal_rank_fusion([lexical, hits])
+                    rankings.append(np.array(hits, dtype=np.int64))
+                # expired entries not yet swept have no live row; the filter
+                # runs in SQLite, so only matching records are read
+                candidates = np.unique(np.concatenate(rankings))
+                records = self.db.get_many(candidates.tolist(), where)
+                allowed = np.fromiter(records, dtype=np.int64, count=len(records))
+                retry = []
+                for q, hits in zip(pending, rankings):
+                    hits = hits[np.isin(hits, allowed)]
+                    if len(hits) >= k or depth >= ntotal:
+                        results[q] = [records[i] for i in hits[:k].tolist()]
+                    else:
+                        retry.append(q)
+                pending = retry
+                depth = min(depth * 4, ntotal)
+        return results
+
+_stores: Dict[str, FaissStore] = {}
+_stores_lock = threading.Lock()
+
+def get_store(index_path: Optional[str] = None, meta_path: Optional[str] = None,
+              model_name: Optional[str] = None) -> FaissStore:
+    """
+    Returns the process-wide store for `index_path`, creating it on first
+    call. Defaults come from the MEMORY_PATH and EMBEDDING_MODEL environment
+    variables (set from the config by the CLI), so the memory tools and the
+    controller's MemoryManager share one index and one model.
+    """
+    index_path = index_path or os.getenv("MEMORY_PATH", DEFAULT_INDEX_PATH)
+    model_name = model_name or os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL_NAME)
+    key = os.path.abspath(index_path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            meta_path = meta_path or os.path.join(os.path.dirname(index_path), "meta.pkl")
+            store = _stores[key] = FaissStore(index_path, meta_path, model_name)
+        elif store.model_name != model_name:
+            raise ValueError(f"store {index_path} already uses model {store.model_name}, not {model_name}")
+        return store
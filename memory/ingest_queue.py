@@ -0,0 +1,109 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from .base import Memory
+
+_STOP = object()
+
+class IngestQueue:
+    """
+    Background ingestion for a long-term memory. Texts submitted close
+    together are coalesced into one `ingest` call (and so one batched
+    encode) of up to `max_batch` texts, waiting at most `max_delay` seconds
+    after the first one arrives. A single worker thread owns the batching,
+    so callers never block on the embedding model.
+    """
+    def __init__(self, memory: Memory, max_batch: int = 32, max_delay: float = 0.05):
+        self.memory = memory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.stats = {"batches": 0, "items": 0, "errors": 0}
+        self._queue: "queue.Queue" = queue.Queue()
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, text: str, metadata: Dict[str, Any], ttl: Optional[float] = None) -> Future:
+        """
+        Queues one text, to expire after `ttl` seconds if given; the future
+        resolves once it has been ingested.
+        """
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("ingest queue is closed")
+            self._pending += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name="memory-ingest", daemon=True)
+                self._thread.start()
+        self._queue.put((text, metadata, ttl, future))
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until everything submitted so far is ingested; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self) -> None:
+        """Flushes and stops the worker; later submits raise."""
+        with self._cond:
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _worker(self) -> None:
+        loop = asyncio.new_event_loop()
+        try:
+            stop = False
+            while not stop:
+                item = self._queue.get()
+                if item is _STOP:
+                    return
+                batch = [item]
+                deadline = time.monotonic() + self.max_delay
+                while len(batch) < self.max_batch:
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+                self._ingest(loop, batch)
+        finally:
+            loop.close()
+
+    def _ingest(self, loop: asyncio.AbstractEventLoop,
+                batch: List[Tuple[str, Dict[str, Any], Optional[float], Future]]) -> None:
+        # one ingest call per TTL in the batch, usually just one
+        groups: Dict[Optional[float], list] = {}
+        for item in batch:
+            groups.setdefault(item[2], []).append(item)
+        try:
+            for ttl, items in groups.items():
+                texts = [text for text, _, _, _ in items]
+                metadatas = [metadata for _, metadata, _, _ in items]
+                kwargs = {"ttl": ttl} if ttl is not None else {}
+                try:
+                    ids = loop.run_until_complete(self.memory.ingest(texts, metadatas, **kwargs))
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    for _, _, _, future in items:
+                        future.set_exception(e)
+                else:
+                    for i, (_, _, _, future) in enumerate(items):
+                        future.set_result(ids[i] if ids is not None else None)
+        finally:
+            self.stats["batches"] += 1
+            self.stats["items"] += len(batch)
+            with self._cond:
+                self._pending -= len(batch)
+                self._cond.notify_all()
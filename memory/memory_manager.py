@@ -1,54 +1,77 @@
+import asyncio
 from collections import deque
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+from tracing.tracer import span
 
 from .base import Memory
+from .context_packer import ContextPacker
+from .ingest_queue import IngestQueue
 
 class MemoryManager:
     """
     Manages a multi-layered memory system for an agent, combining a fixed-size
     short-term conversational buffer with a searchable long-term vector store.
+    Prompts are packed into `context_tokens` estimated tokens (see
+    `ContextPacker`).
     """
-    def __init__(self, long_term_memory: Memory, max_history_size: int = 10):
+    def __init__(self, long_term_memory: Memory, max_history_size: int = 10,
+                 ingest_batch_size: int = 32, ingest_window: float = 0.05,
+                 message_ttl: Optional[float] = None, context_tokens: int = 2048):
         self.short_term_memory = deque(maxlen=max_history_size)
         self.long_term_memory = long_term_memory
+        # seconds a message stays in the long-term store; None keeps it forever
+        self.message_ttl = message_ttl
+        self.packer = ContextPacker(context_tokens)
+        self.ingest_queue = IngestQueue(long_term_memory, ingest_batch_size, ingest_window)
 
     def load(self):
         """Loads the long-term memory from disk."""
         if hasattr(self.long_term_memory, 'load'):
             self.long_term_memory.load()
 
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits for queued messages to reach the long-term store."""
+        return self.ingest_queue.flush(timeout)
+
     def save(self):
-        """Saves the long-term memory to disk."""
+        """Flushes pending messages and saves the long-term memory to disk."""
+        self.flush()
         if hasattr(self.long_term_memory, 'save'):
             self.long_term_memory.save()
 
-    async def add_message(self, role: str, text: str):
+    async def add_message(self, role: str, text: str) -> asyncio.Future:
         """
-        Adds a message to the short-term history and ingests it into the
-        long-term vector store.
+        Adds a message to the short-term history and queues it for the
+        long-term vector store. Returns at once with a future that resolves
+        when the message has been ingested; until then it is still part of
+        the prompt through the short-term history. The future's result is
+        the message's id in the store, where the store reports one.
         """
         self.short_term_memory.append({"role": role, "text": text})
-        await self.long_term_memory.ingest([text], [{"role": role}])
+        return asyncio.wrap_future(self.ingest_queue.submit(text, {"role": role}, self.message_ttl))
 
     async def construct_prompt(self, query: str, k: int = 3) -> str:
         """
         Constructs an augmented prompt containing relevant context from both
-        long-term and short-term memory.
+        long-term and short-term memory, within the packer's token budget.
+        Retrieval over-fetches and keeps `k` documents chosen by maximal
+        marginal relevance, using the store's embeddings when it exposes them.
         """
-        # 1. Retrieve relevant documents from the long-term store
-        retrieved_docs = await self.long_term_memory.query(query, k=k)
-        
-        # 2. Build the prompt string
-        prompt = "### Context\n"
-        prompt += "This is relevant information from past conversations:\n"
-        for doc in retrieved_docs:
-            prompt += f"- {doc.get('text', '')}\n"
-        
-        prompt += "\n### Conversation History\n"
-        prompt += "This is the recent conversation history:\n"
-        for message in self.short_term_memory:
-            prompt += f"{message['role'].capitalize()}: {message['text']}\n"
-            
-        prompt += f"\n### User Query\n{query}"
-        
-        return prompt
\ No newline at end of file
+        with span("construct_prompt", k=k) as s:
+            # 1. Retrieve candidates from the long-term store
+            retrieved_docs = await self.long_term_memory.query(query, k=4 * k)
+
+            # 2. Keep a relevant but diverse k, skipping what the history already shows
+            query_vector = doc_vectors = None
+            if retrieved_docs and hasattr(self.long_term_memory, "embed"):
+                vectors = await self.long_term_memory.embed([query] + [doc.get("text", "") for doc in retrieved_docs])
+                query_vector, doc_vectors = vectors[0], vectors[1:]
+            history = list(self.short_term_memory)
+            docs = self.packer.select(retrieved_docs, k, query_vector, doc_vectors,
+                                      exclude=[message["text"] for message in history])
+
+            # 3. Fill the token budget
+            prompt = self.packer.pack(query, docs, history)
+            s.set(candidates=len(retrieved_docs), docs=len(docs), chars=len(prompt))
+            return prompt
@@ -0,0 +1,301 @@
+"""
+On-disk layout of a FaissStore between snapshots.
+
+Each ingest commits its texts and metadata to SQLite and appends its vectors
+to a write-ahead log next to the index, so nothing is lost if the process
+dies before `save()`. `save()` writes a FAISS snapshot and empties the log.
+At load the snapshot is read, and log records with ids past the snapshot's
+highest id are replayed if SQLite still holds their metadata. Metadata stays
+in SQLite and is fetched by id for the hits a query returns. SQLite also
+keeps the next unused id, so the id of a deleted entry is never handed out
+again.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+_LIVE = "(expires_at IS NULL OR expires_at > ?)"
+# ids bound per statement, well under SQLite's variable limit (999 before 3.32)
+_ID_BATCH = 500
+
+def _metadata_path(key: str) -> str:
+    return '$."' + key.replace('"', '\\"') + '"'
+
+def _batches(ids: Sequence[int]) -> Iterator[List[int]]:
+    ids = [int(i) for i in ids]
+    for start in range(0, len(ids), _ID_BATCH):
+        yield ids[start:start + _ID_BATCH]
+
+def _where_sql(where: Optional[Dict[str, Any]], lists: bool) -> Tuple[List[str], List[Any]]:
+    """
+    SQL conditions for equality on top-level metadata keys; None matches a
+    missing key. With `lists`, a list value matches any of its items.
+    """
+    clauses, params = [], []
+    for key, value in (where or {}).items():
+        options = value if lists and isinstance(value, list) else [value]
+        terms = []
+        for option in options:
+            if option is None:
+                terms.append("json_extract(metadata, ?) IS NULL")
+                params.append(_metadata_path(key))
+            elif isinstance(option, (str, int, float, bool)):
+                terms.append("json_extract(metadata, ?) = ?")
+                params.extend([_metadata_path(key), option])
+            else:
+                raise ValueError(f"metadata filter on {key!r} must be a scalar, got {type(option).__name__}")
+        clauses.append("(" + " OR ".join(terms) + ")" if terms else "0")
+    return clauses, params
+
+class MetadataDB:
+    """
+    Texts and metadata keyed by vector id, with each vector's norm (for
+    cosine checks against L2 search results) and an optional expiry time.
+    A deleted id simply has no row; the index drops it at compaction.
+    `next_id` only grows, whatever is deleted.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY, text TEXT NOT NULL, metadata TEXT NOT NULL)")
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(items)")}
+            for column in ("norm", "expires_at"):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE items ADD COLUMN {column} REAL")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS items_expiry ON items (expires_at) WHERE expires_at IS NOT NULL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def add_many(self, rows: Iterable[Tuple[int, str, Dict[str, Any]]],
+                 norms: Optional[Sequence[float]] = None, expires_at: Optional[float] = None) -> None:
+        rows = list(rows)
+        norms = list(norms) if norms is not None else [None] * len(rows)
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO items (id, text, metadata, norm, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    ((id_, text, json.dumps(meta, default=str), norm, expires_at)
+                     for (id_, text, meta), norm in zip(rows, norms)),
+                )
+                if rows:
+                    self._conn.execute(
+                        "INSERT INTO state (key, value) VALUES ('next_id', ?) "
+                        "ON CONFLICT (key) DO UPDATE SET value = max(value, excluded.value)",
+                        (max(row[0] for row in rows) + 1,))
+
+    def get_many(self, ids: Sequence[int], where: Optional[Dict[str, Any]] = None) -> Dict[int, Dict[str, Any]]:
+        """
+        The live (existing, unexpired) records for `ids`, as {"text",
+        "metadata"} dicts. `where` keeps only records whose top-level
+        metadata keys equal the given values (a list accepts any of its items).
+        """
+        clauses, params = _where_sql(where, lists=True)
+        condition = "".join(f" AND {clause}" for clause in clauses)
+        records = {}
+        for batch in _batches(ids):
+            marks = ",".join("?" * len(batch))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, text, metadata FROM items WHERE id IN ({marks}) AND {_LIVE}{condition}",
+                    batch + [time.time()] + params).fetchall()
+            records.update((id_, {"text": text, "metadata": json.loads(meta)}) for id_, text, meta in rows)
+        return records
+
+    def norms_and_metadata(self, ids: Sequence[int]) -> Dict[int, Tuple[float, Dict[str, Any]]]:
+        """Vector norm and metadata of the live records among `ids` that have a norm."""
+        stored = {}
+        for batch in _batches(ids):
+            marks = ",".join("?" * len(batch))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, norm, metadata FROM items WHERE id IN ({marks}) AND norm IS NOT NULL AND {_LIVE}",
+                    batch + [time.time()]).fetchall()
+            stored.update((id_, (norm, json.loads(meta))) for id_, norm, meta in rows)
+        return stored
+
+    def extend_expiry(self, ids: Sequence[int], expires_at: Optional[float]) -> None:
+        """Pushes the expiry of `ids` out to `expires_at` (None: never expire)."""
+        for batch in _batches(ids):
+            marks = ",".join("?" * len(batch))
+            with self._lock:
+                with self._conn:
+                    if expires_at is None:
+                        self._conn.execute(f"UPDATE items SET expires_at = NULL WHERE id IN ({marks})", batch)
+                    else:
+                        self._conn.execute(
+                            f"UPDATE items SET expires_at = ? WHERE id IN ({marks}) AND expires_at < ?",
+                            [expires_at] + batch + [expires_at])
+
+    def next_id(self) -> int:
+        """One past the highest id ever added, deleted or not."""
+        with self._lock:
+            stored = self._conn.execute("SELECT value FROM state WHERE key = 'next_id'").fetchone()
+            highest = self._conn.execute("SELECT MAX(id) FROM items").fetchone()[0]
+        return max(stored[0] if stored else 0, highest + 1 if highest is not None else 0)
+
+    def all_ids(self) -> List[int]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT id FROM items")]
+
+    def delete(self, ids: Optional[Sequence[int]] = None, where: Optional[Dict[str, Any]] = None,
+               expired_before: Optional[float] = None) -> List[int]:
+        """
+        Deletes records by id, by equality on top-level metadata keys, or
+        by expiry (conditions combine with AND); returns the deleted ids.
+        """
+        clauses, params = _where_sql(where, lists=False)
+        if expired_before is not None:
+            clauses.append("expires_at <= ?")
+            params.append(expired_before)
+        if ids is None and not clauses:
+            raise ValueError("delete needs ids, a metadata filter or an expiry time")
+        # one statement per batch of ids, all in one transaction
+        statements = ([([f"id IN ({','.join('?' * len(batch))})"], batch) for batch in _batches(ids)]
+                      if ids is not None else [([], [])])
+        deleted = []
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                for id_clause, id_params in statements:
+                    condition = " AND ".join(id_clause + clauses)
+                    deleted += [row[0] for row in
+                                self._conn.execute(f"SELECT id FROM items WHERE {condition}", id_params + params)]
+                    self._conn.execute(f"DELETE FROM items WHERE {condition}", id_params + params)
+        return deleted
+
+    def ids_from(self, first_id: int) -> Set[int]:
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT id FROM items WHERE id >= ?", (first_id,))}
+
+    def texts_from(self, first_id: int, batch: int = 10_000) -> Iterator[List[Tuple[int, str]]]:
+        """Yields (id, text) pairs with id >= `first_id` in id order, a batch at a time."""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, text FROM items WHERE id >= ? ORDER BY id LIMIT ?", (first_id, batch)).fetchall()
+            if not rows:
+                return
+            yield rows
+            first_id = rows[-1][0] + 1
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def delete_from(self, first_id: int) -> int:
+        """Drops records with id >= `first_id` (ingests whose vectors never reached the log)."""
+        with self._lock:
+            with self._conn:
+                return self._conn.execute("DELETE FROM items WHERE id >= ?", (first_id,)).rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class VectorLog:
+    """
+    Append-only file of (id, vector) records of a fixed size. A torn final
+    record, left by a crash mid-append, is cut off when the log is opened.
+    `rotate` sets the records so far aside (in `path + ".old"`) while a
+    snapshot of them is written; they are replayed with the rest until
+    `drop_rotated` removes them.
+    """
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.rotated_path = path + ".old"
+        self.dim = dim
+        self.record = np.dtype([("id", "<i8"), ("vector", "<f4", (dim,))])
+        if os.path.exists(path):
+            size = os.path.getsize(path)
+            if size % self.record.itemsize:
+                os.truncate(path, size - size % self.record.itemsize)
+        self._file = open(path, "ab")
+
+    def append(self, ids: Sequence[int], vectors: np.ndarray) -> None:
+        records = np.empty(len(ids), dtype=self.record)
+        records["id"] = ids
+        records["vector"] = vectors
+        self._file.write(records.tobytes())
+        self._file.flush()
+
+    def _records(self, path: str) -> int:
+        return os.path.getsize(path) // self.record.itemsize if os.path.exists(path) else 0
+
+    def __len__(self) -> int:
+        return self._records(self.rotated_path) + self._records(self.path)
+
+    def replay(self, chunk: int = 65536) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yields (ids, vectors) batches of every complete record, oldest first."""
+        for path in (self.rotated_path, self.path):
+            total = self._records(path)
+            if not total:
+                continue
+            records = np.memmap(path, dtype=self.record, mode="r", shape=(total,))
+            for start in range(0, total, chunk):
+                part = records[start:start + chunk]
+                yield np.array(part["id"]), np.array(part["vector"])
+
+    def rewrite(self, ids: np.ndarray) -> None:
+        """Rewrites the log, rotated part included, keeping only the records of `ids`."""
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as out:
+            for log_ids, vectors in self.replay():
+                keep = np.isin(log_ids, ids)
+                records = np.empty(int(keep.sum()), dtype=self.record)
+                records["id"] = log_ids[keep]
+                records["vector"] = vectors[keep]
+                out.write(records.tobytes())
+        self._file.close()
+        os.replace(tmp, self.path)
+        self.drop_rotated()
+        self._file = open(self.path, "ab")
+
+    def rotate(self) -> None:
+        """Sets the records so far aside and continues in an empty log."""
+        self._file.close()
+        if os.path.exists(self.rotated_path):
+            # an earlier rotation was never dropped: keep both
+            with open(self.rotated_path, "ab") as old, open(self.path, "rb") as new:
+                shutil.copyfileobj(new, old)
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self.rotated_path)
+        self._file = open(self.path, "ab")
+
+    def drop_rotated(self) -> None:
+        """Removes the rotated records once a snapshot holds them."""
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+    def truncate(self) -> None:
+        """Empties the log once its records are in a snapshot."""
+        self._file.truncate(0)
+        self._file.flush()
+        self.drop_rotated()
+
+    def close(self) -> None:
+        self._file.close()
+
+def migrate_pickle(pickle_path: str, db: MetadataDB) -> int:
+    """
+    Copies a legacy pickled metadata list into `db`, with ids matching list
+    positions as the old store assigned them, and renames the pickle aside.
+    Returns the number of records moved.
+    """
+    import pickle
+
+    with open(pickle_path, "rb") as f:
+        records: List[Dict[str, Any]] = pickle.load(f)
+    db.add_many((i, r.get("text", ""), r.get("metadata", {})) for i, r in enumerate(records))
+    os.replace(pickle_path, pickle_path + ".migrated")
+    return len(records)
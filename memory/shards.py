@@ -0,0 +1,233 @@
+"""
+Per-namespace memory shards.
+
+Each namespace (a user, project or session) gets its own FaissStore under
+`root/<namespace>/`, so tenants never see each other's memories and only
+the namespaces in use need to be in RAM.
+"""
+import asyncio
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from .embedding_cache import EmbeddingCache
+from .faiss_store import DEFAULT_MODEL_NAME, DEFAULT_INDEX_PATH, FaissStore, _env_int, get_store
+
+_NAMESPACE = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,127}")
+
+class ShardedMemory:
+    """
+    One FaissStore per namespace under `root`, opened on first use. Loaded
+    shards are kept in least-recently-used order; after each call, idle
+    shards are saved and unloaded, oldest first, until the estimated RAM of
+    the loaded ones fits `ram_budget` bytes (by default MEMORY_SHARD_RAM_MB).
+    All shards share the process-wide model and one embedding cache.
+    """
+    def __init__(self, root: str, model_name: str = DEFAULT_MODEL_NAME, ram_budget: Optional[int] = None,
+                 cache_embeddings: bool = True, **store_kwargs: Any):
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.model_name = model_name
+        self.ram_budget = ram_budget if ram_budget is not None else _env_int("MEMORY_SHARD_RAM_MB", 1024) * 2**20
+        self.embedding_cache = EmbeddingCache(os.path.join(root, "embeddings"), model_name) if cache_embeddings else None
+        self.store_kwargs = store_kwargs
+        self.stats = {"evictions": 0}
+        self._shards: "OrderedDict[str, FaissStore]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._busy: Dict[str, int] = {}
+        self._unloading: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def shard(self, namespace: str) -> FaissStore:
+        """The store for `namespace`, created (but not loaded) on first call."""
+        if not _NAMESPACE.fullmatch(namespace):
+            raise ValueError(f"invalid memory namespace {namespace!r}; use letters, digits, '_', '.' and '-'")
+        with self._lock:
+            store = self._shards.get(namespace)
+            if store is None:
+                directory = os.path.join(self.root, namespace)
+                os.makedirs(directory, exist_ok=True)
+                store = self._shards[namespace] = FaissStore(
+                    os.path.join(directory, os.path.basename(DEFAULT_INDEX_PATH)), os.path.join(directory, "meta.pkl"),
+                    self.model_name, cache_embeddings=self.embedding_cache is not None,
+                    embedding_cache=self.embedding_cache, **self.store_kwargs)
+            return store
+
+    def loaded(self) -> List[str]:
+        """Namespaces whose index is in memory, least recently used first."""
+        with self._lock:
+            return [ns for ns, store in self._shards.items() if store.index is not None]
+
+    @asynccontextmanager
+    async def _use(self, namespace: str) -> AsyncIterator[FaissStore]:
+        store = self.shard(namespace)
+        while True:
+            with self._lock:
+                unloading = self._unloading.get(namespace)
+                if unloading is None:
+                    self._busy[namespace] = self._busy.get(namespace, 0) + 1
+                    self._shards.move_to_end(namespace)
+                    break
+            await asyncio.to_thread(unloading.wait)
+        try:
+            yield store
+        finally:
+            with self._lock:
+                self._busy[namespace] -= 1
+                self._sizes[namespace] = store.memory_bytes()
+            await asyncio.to_thread(self._evict)
+
+    def _evict(self) -> None:
+        """Unloads idle shards, least recently used first, until the rest fit the RAM budget."""
+        with self._lock:
+            total = sum(self._sizes.values())
+            victims = []
+            for namespace, store in self._shards.items():
+                if total <= self.ram_budget:
+                    break
+                if self._busy.get(namespace) or namespace in self._unloading or store.index is None:
+                    continue
+                total -= self._sizes.pop(namespace, 0)
+                self._unloading[namespace] = threading.Event()
+                victims.append(namespace)
+        for namespace in victims:
+            try:
+                self._shards[namespace].unload()
+                self.stats["evictions"] += 1
+            finally:
+                with self._lock:
+                    self._unloading.pop(namespace).set()
+
+    async def ingest(self, namespace: str, texts: List[str], metadatas: List[Dict[str, Any]],
+                     ttl: Optional[float] = None) -> List[int]:
+        async with self._use(namespace) as store:
+            return await store.ingest(texts, metadatas, ttl=ttl)
+
+    async def delete(self, namespace: str, ids: Optional[List[int]] = None,
+                     where: Optional[Dict[str, Any]] = None) -> int:
+        async with self._use(namespace) as store:
+            return await store.delete(ids, where)
+
+    async def embed(self, namespace: str, texts: List[str]) -> np.ndarray:
+        async with self._use(namespace) as store:
+            return await store.embed(texts)
+
+    async def query(self, namespaces: Union[str, Sequence[str]], query: str, k: int = 5,
+                    where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return (await self.query_many(namespaces, [query], k, where))[0]
+
+    async def query_many(self, namespaces: Union[str, Sequence[str]], queries: List[str], k: int = 5,
+                         where: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Top `k` records per query from one namespace, or merged across
+        several. Merged results are ranked by cosine similarity of their
+        embeddings to the query, which is comparable between shards where
+        their own (fused) rankings are not, and name their namespace.
+        """
+        if isinstance(namespaces, str):
+            async with self._use(namespaces) as store:
+                return await store.query_many(queries, k, where)
+        namespaces = list(dict.fromkeys(namespaces))
+        if len(namespaces) == 1:
+            results = await self.query_many(namespaces[0], queries, k, where)
+            return [[dict(record, namespace=namespaces[0]) for record in hits] for hits in results]
+
+        per_shard = await asyncio.gather(*(self.query_many(ns, queries, k, where) for ns in namespaces))
+        candidates = [[dict(record, namespace=ns) for ns, results in zip(namespaces, per_shard) for record in results[q]]
+                      for q in range(len(queries))]
+        texts = list(queries) + [record["text"] for hits in candidates for record in hits]
+        # every text was embedded at ingest or by the searches above, so these are cache hits
+        vectors = await self.embed(namespaces[0], texts)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        merged, offset = [], len(queries)
+        for q, hits in enumerate(candidates):
+            scores = vectors[offset:offset + len(hits)] @ vectors[q]
+            offset += len(hits)
+            order = np.argsort(-scores, kind="stable")[:k]
+            merged.append([hits[i] for i in order.tolist()])
+        return merged
+
+    def namespace(self, namespace: str) -> "NamespaceMemory":
+        """A Memory bound to one namespace, for MemoryManager and the like."""
+        self.shard(namespace)
+        return NamespaceMemory(self, namespace)
+
+    def save(self) -> None:
+        """Saves every loaded shard."""
+        with self._lock:
+            stores = list(self._shards.values())
+        for store in stores:
+            store.save()
+
+    def close(self) -> None:
+        """Saves and unloads every shard."""
+        with self._lock:
+            stores = list(self._shards.values())
+        for store in stores:
+            store.unload()
+        with self._lock:
+            self._sizes.clear()
+
+class NamespaceMemory:
+    """The Memory interface over one namespace of a ShardedMemory."""
+    def __init__(self, shards: ShardedMemory, namespace: str):
+        self.shards = shards
+        self.namespace = namespace
+
+    async def ingest(self, texts: List[str], metadatas: List[Dict[str, Any]],
+                     ttl: Optional[float] = None) -> List[int]:
+        return await self.shards.ingest(self.namespace, texts, metadatas, ttl)
+
+    async def query(self, query: str, k: int = 5, where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return await self.shards.query(self.namespace, query, k, where)
+
+    async def query_many(self, queries: List[str], k: int = 5,
+                         where: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        return await self.shards.query_many(self.namespace, queries, k, where)
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        return await self.shards.embed(self.namespace, texts)
+
+    async def delete(self, ids: Optional[List[int]] = None, where: Optional[Dict[str, Any]] = None) -> int:
+        return await self.shards.delete(self.namespace, ids, where)
+
+    def load(self) -> None:
+        """Nothing to do: the shard loads on first use."""
+
+    def save(self) -> None:
+        self.shards.shard(self.namespace).save()
+
+_sharded: Optional[ShardedMemory] = None
+_sharded_lock = threading.Lock()
+
+def get_sharded_memory() -> ShardedMemory:
+    """
+    Returns the process-wide ShardedMemory, rooted at MEMORY_SHARDS_PATH or
+    next to MEMORY_PATH, using the EMBEDDING_MODEL like `get_store`.
+    """
+    global _sharded
+    with _sharded_lock:
+        if _sharded is None:
+            index_path = os.getenv("MEMORY_PATH", DEFAULT_INDEX_PATH)
+            root = os.getenv("MEMORY_SHARDS_PATH") or os.path.join(os.path.dirname(index_path), "shards")
+            _sharded = ShardedMemory(root, os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL_NAME))
+        return _sharded
+
+def search_namespaces() -> List[str]:
+    """
+    The namespaces the memory tools may search: the session's own
+    (MEMORY_NAMESPACE) first, then those allowed by MEMORY_SEARCH_NAMESPACES,
+    a comma-separated list. Empty when neither is set.
+    """
+    namespaces = [os.getenv("MEMORY_NAMESPACE", "")] + os.getenv("MEMORY_SEARCH_NAMESPACES", "").split(",")
+    return list(dict.fromkeys(ns.strip() for ns in namespaces if ns.strip()))
+
+def get_memory() -> Union[FaissStore, NamespaceMemory]:
+    """The session's own memory: its MEMORY_NAMESPACE shard if set, else the shared store."""
+    namespace = os.getenv("MEMORY_NAMESPACE")
+    return get_sharded_memory().namespace(namespace) if namespace else get_store()
@@ -3,6 +3,8 @@ import tempfile
 import textwrap
 from pathlib import Path
 
+from tracing.tracer import span
+
 from .base import Sandbox
 
 class DockerSandbox(Sandbox):
@@ -16,7 +18,7 @@ class DockerSandbox(Sandbox):
         cpus: str | None = "0.5",
         network: bool = False,
     ) -> dict:
-        with tempfile.TemporaryDirectory() as td:
+        with span("sandbox", backend="docker"), tempfile.TemporaryDirectory() as td:
             host_path = Path(td)
             container_path = "/workspace"
             script_path = host_path / "snippet.py"
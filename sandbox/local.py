@@ -3,6 +3,8 @@ import tempfile
 import textwrap
 from pathlib import Path
 
+from tracing.tracer import span
+
 from .base import Sandbox
 
 class LocalSandbox(Sandbox):
@@ -16,7 +18,7 @@ class LocalSandbox(Sandbox):
         cpus: str | None = None,  # ignored
         network: bool = False,  # ignored
     ) -> dict:
-        with tempfile.TemporaryDirectory() as td:
+        with span("sandbox", backend="local"), tempfile.TemporaryDirectory() as td:
             script = Path(td) / "snippet.py"
             script.write_text(textwrap.dedent(code))
             try:
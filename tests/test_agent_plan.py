@@ -0,0 +1,211 @@
+import unittest
+import asyncio
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agent.agent import Agent
+from tools.tool_base import Tool, ToolRegistry
+
+def make_config(**overrides):
+    config = dict(model="test", max_turns=3, max_tokens=256, temperature=0.0, debug=0, max_parallel_tools=4, stream=False,
+                  prompt_token_budget=None, max_tool_output_chars=None)
+    config.update(overrides)
+    return SimpleNamespace(**config)
+
+def make_registry():
+    # all but "write" are read-only, and none is cacheable, so the scheduler
+    # alone decides what overlaps
+    registry = ToolRegistry()
+    registry.writes = []
+
+    def _sleep(args):
+        time.sleep(args["seconds"])
+        return f"slept {args['seconds']}"
+
+    def _echo(args):
+        return f"echo {args['text']}"
+
+    async def _aecho(args):
+        await asyncio.sleep(0.2)
+        return f"aecho {args['text']}"
+
+    def _write(args):
+        time.sleep(0.1)
+        registry.writes.append(args["text"])
+        return "written"
+
+    def _read(args):
+        return f"read {list(registry.writes)}"
+
+    registry.register(Tool("sleep", "sleeps", {"type": "object", "properties": {"seconds": {"type": "number"}}}, _sleep,
+                           read_only=True))
+    registry.register(Tool("aecho", "echoes asynchronously", {"type": "object", "properties": {"text": {}}}, _aecho,
+                           read_only=True))
+    registry.register(Tool("echo", "echoes", {"type": "object", "properties": {"text": {}}}, _echo, read_only=True))
+    registry.register(Tool("write", "writes", {"type": "object", "properties": {"text": {}}}, _write))
+    registry.register(Tool("read", "reads what was written", {"type": "object", "properties": {}}, _read,
+                           read_only=True))
+    return registry
+
+class TestPlanExecution(unittest.TestCase):
+    def setUp(self):
+        self.agent = Agent(make_config(), make_registry())
+
+    def test_independent_steps_run_concurrently(self):
+        plan = [{"tool": "sleep", "args": {"seconds": 0.2}} for _ in range(4)]
+        start = time.perf_counter()
+        outputs = self.agent._execute_plan(plan, [])
+        elapsed = time.perf_counter() - start
+        self.assertEqual(outputs, ["slept 0.2"] * 4)
+        self.assertLess(elapsed, 0.6)
+
+    def test_read_only_tools_overlap_even_if_not_cacheable(self):
+        self.assertFalse(self.agent.registry.describe("sleep").cacheable)
+        plan = [{"tool": "sleep", "args": {"seconds": 0.2}} for _ in range(5)]
+        start = time.perf_counter()
+        self.agent._execute_plan(plan, [])
+        self.assertLess(time.perf_counter() - start, 0.6)
+
+    def test_writing_tool_is_a_barrier(self):
+        plan = [{"tool": "write", "args": {"text": str(i)}} for i in range(4)]
+        start = time.perf_counter()
+        self.agent._execute_plan(plan, [])
+        self.assertGreaterEqual(time.perf_counter() - start, 0.4)
+        self.assertEqual(self.agent.registry.writes, ["0", "1", "2", "3"])
+
+    def test_dependencies_are_substituted_in_order(self):
+        plan = [
+            {"tool": "sleep", "args": {"seconds": 0.1}},
+            {"tool": "echo", "args": {"text": "$1.output"}},
+            {"tool": "echo", "args": {"text": "first"}},
+        ]
+        outputs = self.agent._execute_plan(plan, [])
+        self.assertEqual(outputs, ["slept 0.1", "echo slept 0.1", "echo first"])
+
+    def test_references_span_previous_plans(self):
+        outputs = self.agent._execute_plan([{"tool": "echo", "args": {"text": "a"}}], [])
+        outputs = self.agent._execute_plan([
+            {"tool": "echo", "args": {"text": "$1.output"}},
+            {"tool": "echo", "args": {"text": "$2.output"}},
+        ], outputs)
+        self.assertEqual(outputs, ["echo a", "echo echo a", "echo echo echo a"])
+
+    def test_steps_with_side_effects_keep_plan_order(self):
+        plan = [
+            {"tool": "read", "args": {}},
+            {"tool": "write", "args": {"text": "a"}},
+            {"tool": "write", "args": {"text": "b"}},
+            {"tool": "read", "args": {}},
+            {"tool": "sleep", "args": {"seconds": 0.1}},
+        ]
+        outputs = self.agent._execute_plan(plan, [])
+        self.assertEqual(outputs, ["read []", "written", "written", "read ['a', 'b']", "slept 0.1"])
+
+    def test_errors_are_returned_as_results(self):
+        outputs = self.agent._execute_plan([{"tool": "missing", "args": {}}], [])
+        self.assertEqual(len(outputs), 1)
+        self.assertIn("missing", outputs[0])
+
+class TestAsyncPlanExecution(unittest.TestCase):
+    def setUp(self):
+        self.agent = Agent(make_config(), make_registry())
+
+    def test_coroutine_tools_are_awaited(self):
+        plan = [{"tool": "aecho", "args": {"text": str(i)}} for i in range(3)]
+        plan.append({"tool": "echo", "args": {"text": "$1.output"}})
+        start = time.perf_counter()
+        outputs = asyncio.run(self.agent._aexecute_plan(plan, []))
+        elapsed = time.perf_counter() - start
+        self.assertEqual(outputs, ["aecho 0", "aecho 1", "aecho 2", "echo aecho 0"])
+        self.assertLess(elapsed, 0.5)
+
+    def test_steps_with_side_effects_keep_plan_order(self):
+        plan = [
+            {"tool": "write", "args": {"text": "a"}},
+            {"tool": "read", "args": {}},
+            {"tool": "aecho", "args": {"text": "x"}},
+            {"tool": "write", "args": {"text": "b"}},
+        ]
+        outputs = asyncio.run(self.agent._aexecute_plan(plan, []))
+        self.assertEqual(outputs, ["written", "read ['a']", "aecho x", "written"])
+        self.assertEqual(self.agent.registry.writes, ["a", "b"])
+
+    def test_sync_path_awaits_coroutine_tools(self):
+        outputs = self.agent._execute_plan([{"tool": "aecho", "args": {"text": "x"}}], [])
+        self.assertEqual(outputs, ["aecho x"])
+
+class TestStreamingTurn(unittest.TestCase):
+    def setUp(self):
+        self.agent = Agent(make_config(stream=True), make_registry())
+
+    def test_first_step_starts_before_reply_ends(self):
+        finished_before_end = []
+
+        def _stream_reply(prompt, usage=None):
+            yield '[{"tool": "sleep", "args": {"seconds": 0.1}},'
+            time.sleep(0.3)
+            finished_before_end.append(self.agent.registry.calls)
+            yield ' {"tool": "echo", "args": {"text": "$1.output"}}]'
+
+        self.agent.registry.calls = 0
+        get = self.agent.registry.get
+
+        def _counting_get(name):
+            tool = get(name)
+            self.agent.registry.calls += 1
+            return tool
+
+        self.agent.registry.get = _counting_get
+        self.agent._stream_reply = _stream_reply
+        reply, outputs = self.agent._stream_turn("prompt", [])
+        self.assertEqual(finished_before_end, [1])
+        self.assertEqual(outputs, ["slept 0.1", "echo slept 0.1"])
+        self.assertTrue(reply.startswith("["))
+
+    def test_unparsable_step_keeps_references_aligned(self):
+        self.agent._stream_reply = lambda prompt, usage=None: iter([
+            '[{"tool": echo}, {"tool": "echo", "args": {"text": "a"}}, ',
+            '{"tool": "echo", "args": {"text": "$2.output"}}]'])
+        reply, outputs = self.agent._stream_turn("prompt", [])
+        self.assertIn("Invalid plan step", outputs[0])
+        self.assertEqual(outputs[1:], ["echo a", "echo echo a"])
+
+    def test_prose_reply_ends_the_loop(self):
+        self.agent._stream_reply = lambda prompt, usage=None: iter(["The answer", " is 42."])
+        reply, outputs = self.agent._stream_turn("prompt", [])
+        self.assertEqual(reply, "The answer is 42.")
+        self.assertIsNone(outputs)
+
+    def test_prose_wrapped_plan_is_run_but_not_shown(self):
+        chunks = ["Let me check.\n```json\n", '[{"tool": "echo", "args": {"text": "a"}}]', "\n```"]
+        self.agent._stream_reply = lambda prompt, usage=None: iter(chunks)
+        with redirect_stdout(io.StringIO()) as stdout:
+            reply, outputs = self.agent._stream_turn("prompt", [])
+        self.assertEqual(outputs, ["echo a"])
+        self.assertEqual(stdout.getvalue(), "\nAssistant:\nLet me check.\n\n")
+
+        self.agent._astream_reply = lambda prompt, usage=None: _aiter(chunks)
+        with redirect_stdout(io.StringIO()) as stdout:
+            reply, outputs = asyncio.run(self.agent._astream_turn("prompt", []))
+        self.assertEqual(outputs, ["echo a"])
+        self.assertNotIn("tool", stdout.getvalue())
+
+    def test_held_back_text_of_an_answer_is_printed(self):
+        self.agent._stream_reply = lambda prompt, usage=None: iter(["See [note] and", " `x`."])
+        with redirect_stdout(io.StringIO()) as stdout:
+            reply, outputs = self.agent._stream_turn("prompt", [])
+        self.assertIsNone(outputs)
+        self.assertEqual(stdout.getvalue(), "\nAssistant:\nSee [note] and `x`.\n")
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+if __name__ == "__main__":
+    unittest.main()
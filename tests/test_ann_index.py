@@ -0,0 +1,136 @@
+import unittest
+import asyncio
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from memory import ann, faiss_store
+from memory.faiss_store import FaissStore
+from tests.test_memory_store import HashingModel
+
+class TestIndexSpec(unittest.TestCase):
+    def test_auto_targets_by_size(self):
+        spec = ann.IndexSpec(ivf_at=100, pq_at=1000)
+        self.assertEqual([spec.target(n) for n in (0, 99, 100, 999, 1000)],
+                         ["flat", "flat", "ivf_flat", "ivf_flat", "ivf_pq"])
+        self.assertEqual(spec.migration("flat", 150), "ivf_flat")
+        self.assertIsNone(spec.migration("ivf_pq", 150))
+        self.assertIsNone(spec.migration("hnsw", 150))
+
+    def test_pinned_type_waits_for_training_data(self):
+        spec = ann.IndexSpec(kind="ivf_flat", nlist=4)
+        self.assertEqual(spec.target(100), "flat")
+        self.assertEqual(spec.target(spec.min_train()), "ivf_flat")
+        self.assertEqual(ann.IndexSpec(kind="hnsw").target(0), "hnsw")
+        with self.assertRaises(ValueError):
+            ann.IndexSpec(kind="lsh")
+
+    def test_rebuild_keeps_ids_and_applies_knobs(self):
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((2000, 16)).astype(np.float32)
+        ids = np.arange(100, 2100, dtype=np.int64)
+        spec = ann.IndexSpec(nlist=8, nprobe=8, ef_search=40)
+        flat = ann.empty_index("flat", 16, spec)
+        flat.add_with_ids(vectors, ids)
+        for kind in ("ivf_flat", "hnsw"):
+            with self.subTest(kind=kind):
+                index = ann.rebuild(flat, kind, spec)
+                self.assertEqual(ann.kind_of(index), kind)
+                self.assertEqual(index.ntotal, 2000)
+                _, found = index.search(vectors[:5], 1)
+                self.assertEqual(found[:, 0].tolist(), ids[:5].tolist())
+        rebuilt = ann.rebuild(flat, "ivf_flat", spec)
+        self.assertEqual(faiss_store.faiss.downcast_index(rebuilt.index).nprobe, 8)
+
+    def test_quantized_storage(self):
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((2000, 16)).astype(np.float32)
+        ids = np.arange(2000, dtype=np.int64)
+        for storage in ("float16", "int8"):
+            spec = ann.IndexSpec(nlist=8, nprobe=8, storage=storage)
+            flat = ann.empty_index("flat", 16, ann.IndexSpec())
+            flat.add_with_ids(vectors, ids)
+            for kind in ("flat", "ivf_flat", "hnsw"):
+                with self.subTest(storage=storage, kind=kind):
+                    index = ann.rebuild(flat, kind, spec)
+                    self.assertEqual((ann.kind_of(index), ann.storage_of(index)), (kind, storage))
+                    _, found = index.search(vectors[:5], 1)
+                    self.assertEqual(found[:, 0].tolist(), ids[:5].tolist())
+        self.assertEqual(ann.storage_of(ann.rebuild(flat, "ivf_pq", ann.IndexSpec(nlist=4))), "pq")
+
+    def test_int8_waits_for_range_training_data(self):
+        spec = ann.IndexSpec(kind="flat", storage="int8", sq_min_train=500)
+        self.assertEqual(ann.storage_of(ann.empty_index("flat", 16, spec)), "float32")
+        self.assertIsNone(spec.migration("flat", 100, "float32"))
+        self.assertEqual(spec.migration("flat", 500, "float32"), "flat")
+        self.assertIsNone(spec.migration("flat", 500, "int8"))
+        with self.assertRaises(ValueError):
+            ann.IndexSpec(storage="int4")
+
+class TestStorePromotion(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        faiss_store._models["hashing-test"] = HashingModel()
+
+    def tearDown(self):
+        faiss_store._models.pop("hashing-test", None)
+        self.tmp.cleanup()
+
+    def test_store_migrates_when_it_grows_and_reloads_as_ivf(self):
+        index_path = os.path.join(self.tmp.name, "index.faiss")
+        spec = ann.IndexSpec(ivf_at=300, nlist=4, nprobe=4)
+
+        def make_store():
+            return FaissStore(index_path, os.path.join(self.tmp.name, "meta.pkl"), "hashing-test",
+                              cache_embeddings=False, index_spec=spec)
+
+        store = make_store()
+        texts = [f"note {i} about w{i % 50} and v{i % 7}" for i in range(400)]
+        asyncio.run(store.ingest(texts[:200], [{"i": i} for i in range(200)]))
+        self.assertEqual(ann.kind_of(store.index), "flat")
+        asyncio.run(store.ingest(texts[200:], [{"i": i} for i in range(200, 400)]))
+        store.close()  # the rebuild runs in the background
+        self.assertEqual(ann.kind_of(store.index), "ivf_flat")
+        self.assertEqual(store.index.ntotal, 400)
+        store.save()
+
+        reopened = make_store()
+        results = asyncio.run(reopened.query(texts[123], k=3))
+        self.assertEqual(ann.kind_of(reopened.index), "ivf_flat")
+        self.assertIn(texts[123], [r["text"] for r in results])
+
+    def test_mapped_store_keeps_new_vectors_in_a_delta(self):
+        index_path = os.path.join(self.tmp.name, "index.faiss")
+        spec = ann.IndexSpec(kind="flat", storage="float16")
+
+        def make_store():
+            store = FaissStore(index_path, os.path.join(self.tmp.name, "meta.pkl"), "hashing-test",
+                               cache_embeddings=False, index_spec=spec, mmap=True, compact_ratio=1.0)
+            self.addCleanup(store.close)
+            return store
+
+        store = make_store()
+        texts = [f"entry {i} tag{i}" for i in range(60)]
+        asyncio.run(store.ingest(texts[:40], [{}] * 40))
+        store.save()
+        self.assertIsInstance(store.index, ann.MappedIndex)
+
+        reopened = make_store()
+        asyncio.run(reopened.ingest(texts[40:], [{}] * 20))
+        self.assertEqual((reopened.index.base.ntotal, reopened.index.delta.ntotal), (40, 20))
+        self.assertEqual(ann.storage_of(reopened.index), "float16")
+        for i in (3, 45):
+            self.assertEqual(asyncio.run(reopened.query(f"tag{i}", k=1))[0]["text"], texts[i])
+
+        asyncio.run(reopened.delete(ids=[3, 45]))
+        reopened.compact()
+        self.assertIsInstance(reopened.index, ann.MappedIndex)
+        self.assertEqual((reopened.index.base.ntotal, reopened.index.delta.ntotal), (58, 0))
+        self.assertEqual(sorted(ann.ids_of(reopened.index).tolist()), [i for i in range(60) if i not in (3, 45)])
+
+if __name__ == '__main__':
+    unittest.main()
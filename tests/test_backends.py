@@ -0,0 +1,62 @@
+import unittest
+import asyncio
+import io
+import os
+import sys
+import tempfile
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agent.agent import Agent
+from agent.backends import CompletionStore, RecordingBackend, ReplayBackend, ScriptedBackend
+from tests.test_agent_plan import make_config, make_registry
+
+PARAMS = {"model": "test", "max_tokens": 16, "temperature": 0.0}
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+class TestRecordReplay(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "llm.jsonl")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_replay_serves_recordings_in_order(self):
+        recorder = RecordingBackend(ScriptedBackend(["first", "second"]), CompletionStore(self.path))
+        self.assertEqual(recorder.complete(MESSAGES, PARAMS).text, "first")
+        self.assertEqual("".join(recorder.stream(MESSAGES, PARAMS)), "second")
+
+        replay = ReplayBackend(CompletionStore(self.path), latency=0)
+        self.assertEqual(replay.complete(MESSAGES, PARAMS).text, "first")
+        self.assertEqual(asyncio.run(replay.acomplete(MESSAGES, PARAMS)).text, "second")
+        self.assertEqual(replay.complete(MESSAGES, PARAMS).text, "second")
+
+    def test_replay_miss_raises(self):
+        replay = ReplayBackend(CompletionStore(self.path), latency=0)
+        with self.assertRaises(LookupError):
+            replay.complete(MESSAGES, PARAMS)
+
+    def test_stream_reports_usage(self):
+        usage = {}
+        text = "".join(ScriptedBackend(["x" * 40]).stream(MESSAGES, PARAMS, usage))
+        self.assertEqual(text, "x" * 40)
+        self.assertEqual(usage["completion_tokens"], 10)
+
+class TestAgentWithScriptedBackend(unittest.TestCase):
+    def test_plan_then_answer(self):
+        def _answer(messages):
+            return f"done after {messages[-1]['content']}"
+
+        backend = ScriptedBackend(['[{"tool": "echo", "args": {"text": "hi"}}]', _answer])
+        agent = Agent(make_config(), make_registry(), backend)
+        out = io.StringIO()
+        with redirect_stdout(out):
+            answer = agent.run("say hi")
+        self.assertEqual(answer, "done after tool_output: echo hi")
+        self.assertIn(answer, out.getvalue())
+        self.assertEqual(backend.calls, 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agent.agent import Agent
+from agent.backends import ScriptedBackend
+from llm.batch import run_batch
+from tests.test_agent_plan import make_config, make_registry
+
+def _answer(messages):
+    return f"answer to {messages[-1]['content']}"
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.input = os.path.join(self.tmp.name, "prompts.jsonl")
+        self.output = os.path.join(self.tmp.name, "results.jsonl")
+        with open(self.input, "w") as f:
+            for i in range(6):
+                f.write(json.dumps({"id": f"p{i}", "prompt": f"q{i}"}) + "\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _run(self, backend, **kwargs):
+        agent = Agent(make_config(), make_registry(), backend)
+        return asyncio.run(run_batch(agent, self.input, self.output, **kwargs))
+
+    def _results(self):
+        with open(self.output) as f:
+            return {r["id"]: r for r in map(json.loads, f) if isinstance(r, dict) and "id" in r}
+
+    def test_runs_all_prompts_concurrently(self):
+        backend = ScriptedBackend([_answer] * 6, latency=0.2)
+        start = time.perf_counter()
+        counts = self._run(backend, concurrency=6)
+        wall = time.perf_counter() - start
+        self.assertEqual(counts["ok"], 6)
+        results = self._results()
+        self.assertEqual(results["p3"]["output"], "answer to q3")
+        self.assertEqual(results["p3"]["llm_calls"], 1)
+        self.assertGreater(results["p3"]["prompt_tokens"], 0)
+        # six 0.2 s sessions in one go: the batch takes about as long as one
+        self.assertLess(wall, sum(r["elapsed_s"] for r in results.values()) / 2)
+
+    def test_resumes_from_partial_output(self):
+        with open(self.output, "w") as f:
+            f.write(json.dumps({"id": "p0", "output": "old", "error": None}) + "\n")
+            f.write(json.dumps({"id": "p1", "output": None, "error": "boom"}) + "\n")
+            f.write(json.dumps({"output": "no id", "error": None}) + "\n")
+            f.write(json.dumps(["not", "a", "record"]) + "\n")
+            f.write('{"id": "p2", "outp')
+        backend = ScriptedBackend([_answer] * 5)
+        counts = self._run(backend, concurrency=2)
+        self.assertEqual(counts, {"skipped": 1, "ok": 5, "error": 0})
+        results = self._results()
+        self.assertEqual(results["p0"]["output"], "old")
+        self.assertEqual(results["p1"]["output"], "answer to q1")
+        self.assertEqual(len(results), 6)
+
+    def test_bad_records_are_reported_and_skipped(self):
+        with open(self.input, "a") as f:
+            f.write(json.dumps({"id": "no-prompt", "text": "q"}) + "\n")
+            f.write("{not json\n")
+            f.write(json.dumps({"id": "p6", "prompt": "q6"}) + "\n")
+        counts = self._run(ScriptedBackend([_answer] * 7), concurrency=2)
+        self.assertEqual(counts, {"skipped": 0, "ok": 7, "error": 2})
+        results = self._results()
+        self.assertIn("prompt", results["no-prompt"]["error"])
+        self.assertIn("invalid JSON", results["8"]["error"])
+        self.assertEqual(results["p6"]["output"], "answer to q6")
+
+        # a resumed run retries only the bad records, which fail again
+        counts = self._run(ScriptedBackend([]), concurrency=2)
+        self.assertEqual(counts, {"skipped": 7, "ok": 0, "error": 2})
+
+if __name__ == "__main__":
+    unittest.main()
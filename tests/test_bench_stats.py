@@ -0,0 +1,38 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench.stats import Recorder, compare, percentile
+
+class TestBenchStats(unittest.TestCase):
+    def test_percentile(self):
+        values = [float(v) for v in range(1, 101)]
+        self.assertAlmostEqual(percentile(values, 50), 50.5)
+        self.assertAlmostEqual(percentile(values, 99), 99.01)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_compare_flags_regressions(self):
+        def _write(path, p50):
+            rec = Recorder()
+            for _ in range(10):
+                rec.add("tool.x", p50 / 1000)
+                rec.add("setup.workspace", p50 / 1000)
+            with open(path, "w") as f:
+                json.dump({"meta": {}, "metrics": rec.summary()}, f)
+
+        with tempfile.TemporaryDirectory() as td:
+            base, new = os.path.join(td, "a.json"), os.path.join(td, "b.json")
+            _write(base, 10.0)
+            _write(new, 10.5)
+            self.assertEqual(compare(base, new, threshold=0.1), [])
+            _write(new, 20.0)
+            regressions = compare(base, new, threshold=0.1)
+            self.assertEqual(len(regressions), 2)
+            self.assertTrue(all(r.startswith("tool.x") for r in regressions))
+
+if __name__ == "__main__":
+    unittest.main()
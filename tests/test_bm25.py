@@ -0,0 +1,80 @@
+import unittest
+import asyncio
+import io
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from memory import faiss_store
+from memory.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+from memory.faiss_store import FaissStore
+from tests.test_memory_store import HashingModel
+
+DOCS = [
+    "the build failed with a generic error",
+    "ValueError: args validation failed for file_read in tools/tool_base.py",
+    "notes about the error budget and retries",
+    "tools/manifest.json lists every tool",
+]
+
+class TestBM25(unittest.TestCase):
+    def setUp(self):
+        self.index = BM25Index()
+        for i, doc in enumerate(DOCS):
+            self.index.add(i * 2, doc)
+
+    def test_tokenize_keeps_compounds_and_parts(self):
+        self.assertEqual(tokenize("See tools/tool_base.py"),
+                         ["see", "tools/tool_base.py", "tools", "tool", "base", "py"])
+
+    def test_exact_identifiers_rank_first(self):
+        self.assertEqual(self.index.search("tools/tool_base.py", 2)[0][0], 2)
+        self.assertEqual(self.index.search("ValueError", 5), [(2, self.index.search("valueerror", 1)[0][1])])
+        self.assertEqual(self.index.search("nothing matches", 5), [])
+        self.assertEqual(len(self.index.search("error tools", 1)), 1)
+
+    def test_save_and_load(self):
+        buf = io.BytesIO()
+        self.index.save(buf)
+        buf.seek(0)
+        loaded = BM25Index.load(buf)
+        self.assertEqual(loaded.search("manifest error", 4), self.index.search("manifest error", 4))
+        self.assertEqual(loaded.next_id, 7)
+        self.assertEqual(loaded.nbytes(), self.index.nbytes())
+
+    def test_reciprocal_rank_fusion(self):
+        self.assertEqual(reciprocal_rank_fusion([[1, 2, 3], [3, 1]]), [1, 3, 2])
+
+class TestHybridStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        faiss_store._models["hashing-test"] = HashingModel()
+
+    def tearDown(self):
+        faiss_store._models.pop("hashing-test", None)
+        self.tmp.cleanup()
+
+    def _store(self, hybrid=True):
+        return FaissStore(os.path.join(self.tmp.name, "index.faiss"), os.path.join(self.tmp.name, "meta.pkl"),
+                          "hashing-test", cache_embeddings=False, hybrid=hybrid)
+
+    def test_identifier_query_finds_exact_match_and_survives_reload(self):
+        store = self._store()
+        filler = [f"unrelated note number {i} about apples" for i in range(40)]
+        asyncio.run(store.ingest(filler + DOCS, [{}] * (len(filler) + len(DOCS))))
+        top = [r["text"] for r in asyncio.run(store.query("tools/tool_base.py", k=2))]
+        self.assertIn(DOCS[1], top)
+        store.save()
+        asyncio.run(store.ingest(["E4242 raised by sandbox"], [{}]))
+
+        reopened = self._store()
+        self.assertEqual(asyncio.run(reopened.query("E4242", k=1))[0]["text"], "E4242 raised by sandbox")
+        self.assertEqual(reopened.bm25.n_docs, len(filler) + len(DOCS) + 1)
+
+        dense_only = [r["text"] for r in asyncio.run(self._store(hybrid=False).query("tools/tool_base.py", k=2))]
+        self.assertNotIn(DOCS[1], dense_only)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import asyncio
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agent.prompt import estimate_tokens
+from memory.context_packer import ContextPacker, mmr, trim
+from memory.memory_manager import MemoryManager
+
+class TestMMR(unittest.TestCase):
+    def test_prefers_diverse_documents_and_drops_duplicates(self):
+        query = np.array([1.0, 1.0, 0.0])
+        docs = np.array([
+            [1.0, 0.9, 0.0],   # most relevant
+            [1.0, 0.9, 0.01],  # near-duplicate of the first
+            [1.0, 0.5, 0.0],   # same direction, a bit less relevant
+            [0.2, 1.0, 0.0],   # relevant from another side
+        ])
+        picks = [i for i, _ in mmr(query, docs, k=3, diversity=0.5)]
+        self.assertEqual(picks[0], 0)
+        self.assertNotIn(1, picks)
+        self.assertEqual(picks[1], 3)
+
+    def test_no_diversity_is_plain_relevance_order(self):
+        rng = np.random.default_rng(0)
+        docs = rng.standard_normal((20, 8))
+        query = rng.standard_normal(8)
+        picks = mmr(query, docs, k=5, diversity=0.0, duplicate=1.1)
+        relevance = [r for _, r in picks]
+        self.assertEqual(relevance, sorted(relevance, reverse=True))
+
+class TestContextPacker(unittest.TestCase):
+    def test_stays_within_budget_and_trims_long_items(self):
+        packer = ContextPacker(token_budget=200)
+        docs = [{"text": "x" * 2000}, {"text": "short fact"}]
+        history = [{"role": "user", "text": f"message {i} " + "y" * 300} for i in range(10)]
+        prompt = packer.pack("what now?", docs, history)
+        self.assertLessEqual(estimate_tokens(prompt), 200)
+        self.assertIn("…", prompt)
+        self.assertIn("- short fact", prompt)
+        self.assertIn("message 9", prompt)  # newest history survives
+        self.assertNotIn("message 0", prompt)
+        self.assertTrue(prompt.endswith("### User Query\nwhat now?"))
+
+    def test_unused_history_budget_goes_to_documents(self):
+        packer = ContextPacker(token_budget=400, doc_share=0.2)
+        docs = [{"text": f"fact {i} " + "z" * 100} for i in range(8)]
+        prompt = packer.pack("q", docs, [])
+        self.assertGreater(prompt.count("- fact"), 3)
+        self.assertLessEqual(estimate_tokens(prompt), 400)
+
+    def test_select_skips_history_and_repeats(self):
+        packer = ContextPacker()
+        docs = [{"text": "hello"}, {"text": "a"}, {"text": "a"}, {"text": "b"}]
+        self.assertEqual([d["text"] for d in packer.select(docs, 3, exclude=["hello"])], ["a", "b"])
+        self.assertEqual(trim("abc", 10), "abc")
+
+class EmbeddingMemory:
+    """Returns every stored text; embeds by character classes."""
+    def __init__(self, texts):
+        self.texts = texts
+
+    async def ingest(self, texts, metadata):
+        pass
+
+    async def query(self, query, k=5):
+        return [{"text": t} for t in self.texts][:k]
+
+    async def embed(self, texts):
+        return np.array([[t.count("a"), t.count("b"), t.count("c")] for t in texts], dtype=np.float32)
+
+class TestConstructPrompt(unittest.TestCase):
+    def test_diverse_docs_in_budget(self):
+        memory = EmbeddingMemory(["aaa one", "aaa two", "aaa three", "bbb other"])
+        manager = MemoryManager(memory, context_tokens=300)
+        manager.short_term_memory.append({"role": "user", "text": "aaa three"})
+        prompt = asyncio.run(manager.construct_prompt("aab", k=2))
+        context = prompt.split("### Conversation History")[0]
+        self.assertEqual(context.count("\n- "), 2)
+        self.assertIn("bbb other", context)
+        self.assertNotIn("aaa three", context)
+        self.assertIn("User: aaa three", prompt)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+import hashlib
+import multiprocessing
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from memory import embedding_cache
+from memory.embedding_cache import EmbeddingCache
+
+class CountingEncoder:
+    def __init__(self, dim=8):
+        self.dim = dim
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(t) + i for i in range(self.dim)] for t in texts], dtype=np.float32)
+
+def _digest_encoder(texts):
+    # unlike CountingEncoder, texts of the same length get different vectors
+    return np.array([np.frombuffer(hashlib.sha256(t.encode()).digest(), dtype=np.uint8) for t in texts],
+                    dtype=np.float32)
+
+def _fill(directory, prefix, barrier):
+    cache = EmbeddingCache(directory, "m", ram_entries=0)
+    barrier.wait()  # both caches are open before either appends
+    texts = [f"{prefix}{j}" for j in range(200)]
+    for i in range(0, len(texts), 5):
+        cache.encode(texts[i:i + 5], _digest_encoder)
+    # the rows this process wrote must still read back as its own vectors
+    sys.exit(0 if cache.encode(texts, _digest_encoder).tolist() == _digest_encoder(texts).tolist() else 1)
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.encoder = CountingEncoder()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_only_distinct_misses_are_encoded(self):
+        cache = EmbeddingCache(self.tmp.name, "model/a")
+        first = cache.encode(["aa", "bbb", "aa"], self.encoder)
+        self.assertEqual(self.encoder.calls, [["aa", "bbb"]])
+        self.assertEqual(first.shape, (3, 8))
+        np.testing.assert_array_equal(first[0], first[2])
+
+        again = cache.encode(["bbb", "aa"], self.encoder)
+        self.assertEqual(len(self.encoder.calls), 1)
+        np.testing.assert_array_equal(again, first[[1, 0]])
+        info = cache.info()
+        self.assertEqual(info["entries"], 2)
+        self.assertEqual(info["misses"], 3)
+        self.assertEqual(info["ram_hits"], 2)
+
+    def test_persists_across_instances_and_models(self):
+        EmbeddingCache(self.tmp.name, "model/a").encode(["hello", "world"], self.encoder)
+        reopened = EmbeddingCache(self.tmp.name, "model/a", ram_entries=0)
+        vectors = reopened.encode(["world"], self.encoder)
+        self.assertEqual(len(self.encoder.calls), 1)
+        self.assertEqual(reopened.info()["disk_hits"], 1)
+        np.testing.assert_array_equal(vectors[0], self.encoder(["world"])[0])
+
+        other = EmbeddingCache(self.tmp.name, "model/b")
+        other.encode(["world"], self.encoder)
+        self.assertEqual(other.info()["misses"], 1)
+
+    def test_torn_append_is_truncated(self):
+        cache = EmbeddingCache(self.tmp.name, "m")
+        cache.encode(["one", "two"], self.encoder)
+        with open(cache.vectors_path, "ab") as f:
+            f.write(b"\x00" * 5)
+        with open(cache.digests_path, "ab") as f:
+            f.write(b"\x01" * 16)
+        reopened = EmbeddingCache(self.tmp.name, "m")
+        self.assertEqual(len(reopened), 2)
+        reopened.encode(["three"], self.encoder)
+        self.assertEqual(EmbeddingCache(self.tmp.name, "m").encode(["three"], self.encoder).tolist(),
+                         self.encoder(["three"]).tolist())
+
+    def test_instances_sharing_files_keep_their_rows_apart(self):
+        first, second = EmbeddingCache(self.tmp.name, "m"), EmbeddingCache(self.tmp.name, "m", ram_entries=0)
+        first.encode(["a"], self.encoder)
+        second.encode(["bbbb"], self.encoder)  # row 1, after "a"
+        self.assertEqual(second.encode(["bbbb", "a"], self.encoder).tolist(), self.encoder(["bbbb", "a"]).tolist())
+        self.assertEqual(len(self.encoder.calls), 3)  # "a" was picked up from the first instance
+
+    @unittest.skipIf(embedding_cache.fcntl is None, "no cross-process file locks")
+    def test_processes_can_share_a_cache(self):
+        ctx = multiprocessing.get_context("fork")
+        barrier = ctx.Barrier(2)
+        workers = [ctx.Process(target=_fill, args=(self.tmp.name, prefix, barrier)) for prefix in ("x", "y")]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            self.assertEqual(worker.exitcode, 0)
+        cache = EmbeddingCache(self.tmp.name, "m", ram_entries=0)
+        texts = [f"{prefix}{j}" for prefix in ("x", "y") for j in range(200)]
+        self.assertEqual(len(cache), len(texts))
+        self.assertEqual(cache.encode(texts, self.encoder).tolist(), _digest_encoder(texts).tolist())
+        self.assertEqual(self.encoder.calls, [])
+
+if __name__ == '__main__':
+    unittest.main()
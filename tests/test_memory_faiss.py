@@ -1,6 +1,7 @@
 import unittest
 import asyncio
 import os
+import shutil
 import sys
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -14,12 +15,8 @@ class TestFaissStore(unittest.TestCase):
         self.store = FaissStore(index_path=self.index_path, meta_path=self.meta_path)
 
     def tearDown(self):
-        if os.path.exists(self.index_path):
-            os.remove(self.index_path)
-        if os.path.exists(self.meta_path):
-            os.remove(self.meta_path)
-        if os.path.exists(".test_rag"):
-            os.rmdir(".test_rag")
+        # the store also keeps a write-ahead log, SQLite metadata and embeddings here
+        shutil.rmtree(".test_rag", ignore_errors=True)
 
     def test_ingest_and_query(self):
         async def _test():
@@ -0,0 +1,168 @@
+import unittest
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from memory import ann, faiss_store
+from memory.faiss_store import FaissStore
+from memory.memory_manager import MemoryManager
+from tests.test_memory_store import HashingModel
+
+class TestMemoryLifecycle(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index_path = os.path.join(self.tmp.name, "index.faiss")
+        self.meta_path = os.path.join(self.tmp.name, "meta.pkl")
+        faiss_store._models["hashing-test"] = HashingModel()
+
+    def tearDown(self):
+        faiss_store._models.pop("hashing-test", None)
+        self.tmp.cleanup()
+
+    def _store(self, **kwargs):
+        kwargs.setdefault("compact_ratio", 1.0)
+        store = FaissStore(self.index_path, self.meta_path, "hashing-test", cache_embeddings=False, **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+    def _texts(self, store, query, k=10):
+        return [r["text"] for r in asyncio.run(store.query(query, k=k))]
+
+    def test_delete_by_id_and_metadata(self):
+        store = self._store()
+        ids = asyncio.run(store.ingest(["red apples", "green apples", "blue sky"],
+                                       [{"kind": "fruit"}, {"kind": "fruit"}, {"kind": "weather"}]))
+        self.assertEqual(ids, [0, 1, 2])
+        self.assertEqual(asyncio.run(store.delete(ids=[0])), 1)
+        self.assertEqual(self._texts(store, "apples", k=1), ["green apples"])
+        self.assertEqual(asyncio.run(store.delete(where={"kind": "fruit"})), 1)
+        self.assertEqual(self._texts(store, "apples"), ["blue sky"])
+        with self.assertRaises(ValueError):
+            asyncio.run(store.delete(where={"kind": ["fruit"]}))
+
+        # unsaved deletes survive a restart: the log replay skips them
+        reopened = self._store()
+        self.assertEqual(self._texts(reopened, "apples"), ["blue sky"])
+        self.assertEqual(reopened.index.ntotal, 1)
+
+    def test_deletes_after_a_snapshot_become_tombstones_on_load(self):
+        store = self._store()
+        asyncio.run(store.ingest(["red apples", "blue sky"], [{}, {}]))
+        store.save()
+        asyncio.run(store.delete(ids=[0]))
+        reopened = self._store()
+        self.assertEqual(self._texts(reopened, "apples"), ["blue sky"])
+        self.assertEqual(reopened._tombstones, {0})
+
+    def test_tombstones_only_deepen_searches_that_come_up_short(self):
+        store = self._store(hybrid=False, index_spec=ann.IndexSpec(kind="flat"))
+        texts = [f"x{i}a x{i}b x{i}c" for i in range(40)]
+        asyncio.run(store.ingest(texts, [{}] * 40))
+        asyncio.run(store.delete(ids=list(range(20))))
+        depths = []
+        search = store.index.search
+        store.index.search = lambda vectors, k: depths.append(k) or search(vectors, k)
+        self.assertEqual(self._texts(store, texts[39], k=1), [texts[39]])
+        self.assertEqual(depths, [1])
+        depths.clear()
+        self.assertNotIn(self._texts(store, texts[0], k=1)[0], texts[:20])
+        # only the query whose best hit was deleted is searched again, deeper
+        self.assertEqual(depths[0], 1)
+        self.assertGreater(len(depths), 1)
+
+    def test_ids_of_deleted_entries_are_not_reused_after_a_crash(self):
+        store = self._store()
+        asyncio.run(store.ingest(["first note", "second note", "third note", "doomed entry"], [{}] * 4))
+        asyncio.run(store.delete(ids=[3]))
+        # no save(): a restart replays the log, which drops the deleted record
+        reopened = self._store()
+        self.assertEqual(asyncio.run(reopened.ingest(["fresh entry"], [{}])), [4])
+        self.assertEqual(len(reopened.log), 4)
+        again = self._store()
+        again.load()
+        self.assertEqual(sorted(ann.ids_of(again.index).tolist()), [0, 1, 2, 4])
+        self.assertNotIn("doomed entry", self._texts(again, "doomed entry"))
+        self.assertEqual(again.db.get_many([4])[4]["text"], "fresh entry")
+
+    def test_ttl_expires_entries(self):
+        store = self._store()
+        asyncio.run(store.ingest(["short lived note"], [{}], ttl=60))
+        asyncio.run(store.ingest(["kept note"], [{}]))
+        self.assertEqual(len(self._texts(store, "note")), 2)
+        later = time.time() + 120
+        with mock.patch("time.time", return_value=later):
+            self.assertEqual(self._texts(store, "note"), ["kept note"])
+            store.save()
+        self.assertEqual(store._tombstones, {0})
+
+    def test_near_duplicates_reuse_the_existing_entry(self):
+        store = self._store(dedup_threshold=0.95)
+        first = asyncio.run(store.ingest(["the build failed again"], [{}], ttl=60))
+        ids = asyncio.run(store.ingest(["The build failed again", "something else entirely", "something else entirely"],
+                                       [{}, {}, {}], ttl=600))
+        self.assertEqual(ids, [first[0], 1, 1])
+        self.assertEqual(store.index.ntotal, 2)
+        # the duplicate extended the original's TTL
+        with mock.patch("time.time", return_value=time.time() + 120):
+            self.assertIn("the build failed again", self._texts(store, "build failed"))
+
+    def test_duplicates_need_the_same_metadata(self):
+        store = self._store(dedup_threshold=0.95)
+        first = asyncio.run(store.ingest(["def main(): pass"], [{"path": "a.py"}]))
+        ids = asyncio.run(store.ingest(["def main(): pass", "def main(): pass", "def main(): pass"],
+                                       [{"path": "b.py"}, {"path": "a.py"}, {"path": "b.py"}]))
+        self.assertEqual(ids, [1, first[0], 1])
+        hits = asyncio.run(store.query("def main", k=5, where={"path": "b.py"}))
+        self.assertEqual([h["metadata"] for h in hits], [{"path": "b.py"}])
+
+    def test_compaction_drops_tombstones(self):
+        store = self._store(compact_ratio=0.3, index_spec=ann.IndexSpec(kind="flat"))
+        texts = [f"note number {i} word{i}" for i in range(10)]
+        asyncio.run(store.ingest(texts, [{"i": i} for i in range(10)]))
+        asyncio.run(store.delete(ids=[0, 1]))
+        self.assertEqual(store.index.ntotal, 10)
+        asyncio.run(store.delete(ids=[2, 3]))  # past the ratio: compacts in the background
+        store.close()
+        self.assertEqual(store.index.ntotal, 6)
+        self.assertEqual(store._tombstones, set())
+        self.assertEqual(store.bm25.n_docs, 6)
+        self.assertFalse([t for t in self._texts(store, "word2 word3") if "word2" in t or "word3" in t])
+
+        reopened = self._store()
+        self.assertEqual(len(self._texts(reopened, "note number", k=10)), 6)
+        self.assertEqual(reopened.index.ntotal, 6)
+
+    def test_hnsw_compaction_rebuilds_the_graph(self):
+        store = self._store(index_spec=ann.IndexSpec(kind="hnsw"))
+        asyncio.run(store.ingest([f"entry {i} tag{i}" for i in range(20)], [{}] * 20))
+        asyncio.run(store.delete(ids=list(range(5))))
+        store.compact()
+        self.assertEqual(ann.kind_of(store.index), "hnsw")
+        self.assertEqual(store.index.ntotal, 15)
+
+class TestManagerTTL(unittest.TestCase):
+    def test_messages_carry_the_ttl(self):
+        calls = []
+
+        class Recorder:
+            async def ingest(self, texts, metadatas, ttl=None):
+                calls.append((texts, ttl))
+                return list(range(len(texts)))
+
+            async def query(self, query, k=5):
+                return []
+
+        manager = MemoryManager(Recorder(), message_ttl=30)
+        async def add():
+            return await (await manager.add_message("user", "hello"))
+        self.assertEqual(asyncio.run(add()), 0)
+        manager.ingest_queue.close()
+        self.assertEqual(calls, [(["hello"], 30)])
+
+if __name__ == '__main__':
+    unittest.main()
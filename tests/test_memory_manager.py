@@ -0,0 +1,81 @@
+import unittest
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from memory.ingest_queue import IngestQueue
+from memory.memory_manager import MemoryManager
+
+class RecordingMemory:
+    def __init__(self, delay=0.0, fail=False):
+        self.batches = []
+        self.saved = 0
+        self.delay = delay
+        self.fail = fail
+
+    async def ingest(self, texts, metadata):
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("encoder down")
+        self.batches.append(list(zip(texts, metadata)))
+
+    async def query(self, query, k=5):
+        return [{"text": text} for batch in self.batches for text, _ in batch][:k]
+
+    def save(self):
+        self.saved += 1
+
+class TestIngestQueue(unittest.TestCase):
+    def test_coalesces_into_batches(self):
+        memory = RecordingMemory(delay=0.05)
+        q = IngestQueue(memory, max_batch=4, max_delay=0.2)
+        futures = [q.submit(f"m{i}", {"i": i}) for i in range(10)]
+        self.assertTrue(q.flush(timeout=5))
+        self.assertTrue(all(f.done() and f.exception() is None for f in futures))
+        self.assertEqual([len(b) for b in memory.batches], [4, 4, 2])
+        self.assertEqual([text for b in memory.batches for text, _ in b], [f"m{i}" for i in range(10)])
+        q.close()
+        with self.assertRaises(RuntimeError):
+            q.submit("late", {})
+
+    def test_errors_reach_every_future_in_the_batch(self):
+        q = IngestQueue(RecordingMemory(fail=True), max_batch=8, max_delay=0.1)
+        futures = [q.submit("x", {}), q.submit("y", {})]
+        q.flush(timeout=5)
+        for f in futures:
+            self.assertIsInstance(f.exception(), RuntimeError)
+        self.assertEqual(q.stats["errors"], 1)
+        q.close()
+
+class TestMemoryManager(unittest.TestCase):
+    def test_add_message_returns_before_ingest_and_save_flushes(self):
+        memory = RecordingMemory(delay=0.2)
+        manager = MemoryManager(memory, ingest_window=0.01)
+
+        async def _add():
+            start = time.perf_counter()
+            pending = [await manager.add_message("user", "hi"), await manager.add_message("assistant", "hello")]
+            elapsed = time.perf_counter() - start
+            prompt = await manager.construct_prompt("hi")
+            await asyncio.gather(*pending)
+            return elapsed, prompt
+
+        elapsed, prompt = asyncio.run(_add())
+        self.assertLess(elapsed, 0.1)
+        self.assertIn("Assistant: hello", prompt)
+        self.assertEqual([len(b) for b in memory.batches], [2])
+        manager.save()
+        self.assertEqual(memory.saved, 1)
+
+    def test_save_waits_for_pending_messages(self):
+        memory = RecordingMemory(delay=0.1)
+        manager = MemoryManager(memory)
+        asyncio.run(manager.add_message("user", "remember this"))
+        manager.save()
+        self.assertEqual(memory.batches, [[("remember this", {"role": "user"})]])
+
+if __name__ == '__main__':
+    unittest.main()
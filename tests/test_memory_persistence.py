@@ -0,0 +1,169 @@
+import unittest
+import asyncio
+import os
+import pickle
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+from unittest import mock
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from memory import faiss_store
+from memory.faiss_store import FaissStore
+from memory.persistence import MetadataDB
+from tests.test_memory_store import HashingModel
+
+class TestStorePersistence(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index_path = os.path.join(self.tmp.name, "index.faiss")
+        self.meta_path = os.path.join(self.tmp.name, "meta.pkl")
+        self.model = faiss_store._models["hashing-test"] = HashingModel()
+
+    def tearDown(self):
+        faiss_store._models.pop("hashing-test", None)
+        self.tmp.cleanup()
+
+    def _store(self, **kwargs):
+        return FaissStore(self.index_path, self.meta_path, "hashing-test", cache_embeddings=False, **kwargs)
+
+    def _ingest(self, store, texts):
+        asyncio.run(store.ingest(texts, [{"n": t} for t in texts]))
+
+    def _texts(self, store, query, k=10):
+        return [r["text"] for r in asyncio.run(store.query(query, k=k))]
+
+    def test_unsaved_ingests_survive_a_restart(self):
+        store = self._store()
+        self._ingest(store, ["alpha beta", "gamma delta"])
+        # no save(): a new process replays the write-ahead log
+        reopened = self._store()
+        self.assertEqual(self._texts(reopened, "gamma", k=1), ["gamma delta"])
+        self.assertEqual(reopened.index.ntotal, 2)
+        self.assertFalse(os.path.exists(self.index_path))
+
+    def test_save_snapshots_and_empties_the_log(self):
+        store = self._store()
+        self._ingest(store, ["one", "two"])
+        store.save()
+        self.assertEqual(os.path.getsize(store.log_path), 0)
+        self._ingest(store, ["three"])
+        reopened = self._store()
+        self.assertIsNone(reopened.index)  # loaded lazily
+        self.assertEqual(sorted(self._texts(reopened, "one two three")), ["one", "three", "two"])
+        self.assertEqual(reopened.index.ntotal, 3)
+
+    def test_crash_between_snapshot_and_log_truncation(self):
+        store = self._store()
+        self._ingest(store, ["one", "two"])
+        shutil.copy(store.log_path, store.log_path + ".bak")
+        store.save()
+        shutil.copy(store.log_path + ".bak", store.log_path)
+        reopened = self._store()
+        reopened.load()
+        self.assertEqual(reopened.index.ntotal, 2)
+
+    def test_compacts_after_enough_logged_vectors(self):
+        store = self._store(compact_every=3)
+        self._ingest(store, ["a", "b"])
+        self.assertFalse(os.path.exists(self.index_path))
+        self._ingest(store, ["c"])
+        store.close()  # the checkpoint runs in the background
+        self.assertTrue(os.path.exists(self.index_path))
+        self.assertEqual(len(store.log), 0)
+        self.assertFalse(os.path.exists(store.log.rotated_path))
+
+    def test_queries_run_while_a_checkpoint_writes(self):
+        store = self._store()
+        self.addCleanup(store.close)
+        self._ingest(store, ["alpha", "beta"])
+        writing, release = threading.Event(), threading.Event()
+        write_index = faiss.write_index
+
+        def slow_write(index, path):
+            writing.set()
+            release.wait(5)
+            write_index(index, path)
+
+        with mock.patch("faiss.write_index", slow_write):
+            checkpoint = threading.Thread(target=store.checkpoint)
+            checkpoint.start()
+            self.assertTrue(writing.wait(5))
+            self._ingest(store, ["gamma"])
+            self.assertEqual(self._texts(store, "gamma", k=1), ["gamma"])
+            release.set()
+            checkpoint.join()
+        self.assertEqual(len(store.log), 1)  # gamma, logged after the copy
+        reopened = self._store()
+        self.assertEqual(sorted(self._texts(reopened, "alpha beta gamma")), ["alpha", "beta", "gamma"])
+
+    def test_rotated_log_is_replayed_after_a_crash(self):
+        store = self._store()
+        self._ingest(store, ["one", "two"])
+        store.log.rotate()  # a checkpoint that died before its snapshot landed
+        self._ingest(store, ["three"])
+        reopened = self._store()
+        reopened.load()
+        self.assertEqual(reopened.index.ntotal, 3)
+        self.assertEqual(sorted(self._texts(reopened, "one two three")), ["one", "three", "two"])
+
+    def test_orphaned_metadata_and_torn_log_are_dropped(self):
+        store = self._store()
+        self._ingest(store, ["kept"])
+        store.db.add_many([(1, "never logged", {})])
+        with open(store.log_path, "ab") as f:
+            f.write(b"\x07" * 5)
+        reopened = self._store()
+        reopened.load()
+        self.assertEqual(reopened.index.ntotal, 1)
+        self.assertEqual(reopened.db.count(), 1)
+        self._ingest(reopened, ["next"])
+        self.assertEqual(sorted(self._texts(self._store(), "kept next")), ["kept", "next"])
+
+    def test_legacy_pickle_is_migrated(self):
+        texts = ["legacy one", "legacy two"]
+        index = faiss.IndexIDMap(faiss.IndexFlatL2(HashingModel.dim))
+        index.add_with_ids(self.model.encode(texts), np.arange(2))
+        faiss.write_index(index, self.index_path)
+        with open(self.meta_path, "wb") as f:
+            pickle.dump([{"text": t, "metadata": {"old": i}} for i, t in enumerate(texts)], f)
+
+        store = self._store()
+        results = asyncio.run(store.query("two", k=1))
+        self.assertEqual(results, [{"text": "legacy two", "metadata": {"old": 1}}])
+        self.assertFalse(os.path.exists(self.meta_path))
+        self.assertTrue(os.path.exists(self.meta_path + ".migrated"))
+        self.assertEqual(MetadataDB(store.db_path).count(), 2)
+
+class TestMetadataDB(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = MetadataDB(os.path.join(self.tmp.name, "meta.sqlite"))
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(self.db.close)
+        self.db._conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+        self.db.add_many((i, f"text {i}", {"kind": "even" if i % 2 == 0 else "odd", "i": i}) for i in range(3000))
+
+    def test_large_id_lists_stay_under_the_variable_limit(self):
+        self.assertEqual(len(self.db.get_many(range(3000))), 3000)
+        self.assertEqual(len(self.db.norms_and_metadata(range(3000))), 0)  # no norms stored
+        self.db.extend_expiry(range(3000), None)
+        self.assertEqual(len(self.db.delete(ids=range(2000, 3000))), 1000)
+        self.assertEqual(self.db.count(), 2000)
+
+    def test_where_filters_in_sql(self):
+        records = self.db.get_many(range(2000), where={"kind": "odd", "i": [1, 3, 4, None]})
+        self.assertEqual(sorted(records), [1, 3])
+        self.assertEqual(self.db.get_many(range(10), where={"kind": []}), {})
+        self.assertEqual(len(self.db.get_many(range(10), where={"missing": None})), 10)
+        with self.assertRaises(ValueError):
+            self.db.get_many([1], where={"kind": {"nested": 1}})
+
+if __name__ == '__main__':
+    unittest.main()
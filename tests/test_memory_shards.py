@@ -0,0 +1,92 @@
+import unittest
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from memory import faiss_store, shards as shards_module
+from memory.memory_manager import MemoryManager
+from memory.shards import ShardedMemory
+from tests.test_memory_store import HashingModel
+
+class TestShardedMemory(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)  # after the shards are closed
+        self.model = faiss_store._models["hashing-test"] = HashingModel()
+
+    def tearDown(self):
+        faiss_store._models.pop("hashing-test", None)
+
+    def _shards(self, **kwargs):
+        shards = ShardedMemory(self.tmp.name, "hashing-test", **kwargs)
+        self.addCleanup(shards.close)
+        return shards
+
+    def test_namespaces_are_isolated_and_lazy(self):
+        shards = self._shards()
+        asyncio.run(shards.ingest("alice", ["alice likes green tea"], [{}]))
+        asyncio.run(shards.ingest("bob", ["bob likes black coffee"], [{}]))
+        self.assertEqual([r["text"] for r in asyncio.run(shards.query("alice", "likes", k=5))], ["alice likes green tea"])
+        self.assertTrue(os.path.isdir(os.path.join(self.tmp.name, "bob")))
+        self.assertIsNone(shards.shard("carol").index)
+        with self.assertRaises(ValueError):
+            shards.shard("../escape")
+
+    def test_lru_eviction_saves_and_reloads(self):
+        shards = self._shards(ram_budget=1)  # anything loaded is over budget once idle
+        asyncio.run(shards.ingest("one", ["first tenant note"], [{"n": 1}]))
+        asyncio.run(shards.ingest("two", ["second tenant note"], [{"n": 2}]))
+        self.assertEqual(shards.loaded(), [])
+        self.assertEqual(shards.stats["evictions"], 2)
+        # the log was folded into a snapshot on eviction
+        self.assertEqual(os.path.getsize(shards.shard("one").log_path), 0)
+        self.assertEqual(asyncio.run(shards.query("one", "tenant", k=1))[0]["metadata"], {"n": 1})
+
+    def test_budget_keeps_recent_shards(self):
+        shards = self._shards()
+        for ns in ("a", "b", "c"):
+            asyncio.run(shards.ingest(ns, [f"note for {ns}"], [{}]))
+        shards.ram_budget = 2 * shards.shard("c").memory_bytes() + 1
+        asyncio.run(shards.query("a", "note"))  # a becomes most recently used
+        self.assertEqual(shards.loaded(), ["c", "a"])
+
+    def test_merged_top_k_across_namespaces(self):
+        shards = self._shards()
+        asyncio.run(shards.ingest("docs", ["deploy with make release", "unrelated gardening tips"], [{}, {}]))
+        asyncio.run(shards.ingest("chat", ["how do we deploy a release", "lunch plans"], [{}, {}]))
+        encoded = self.model.encoded
+        hits = asyncio.run(shards.query(["docs", "chat"], "deploy release", k=2))
+        self.assertEqual(sorted((h["namespace"], h["text"]) for h in hits),
+                         [("chat", "how do we deploy a release"), ("docs", "deploy with make release")])
+        # the query is encoded once and the stored texts come from the shared cache
+        self.assertEqual(self.model.encoded - encoded, 1)
+
+    def test_manager_over_a_namespace(self):
+        shards = self._shards()
+        manager = MemoryManager(shards.namespace("session-1"), ingest_window=0.01)
+        asyncio.run(manager.add_message("user", "my build uses bazel"))
+        manager.save()
+        self.assertEqual(asyncio.run(shards.query("session-1", "bazel", k=1))[0]["text"], "my build uses bazel")
+        self.assertEqual(asyncio.run(shards.query("session-2", "bazel", k=1)), [])
+
+    def test_tools_are_scoped_to_the_configured_namespaces(self):
+        from tools import memory_ingest, memory_query
+        shards = self._shards()
+        asyncio.run(shards.ingest("team", ["the team deploys on fridays"], [{}]))
+        asyncio.run(shards.ingest("other", ["other tenant deploys secrets"], [{}]))
+        env = {"MEMORY_NAMESPACE": "mine", "MEMORY_SEARCH_NAMESPACES": "team, mine"}
+        with mock.patch.object(shards_module, "_sharded", shards), mock.patch.dict(os.environ, env):
+            self.assertEqual(shards_module.search_namespaces(), ["mine", "team"])
+            asyncio.run(memory_ingest._run({"texts": ["i deploy by hand"], "metadata": [{}]}))
+            # a namespace the model makes up is ignored
+            hits = json.loads(asyncio.run(memory_query._run({"query": "deploys", "k": 5, "namespaces": ["other"]})))
+        self.assertEqual(sorted(h["namespace"] for h in hits), ["mine", "team"])
+        self.assertEqual(asyncio.run(shards.query("mine", "deploy", k=5))[0]["text"], "i deploy by hand")
+
+if __name__ == '__main__':
+    unittest.main()
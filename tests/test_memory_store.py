@@ -0,0 +1,189 @@
+import unittest
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from memory import faiss_store
+from memory.faiss_store import ReadWriteLock, get_store
+
+class HashingModel:
+    """Deterministic stand-in for a SentenceTransformer: bag of hashed words."""
+    dim = 32
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, texts):
+        self.encoded += len(texts)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                out[row, sum(map(ord, word)) % self.dim] += 1.0
+        return out
+
+class TestSharedStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index_path = os.path.join(self.tmp.name, "index.faiss")
+        faiss_store._models["hashing-test"] = HashingModel()
+
+    def tearDown(self):
+        faiss_store._stores.clear()
+        faiss_store._models.pop("hashing-test", None)
+        self.tmp.cleanup()
+
+    def test_one_store_per_path(self):
+        store = get_store(self.index_path, model_name="hashing-test")
+        self.assertIs(get_store(self.index_path, model_name="hashing-test"), store)
+        other = get_store(os.path.join(self.tmp.name, "other", "index.faiss"), model_name="hashing-test")
+        self.assertIsNot(other, store)
+        self.assertIs(other._get_model(), store._get_model())
+        with self.assertRaises(ValueError):
+            get_store(self.index_path, model_name="another-model")
+
+    def test_lazy_load_and_persist(self):
+        store = get_store(self.index_path, model_name="hashing-test")
+        asyncio.run(store.ingest(["red apples", "blue sky"], [{"id": 1}, {"id": 2}]))
+        results = asyncio.run(store.query("apples", k=1))
+        self.assertEqual(results[0]["metadata"], {"id": 1})
+        store.save()
+
+        faiss_store._stores.clear()
+        reopened = get_store(self.index_path, model_name="hashing-test")
+        self.assertEqual(asyncio.run(reopened.query("sky", k=1))[0]["metadata"], {"id": 2})
+
+    def test_repeated_query_skips_model(self):
+        store = get_store(self.index_path, model_name="hashing-test")
+        model = store._get_model()
+        asyncio.run(store.ingest(["red apples", "red apples"], [{"id": 1}, {"id": 2}]))
+        self.assertEqual(model.encoded, 1)
+        asyncio.run(store.query("apples"))
+        asyncio.run(store.query("apples"))
+        self.assertEqual(model.encoded, 2)
+        self.assertEqual(store.embedding_cache.info()["ram_hits"], 1)
+
+class TestQueryMany(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.model = faiss_store._models["hashing-test"] = HashingModel()
+        self.store = faiss_store.FaissStore(os.path.join(self.tmp.name, "index.faiss"), os.path.join(self.tmp.name, "meta.pkl"),
+                                            "hashing-test", cache_embeddings=False)
+        texts = [f"topic{i % 5} note {i}" for i in range(40)]
+        asyncio.run(self.store.ingest(texts, [{"topic": i % 5, "even": i % 2 == 0} for i in range(40)]))
+
+    def tearDown(self):
+        self.store.close()
+        faiss_store._models.pop("hashing-test", None)
+        self.tmp.cleanup()
+
+    def test_matches_single_queries_with_one_encode_and_search(self):
+        queries = ["topic1 note", "topic3", "note 7"]
+        singles = [asyncio.run(self.store.query(q, k=4)) for q in queries]
+        encoded = self.model.encoded
+        with mock.patch.object(self.store.index, "search", wraps=self.store.index.search) as search:
+            batched = asyncio.run(self.store.query_many(queries, k=4))
+        self.assertEqual(batched, singles)
+        self.assertEqual(self.model.encoded - encoded, len(queries))
+        self.assertEqual(search.call_count, 1)
+
+    def test_metadata_filter(self):
+        results = asyncio.run(self.store.query_many(["topic1", "topic2"], k=5, where={"topic": [1, 3], "even": False}))
+        for hits in results:
+            self.assertEqual(len(hits), 5)
+            for hit in hits:
+                self.assertIn(hit["metadata"]["topic"], (1, 3))
+                self.assertFalse(hit["metadata"]["even"])
+        self.assertEqual(asyncio.run(self.store.query("topic1", k=3, where={"topic": 9})), [])
+
+    def test_selective_filter_over_many_candidates(self):
+        texts = [f"bulk entry {i}" for i in range(1500)]
+        asyncio.run(self.store.ingest(texts, [{"rare": i == 1234} for i in range(1500)]))
+        # the search deepens to the whole store; ids go to SQLite in batches
+        self.store.db._conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+        hits = asyncio.run(self.store.query("topic1", k=3, where={"rare": True}))
+        self.assertEqual([h["text"] for h in hits], ["bulk entry 1234"])
+
+class SlowModel(HashingModel):
+    def encode(self, texts):
+        time.sleep(0.2)
+        return super().encode(texts)
+
+class TestNonBlockingStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        faiss_store._models["slow-test"] = SlowModel()
+        self.store = faiss_store.FaissStore(os.path.join(self.tmp.name, "index.faiss"), os.path.join(self.tmp.name, "meta.pkl"),
+                                            "slow-test", cache_embeddings=False, encode_workers=4)
+
+    def tearDown(self):
+        self.store.close()
+        faiss_store._models.pop("slow-test", None)
+        self.tmp.cleanup()
+
+    def test_event_loop_keeps_running_and_queries_overlap(self):
+        async def _run():
+            await self.store.ingest(["first note", "second note"], [{}, {}])
+            ticks = 0
+            done = False
+
+            async def _ticker():
+                nonlocal ticks
+                while not done:
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+
+            ticker = asyncio.create_task(_ticker())
+            start = time.perf_counter()
+            results = await asyncio.gather(*(self.store.query(q, k=1) for q in ("first", "second", "note", "x")))
+            elapsed = time.perf_counter() - start
+            done = True
+            await ticker
+            return results, ticks, elapsed
+
+        results, ticks, elapsed = asyncio.run(_run())
+        self.assertEqual(results[0][0]["text"], "first note")
+        self.assertGreater(ticks, 5)
+        self.assertLess(elapsed, 0.6)
+
+class TestReadWriteLock(unittest.TestCase):
+    def test_readers_share_writers_exclude(self):
+        lock = ReadWriteLock()
+        active, peak, events = [0], [0], []
+        guard = threading.Lock()
+
+        def reader():
+            with lock.read():
+                with guard:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                time.sleep(0.05)
+                with guard:
+                    active[0] -= 1
+
+        def writer():
+            with lock.write():
+                with guard:
+                    events.append(active[0])
+
+        threads = [threading.Thread(target=reader) for _ in range(4)] + [threading.Thread(target=writer)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertGreater(peak[0], 1)
+        self.assertEqual(events, [0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agent.plan_stream import PlanStreamParser
+
+def feed_chars(parser, text):
+    closed = []
+    for ch in text:
+        closed.extend(parser.feed(ch))
+    return closed
+
+class TestPlanStreamParser(unittest.TestCase):
+    def test_elements_close_one_by_one(self):
+        parser = PlanStreamParser()
+        self.assertEqual(parser.feed('[{"tool": "a", "args": {"x": [1, 2]}}'), [])
+        self.assertTrue(parser.is_plan)
+        closed = parser.feed(', {"tool": "b", "args": {}}]')
+        self.assertEqual(closed, [{"tool": "a", "args": {"x": [1, 2]}}, {"tool": "b", "args": {}}])
+        self.assertTrue(parser.done)
+
+    def test_strings_with_brackets_and_escapes(self):
+        text = '[{"tool": "echo", "args": {"text": "a ] } , \\" ["}}]'
+        closed = feed_chars(PlanStreamParser(), text)
+        self.assertEqual(closed, [{"tool": "echo", "args": {"text": 'a ] } , " ['}}])
+
+    def test_code_fence_is_skipped(self):
+        closed = feed_chars(PlanStreamParser(), '```json\n[{"tool": "a", "args": {}}]\n```')
+        self.assertEqual(closed, [{"tool": "a", "args": {}}])
+
+    def test_invalid_element_keeps_its_place(self):
+        closed = feed_chars(PlanStreamParser(), '[{"tool": "a", "args": {}}, {"tool": b}, {"tool": "c", "args": {}}]')
+        self.assertEqual(len(closed), 3)
+        self.assertIsNone(closed[1]["tool"])
+        self.assertIn("Invalid plan step", closed[1]["error"])
+        self.assertEqual(closed[2], {"tool": "c", "args": {}})
+
+    def test_prose_is_text(self):
+        parser = PlanStreamParser()
+        self.assertEqual(feed_chars(parser, "  Hello [world]"), [])
+        self.assertFalse(parser.is_plan)
+        # a bracket may open a plan wrapped in prose, so the rest waits for the end
+        self.assertEqual(parser.take_text(), "  Hello ")
+        feed_chars(parser, " and `more`")
+        self.assertEqual(parser.take_text(), "")
+        self.assertEqual(parser.take_text(final=True), "[world] and `more`")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agent.prompt import PromptBuilder, estimate_tokens
+
+class TestPromptBuilder(unittest.TestCase):
+    def test_history_is_append_only(self):
+        history = PromptBuilder("system")
+        history.add("user", "hi")
+        first = history.build()
+        history.add("assistant", "[]")
+        history.add("tool", "result")
+        second = history.build()
+        self.assertEqual(second[:len(first)], first)
+        self.assertEqual(second[0], {"role": "system", "content": "system"})
+        self.assertEqual(second[-1], {"role": "user", "content": "tool_output: result"})
+        self.assertEqual(history.stats["prefix_hits"], 1)
+        self.assertEqual(history.stats["stable_prefix_messages"], 2)
+
+    def test_prefix_hashes_chain(self):
+        a, b = PromptBuilder("system"), PromptBuilder("system")
+        a.add("user", "x")
+        b.add("user", "y")
+        self.assertEqual(a.prefix_hashes()[0], b.prefix_hashes()[0])
+        self.assertNotEqual(a.prefix_hashes()[1], b.prefix_hashes()[1])
+
+    def test_old_tool_outputs_are_compacted(self):
+        history = PromptBuilder("system", token_budget=1000, keep_recent=2, elide_head_chars=100)
+        history.add("user", "question")
+        for _ in range(4):
+            history.add("assistant", "[]")
+            history.add("tool", "x" * 2000)
+        messages = history.build()
+        self.assertLessEqual(history.token_count(), 750)
+        self.assertEqual(messages[-1]["content"], "tool_output: " + "x" * 2000)
+        self.assertIn("[elided", messages[3]["content"])
+        self.assertEqual(history.stats["compactions"], 1)
+        self.assertEqual(history.stats["prefix_hits"], 0)
+
+        history.add("assistant", "done")
+        history.build()
+        self.assertEqual(history.stats["prefix_hits"], 1)
+
+    def test_estimate_tokens(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("abcd"), 1)
+        self.assertEqual(estimate_tokens("abcde"), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agent.agent import Agent
+from tools import read_result, file_read  # noqa: F401  (registers the tools)
+from tools.result_store import ResultStore
+from tools.tool_base import get_global_registry
+from tests.test_agent_plan import make_config, make_registry
+
+class TestResultStore(unittest.TestCase):
+    def test_paging(self):
+        store = ResultStore()
+        handle = store.put("abcdefghij")
+        page = store.read(handle, 0, 4)
+        self.assertEqual((page["text"], page["next_offset"], page["total"]), ("abcd", 4, 10))
+        page = store.read(handle, 8, 4)
+        self.assertEqual((page["text"], page["next_offset"]), ("ij", None))
+
+    def test_lru_bound(self):
+        store = ResultStore(max_chars=10)
+        first = store.put("x" * 6)
+        second = store.put("y" * 6)
+        with self.assertRaises(KeyError):
+            store.read(first)
+        self.assertEqual(store.read(second)["total"], 6)
+
+class TestToolMessages(unittest.TestCase):
+    def test_large_output_becomes_handle(self):
+        registry = make_registry()
+        registry.register(get_global_registry().get("read_result"))
+        agent = Agent(make_config(max_tool_output_chars=100), registry)
+        message = agent._tool_message("z" * 1000)
+        self.assertLess(len(message), 300)
+        handle = message.split('handle "')[1].split('"')[0]
+        page = json.loads(registry.get("read_result").run({"handle": handle, "offset": 100, "limit": 1000}))
+        self.assertEqual(page["text"], "z" * 900)
+
+    def test_pages_through_a_large_result(self):
+        registry = make_registry()
+        registry.register(get_global_registry().get("read_result"))
+        agent = Agent(make_config(max_tool_output_chars=4000), registry)
+        # quotes, newlines and non-ASCII all grow when JSON-encoded
+        original = "".join(f'line {i}: "quoted" \\ é\n' for i in range(2000))
+        message = agent._tool_message(original)
+        handle = message.split('handle "')[1].split('"')[0]
+        offset = int(message.split("and offset ")[1].split(" ")[0])
+        text, pages = original[:offset], 0
+        while offset is not None:
+            step = {"tool": "read_result", "args": {"handle": handle, "offset": offset, "limit": 100000}}
+            reply = agent._run_step(pages, step, [])
+            self.assertEqual(agent._tool_message(reply), reply)  # never re-wrapped
+            page = json.loads(reply)
+            self.assertEqual(page["handle"], handle)
+            text += page["text"]
+            offset = page["next_offset"]
+            pages += 1
+        self.assertEqual(text, original)
+        self.assertGreater(pages, 5)
+
+    def test_without_read_result_output_is_kept(self):
+        agent = Agent(make_config(max_tool_output_chars=100), make_registry())
+        self.assertEqual(agent._tool_message("z" * 1000), "z" * 1000)
+
+class TestFileReadBounds(unittest.TestCase):
+    def test_line_ranges(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+            f.write("".join(f"line{i}\n" for i in range(1, 11)))
+        try:
+            run = get_global_registry().get("file_read").run
+            self.assertEqual(json.loads(run({"path": f.name, "start_line": 3, "end_line": 4})),
+                             ["3 | line3", "4 | line4"])
+            self.assertEqual(len(json.loads(run({"path": f.name}))), 10)
+            self.assertEqual(json.loads(run({"path": f.name, "start_line": 9, "end_line": 50})),
+                             ["9 | line9", "10 | line10"])
+        finally:
+            os.remove(f.name)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tools.tool_base import Tool, ToolCache, ToolRegistry
+
+class TestToolCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "a.txt")
+        with open(self.path, "w") as f:
+            f.write("one")
+        self.calls = 0
+        self.registry = ToolRegistry(ToolCache(max_entries=2))
+
+        def _read(args):
+            self.calls += 1
+            with open(args["path"]) as f:
+                return f.read()
+
+        def _write(args):
+            with open(args["path"], "w") as f:
+                f.write(args["content"])
+            return "ok"
+
+        def _search(args):
+            self.calls += 1
+            return "hits"
+
+        schema = {"type": "object", "properties": {}}
+        self.registry.register(Tool("read", "", schema, _read, cacheable=True, path_args=("path",)))
+        self.registry.register(Tool("search", "", schema, _search, cacheable=True, cache_ttl=0.05, path_args=("root",)))
+        self.registry.register(Tool("write", "", schema, _write, write_path_args=("path",)))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_repeated_calls_hit(self):
+        read = self.registry.get("read")
+        self.assertEqual(read.run({"path": self.path}), "one")
+        self.assertEqual(read.run({"path": self.path}), "one")
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.registry.cache.stats["hits"], 1)
+        self.assertEqual(self.registry.cache.stats["misses"], 1)
+
+    def test_external_change_invalidates(self):
+        read = self.registry.get("read")
+        read.run({"path": self.path})
+        with open(self.path, "w") as f:
+            f.write("three")
+        self.assertEqual(read.run({"path": self.path}), "three")
+        self.assertEqual(self.calls, 2)
+
+    def test_write_evicts_readers_of_path_and_parents(self):
+        self.registry.get("read").run({"path": self.path})
+        self.registry.get("search").run({"root": self.tmp.name})
+        self.registry.get("write").run({"path": self.path, "content": "two"})
+        self.assertEqual(self.registry.cache.info()["size"], 0)
+        self.assertEqual(self.registry.get("read").run({"path": self.path}), "two")
+
+    def test_ttl_and_lru_bounds(self):
+        search = self.registry.get("search")
+        search.run({"root": self.tmp.name})
+        time.sleep(0.1)
+        search.run({"root": self.tmp.name})
+        self.assertEqual(self.calls, 2)
+
+        read = self.registry.get("read")
+        for i in range(3):
+            read.run({"path": self.path, "n": i})
+        self.assertEqual(self.registry.cache.info()["size"], 2)
+        self.assertGreaterEqual(self.registry.cache.stats["evictions"], 1)
+
+    def test_arg_order_does_not_matter(self):
+        a = ToolCache.key(Tool("t", "", {}, None), {"a": 1, "b": 2})
+        b = ToolCache.key(Tool("t", "", {}, None), {"b": 2, "a": 1})
+        self.assertEqual(a, b)
+
+class TestWebSearchFailures(unittest.TestCase):
+    def test_network_errors_are_not_cached(self):
+        from tools import web_search
+        registry = ToolRegistry(ToolCache())
+        registry.register(Tool("web_search", "", {"type": "object", "properties": {}}, web_search._run,
+                               cacheable=True, cache_ttl=600.0))
+        search = registry.get("web_search")
+        with mock.patch("urllib.request.urlopen", side_effect=OSError("network is unreachable")):
+            with self.assertRaisesRegex(RuntimeError, "unreachable"):
+                search.run({"query": "python"})
+        self.assertEqual(registry.cache.info()["size"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
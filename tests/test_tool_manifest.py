@@ -0,0 +1,54 @@
+import unittest
+import importlib
+import os
+import sys
+import tempfile
+import textwrap
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tools.manifest import load_manifest, tool_from_entry
+from tools.tool_base import get_global_registry
+
+class TestToolManifest(unittest.TestCase):
+    def test_manifest_matches_tool_modules(self):
+        manifest = load_manifest()
+        registry = get_global_registry()
+        for name in ["file_read", "file_search", "file_write", "find_path", "list_directory", "web_search"]:
+            importlib.import_module(manifest[name]["module"])
+            tool = registry.get(name)
+            entry = tool_from_entry(manifest[name])
+            self.assertEqual(entry.description, tool.description)
+            self.assertEqual(entry.parameters, tool.parameters)
+            self.assertEqual((entry.cacheable, entry.cache_ttl, entry.path_args, entry.write_path_args, entry.read_only),
+                             (tool.cacheable, tool.cache_ttl, tool.path_args, tool.write_path_args, tool.read_only))
+
+    def test_read_only_is_independent_of_caching(self):
+        manifest = load_manifest()
+        for name in ["web_scrape", "memory_query", "memory_query_batch", "read_result", "file_read"]:
+            self.assertTrue(tool_from_entry(manifest[name]).read_only, name)
+        for name in ["file_write", "memory_ingest", "code_exec"]:
+            self.assertFalse(tool_from_entry(manifest[name]).read_only, name)
+
+    def test_lazy_tool_imports_module_on_first_call(self):
+        with tempfile.TemporaryDirectory() as td:
+            with open(os.path.join(td, "lazy_probe_tool.py"), "w") as f:
+                f.write(textwrap.dedent("""
+                    from tools.tool_base import Tool, register
+                    register(Tool("lazy_probe", "probe", {"type": "object"}, lambda args: "loaded"))
+                """))
+            sys.path.insert(0, td)
+            try:
+                registry = get_global_registry()
+                entry = {"name": "lazy_probe", "description": "probe", "parameters": {"type": "object"}}
+                registry.register_lazy(tool_from_entry(entry), "lazy_probe_tool")
+                self.assertNotIn("lazy_probe_tool", sys.modules)
+                self.assertEqual(registry.get("lazy_probe").run({}), "loaded")
+                self.assertIn("lazy_probe_tool", sys.modules)
+            finally:
+                sys.path.remove(td)
+                sys.modules.pop("lazy_probe_tool", None)
+                registry._registry.pop("lazy_probe", None)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tools.tool_base import Tool, ToolRegistry, jsonschema
+
+FLAT = {
+    "type": "object",
+    "properties": {
+        "path": {"type": "string", "description": "a path"},
+        "count": {"type": "integer", "default": 5},
+        "ratio": {"type": "number"},
+        "tags": {"type": "array", "items": {"type": "string"}},
+        "extra": {"type": "object", "additionalProperties": True},
+        "anything": {},
+    },
+    "required": ["path"],
+}
+
+NESTED = {
+    "type": "object",
+    "properties": {"n": {"type": "integer", "minimum": 1}},
+    "required": ["n"],
+    "additionalProperties": False,
+}
+
+UNIONS = {
+    "type": "object",
+    "properties": {
+        "name": {"type": ["string", "null"]},
+        "tags": {"type": "array", "items": {"type": ["string", "integer"]}},
+        "anything": True,
+    },
+}
+
+@unittest.skipIf(jsonschema is None, "jsonschema not installed")
+class TestToolValidation(unittest.TestCase):
+    def setUp(self):
+        self.registry = ToolRegistry()
+        self.registry.register(Tool("flat", "flat schema", FLAT, lambda args: "ok"))
+        self.registry.register(Tool("nested", "non-flat schema", NESTED, lambda args: "ok"))
+        self.registry.register(Tool("unions", "type lists and boolean subschemas", UNIONS, lambda args: "ok"))
+
+    def _expected_error(self, name, schema, args):
+        try:
+            jsonschema.validate(args, schema)
+        except Exception as e:
+            return f"args validation failed for {name}: {e}"
+        return None
+
+    def _actual_error(self, name, args):
+        try:
+            self.registry.get(name).run(args)
+        except ValueError as e:
+            return str(e)
+        return None
+
+    def test_errors_match_jsonschema(self):
+        cases = [
+            ("flat", FLAT, {"path": "a", "count": 2, "ratio": 0.5, "tags": ["x"], "extra": {"a": 1}, "anything": [1]}),
+            ("flat", FLAT, {"path": "a", "count": 2.0}),
+            ("flat", FLAT, {}),
+            ("flat", FLAT, {"path": 3}),
+            ("flat", FLAT, {"path": "a", "count": True}),
+            ("flat", FLAT, {"path": "a", "tags": ["x", 1]}),
+            ("flat", FLAT, {"path": "a", "unknown": 1}),
+            ("flat", FLAT, ["not", "an", "object"]),
+            ("nested", NESTED, {"n": 0}),
+            ("nested", NESTED, {"n": 2, "m": 1}),
+            ("nested", NESTED, {"n": 2}),
+            ("unions", UNIONS, {"name": None, "tags": ["a", 1], "anything": {}}),
+            ("unions", UNIONS, {"name": 3}),
+            ("unions", UNIONS, {"tags": [1.5]}),
+        ]
+        for name, schema, args in cases:
+            with self.subTest(name=name, args=args):
+                self.assertEqual(self._actual_error(name, args), self._expected_error(name, schema, args))
+
+    def test_bound_tool_is_cached_until_reregistered(self):
+        first = self.registry.get("flat")
+        self.assertIs(self.registry.get("flat"), first)
+        self.registry.register(Tool("flat", "replaced", FLAT, lambda args: "new"))
+        second = self.registry.get("flat")
+        self.assertIsNot(second, first)
+        self.assertEqual(second.run({"path": "a"}), "new")
+
+    def test_invalid_schema_fails_on_call(self):
+        self.registry.register(Tool("bad", "bad schema", {"type": "no-such-type"}, lambda args: "ok"))
+        error = self._actual_error("bad", {})
+        self.assertTrue(error.startswith("args validation failed for bad: "))
+
+if __name__ == '__main__':
+    unittest.main()
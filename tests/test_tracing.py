@@ -0,0 +1,73 @@
+import unittest
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agent.agent import Agent
+from agent.backends import ScriptedBackend
+from tracing.tracer import _NOOP, disable_tracing, enable_tracing, span
+from tests.test_agent_plan import make_config, make_registry
+
+PLAN = '[{"tool": "sleep", "args": {"seconds": 0.05}}, {"tool": "echo", "args": {"text": "$1.output"}}]'
+
+class TestTracing(unittest.TestCase):
+    def tearDown(self):
+        disable_tracing()
+
+    def test_disabled_is_noop(self):
+        with span("anything", x=1) as s:
+            s.set(y=2)
+        self.assertIs(s, _NOOP)
+
+    def test_session_nesting_across_scheduler_threads(self):
+        tracer = enable_tracing()
+        agent = Agent(make_config(), make_registry(), ScriptedBackend([PLAN, "done"]))
+        self.assertEqual(agent.run("go"), "done")
+
+        by_name = {}
+        for s in tracer.spans:
+            by_name.setdefault(s.name, []).append(s)
+        session = by_name["session"][0]
+        turns = by_name["turn"]
+        self.assertEqual([t.parent for t in turns], [session.id] * 2)
+        self.assertEqual(len(by_name["llm_call"]), 2)
+        self.assertEqual(len(by_name["tool_call"]), 2)
+        first_turn = min(turns, key=lambda t: t.start_ns)
+        for call in by_name["tool_call"]:
+            self.assertEqual(call.parent, first_turn.id)
+            self.assertNotEqual(call.track, session.track)
+
+    def test_async_session(self):
+        tracer = enable_tracing()
+        agent = Agent(make_config(), make_registry(), ScriptedBackend([PLAN, "done"]))
+        asyncio.run(agent.arun("go"))
+        names = sorted(s.name for s in tracer.spans)
+        self.assertEqual(names.count("tool_call"), 2)
+        self.assertEqual(names.count("session"), 1)
+
+    def test_exports(self):
+        tracer = enable_tracing()
+        with span("outer"):
+            with span("inner", n=1):
+                pass
+        with tempfile.TemporaryDirectory() as td:
+            chrome = os.path.join(td, "trace.json")
+            jsonl = os.path.join(td, "trace.jsonl")
+            tracer.export(chrome)
+            tracer.export(jsonl)
+            with open(chrome) as f:
+                events = json.load(f)["traceEvents"]
+            self.assertEqual([e["name"] for e in events if e["ph"] == "X"], ["outer", "inner"])
+            with open(jsonl) as f:
+                records = [json.loads(line) for line in f]
+        inner = next(r for r in records if r["name"] == "inner")
+        outer = next(r for r in records if r["name"] == "outer")
+        self.assertEqual(inner["parent"], outer["id"])
+        self.assertEqual(inner["attrs"], {"n": 1})
+
+if __name__ == '__main__':
+    unittest.main()
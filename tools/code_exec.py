@@ -14,9 +14,12 @@ def get_sandbox():
     else:
         raise ValueError(f"Unknown sandbox backend: {backend_name}")
 
-sandbox = get_sandbox()
+sandbox = None
 
 def _run(args: dict) -> str:
+    global sandbox
+    if sandbox is None:
+        sandbox = get_sandbox()
     return sandbox.run_code(**args)
 
 register(
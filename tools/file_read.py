@@ -6,11 +6,16 @@ from .tool_base import Tool, register
 
 
 def _read_lines(path: Path, start: int | None, end: int | None) -> List[str]:
-    with open(path, "r", errors="ignore") as fh:
-        lines = fh.readlines()
     start = max((start or 1), 1)
-    end = min((end or len(lines)), len(lines))
-    return [f"{i+1} | {lines[i].rstrip()}" for i in range(start - 1, end)]
+    out = []
+    with open(path, "r", errors="ignore") as fh:
+        # stream the file so a bounded read stops at `end` instead of loading it all
+        for i, line in enumerate(fh, 1):
+            if end and i > end:
+                break
+            if i >= start:
+                out.append(f"{i} | {line.rstrip()}")
+    return out
 
 
 def _run(args: dict) -> str:
@@ -36,5 +41,8 @@ register(
             "required": ["path"],
         },
         run=_run,
+        read_only=True,
+        cacheable=True,
+        path_args=("path",),
     )
 )
\ No newline at end of file
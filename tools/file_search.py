@@ -47,5 +47,9 @@ register(
             "required": ["regex"],
         },
         run=_run,
+        read_only=True,
+        cacheable=True,
+        cache_ttl=30.0,  # edits below the root do not change its mtime
+        path_args=("path",),
     )
 )
\ No newline at end of file
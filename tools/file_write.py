@@ -40,5 +40,6 @@ register(
             "required": ["path", "content"],
         },
         run=file_write,
+        write_path_args=("path",),
     )
 )
\ No newline at end of file
@@ -63,5 +63,9 @@ register(
             "required": ["pattern"],
         },
         run=_run,
+        read_only=True,
+        cacheable=True,
+        cache_ttl=30.0,
+        path_args=("root",),
     )
 )
\ No newline at end of file
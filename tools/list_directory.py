@@ -45,5 +45,9 @@ register(
             "required": [],
         },
         run=_run,
+        read_only=True,
+        cacheable=True,
+        cache_ttl=30.0,  # recursive listings only fingerprint the root
+        path_args=("path",),
     )
 )
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""
+Static tool manifest.
+
+`manifest.json` holds each tool's name, description, parameter schema,
+cache settings and read-only flag, so the agent can describe tools to the
+model, schedule them and register them without importing their modules. Regenerate it after adding or changing
+a tool:
+
+    python -m tools.manifest
+"""
+import importlib
+import json
+import os
+import sys
+from typing import Any, Dict, List
+
+from .tool_base import Tool, get_global_registry
+
+MANIFEST_PATH = os.path.join(os.path.dirname(__file__), "manifest.json")
+
+_FIELDS = ("name", "description", "parameters", "cacheable", "cache_ttl", "path_args", "write_path_args",
+           "read_only")
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> Dict[str, Dict[str, Any]]:
+    """Returns manifest entries keyed by tool name, or {} if there is no manifest."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {entry["name"]: entry for entry in json.load(f)}
+
+
+def tool_from_entry(entry: Dict[str, Any]) -> Tool:
+    """Builds a Tool (without a run function) from a manifest entry."""
+    return Tool(
+        name=entry["name"],
+        description=entry["description"],
+        parameters=entry["parameters"],
+        run=None,
+        cacheable=entry.get("cacheable", False),
+        cache_ttl=entry.get("cache_ttl"),
+        path_args=tuple(entry.get("path_args", ())),
+        write_path_args=tuple(entry.get("write_path_args", ())),
+        read_only=entry.get("read_only", False),
+    )
+
+
+def build_manifest(modules: List[str]) -> List[Dict[str, Any]]:
+    """Imports the given tool modules and describes every tool they register."""
+    registry = get_global_registry()
+    entries = []
+    for module in modules:
+        try:
+            mod = importlib.import_module(f"tools.{module}")
+        except Exception as e:
+            print(f"skipping tools.{module}: {e}", file=sys.stderr)
+            continue
+        for tool in registry.list_available():
+            if getattr(tool.run, "__module__", None) != mod.__name__:
+                continue
+            entry = {field: getattr(tool, field) for field in _FIELDS}
+            entry["path_args"] = list(tool.path_args)
+            entry["write_path_args"] = list(tool.write_path_args)
+            entry["module"] = mod.__name__
+            entries.append(entry)
+    return sorted(entries, key=lambda e: e["name"])
+
+
+def main():
+    here = os.path.dirname(__file__)
+    skip = {"__init__", "tool_base", "manifest"}
+    modules = sorted(f[:-3] for f in os.listdir(here) if f.endswith(".py") and f[:-3] not in skip)
+    entries = build_manifest(modules)
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(entries, f, indent=2)
+        f.write("\n")
+    print(f"wrote {len(entries)} tools to {MANIFEST_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,8 @@
-from memory.faiss_store import FaissStore
+from memory.shards import get_memory
 from .tool_base import Tool, register
 
-store = FaissStore()
-
 async def _run(args: dict) -> str:
-    await store.ingest(args["texts"], args["metadata"])
+    await get_memory().ingest(args["texts"], args["metadata"])
     return "Ingested successfully."
 
 register(
@@ -21,4 +19,4 @@ register(
         },
         run=_run,
     )
-)
\ No newline at end of file
+)
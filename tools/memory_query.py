@@ -1,11 +1,28 @@
 import json
-from memory.faiss_store import FaissStore
+from memory.faiss_store import get_store
+from memory.shards import get_sharded_memory, search_namespaces
 from .tool_base import Tool, register
 
-store = FaissStore()
+_WHERE = {
+    "type": "object",
+    "description": "Only return texts whose metadata has these values; a list matches any of its items.",
+}
 
+# the namespaces come from the config, never from the model
 async def _run(args: dict) -> str:
-    results = await store.query(args["query"], args.get("k", 5))
+    namespaces = search_namespaces()
+    if namespaces:
+        results = await get_sharded_memory().query(namespaces, args["query"], args.get("k", 5), args.get("where"))
+    else:
+        results = await get_store().query(args["query"], args.get("k", 5), args.get("where"))
+    return json.dumps(results)
+
+async def _run_batch(args: dict) -> str:
+    namespaces = search_namespaces()
+    if namespaces:
+        results = await get_sharded_memory().query_many(namespaces, args["queries"], args.get("k", 5), args.get("where"))
+    else:
+        results = await get_store().query_many(args["queries"], args.get("k", 5), args.get("where"))
     return json.dumps(results)
 
 register(
@@ -17,9 +34,29 @@ register(
             "properties": {
                 "query": {"type": "string"},
                 "k": {"type": "integer", "default": 5},
+                "where": _WHERE,
             },
             "required": ["query"],
         },
         run=_run,
+        read_only=True,
+    )
+)
+
+register(
+    Tool(
+        name="memory_query_batch",
+        description="Queries the vector store for several queries at once; returns one result list per query.",
+        parameters={
+            "type": "object",
+            "properties": {
+                "queries": {"type": "array", "items": {"type": "string"}},
+                "k": {"type": "integer", "default": 5},
+                "where": _WHERE,
+            },
+            "required": ["queries"],
+        },
+        run=_run_batch,
+        read_only=True,
     )
-)
\ No newline at end of file
+)
@@ -0,0 +1,39 @@
+import json
+
+from .result_store import get_result_store
+from .tool_base import Tool, register
+
+
+def _run(args: dict) -> str:
+    store = get_result_store()
+    handle, offset, limit = args["handle"], int(args.get("offset", 0)), int(args.get("limit", 4000))
+    try:
+        page = store.read(handle, offset, limit)
+    except KeyError as e:
+        return json.dumps({"error": str(e.args[0])})
+    # `limit` bounds the whole reply, JSON and escapes included, so that a
+    # page never gets wrapped in a handle of its own
+    reply = json.dumps(page, ensure_ascii=False)
+    while len(reply) > limit and page["text"]:
+        page = store.read(handle, offset, len(page["text"]) - (len(reply) - limit))
+        reply = json.dumps(page, ensure_ascii=False)
+    return reply
+
+
+register(
+    Tool(
+        name="read_result",
+        description="Reads a page of a large tool output that was replaced by a handle in the conversation.",
+        parameters={
+            "type": "object",
+            "properties": {
+                "handle": {"type": "string", "description": "The result handle, e.g. 'res_3'."},
+                "offset": {"type": "integer", "description": "Character offset to start from. Defaults to 0.", "default": 0},
+                "limit": {"type": "integer", "description": "Maximum characters of the reply. Defaults to 4000.", "default": 4000},
+            },
+            "required": ["handle"],
+        },
+        run=_run,
+        read_only=True,
+    )
+)
@@ -0,0 +1,57 @@
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Any, Dict
+
+
+class ResultStore:
+    """
+    Keeps large tool outputs out of the conversation. The agent stores the
+    full text here and shows the model a preview plus a handle, which the
+    `read_result` tool pages through. Least recently used results are
+    dropped once `max_chars` is exceeded.
+    """
+
+    def __init__(self, max_chars: int = 64 * 1024 * 1024):
+        self.max_chars = max_chars
+        self._results: "OrderedDict[str, str]" = OrderedDict()
+        self._size = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def put(self, text: str) -> str:
+        """Stores `text` and returns its handle."""
+        with self._lock:
+            handle = f"res_{next(self._ids)}"
+            self._results[handle] = text
+            self._size += len(text)
+            while self._size > self.max_chars and len(self._results) > 1:
+                _, dropped = self._results.popitem(last=False)
+                self._size -= len(dropped)
+            return handle
+
+    def read(self, handle: str, offset: int = 0, limit: int = 4000) -> Dict[str, Any]:
+        """Returns up to `limit` chars of a stored result starting at `offset`."""
+        with self._lock:
+            text = self._results.get(handle)
+            if text is None:
+                raise KeyError(f"unknown or expired result handle: {handle}")
+            self._results.move_to_end(handle)
+        offset = max(0, offset)
+        chunk = text[offset:offset + max(0, limit)]
+        end = offset + len(chunk)
+        return {
+            "handle": handle,
+            "offset": offset,
+            "total": len(text),
+            "text": chunk,
+            "next_offset": end if end < len(text) else None,
+        }
+
+
+_store = ResultStore()
+
+
+def get_result_store() -> ResultStore:
+    """Returns the process-wide result store."""
+    return _store
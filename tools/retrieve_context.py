@@ -28,5 +28,6 @@ register(
             "required": ["query"]
         },
         run=_run,
+        read_only=True,
     )
 )
\ No newline at end of file
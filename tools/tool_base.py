@@ -1,6 +1,12 @@
 import asyncio
-from dataclasses import dataclass
-from typing import Any, Callable, Dict, List
+import importlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 # Optional runtime validation (no hard dependency)
 try:
@@ -14,32 +20,266 @@ class Tool:  # simple schema matching OpenAI-style functions
     description: str
     parameters: Dict[str, Any]  # JSON-schema-like
     run: Callable[[Dict[str, Any]], str]
+    # result caching (opt-in): results of a cacheable tool depend only on its
+    # args and on the files named by `path_args`; `write_path_args` names the
+    # args of a tool that modifies files, whose cached readers get evicted
+    cacheable: bool = False
+    cache_ttl: Optional[float] = None  # seconds; None never expires
+    path_args: Tuple[str, ...] = ()
+    write_path_args: Tuple[str, ...] = ()
+    # scheduling: plan steps calling a read-only tool (one without side
+    # effects) may run alongside each other; any other step runs alone
+    read_only: bool = False
+
+class ToolCache:
+    """
+    LRU cache of tool results keyed on tool name plus canonical JSON args.
+
+    Entries for filesystem tools carry an (mtime, size) fingerprint of every
+    path they read and are dropped when it changes. Directory fingerprints
+    only see entries being added or removed, so recursive tools should also
+    set a TTL; writes made through the registry evict affected entries
+    directly.
+    """
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Any, Optional[float], Tuple]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def key(tool: Tool, args: Dict[str, Any]) -> str:
+        return f"{tool.name}:{json.dumps(args, sort_keys=True, separators=(',', ':'), default=str)}"
+
+    @staticmethod
+    def fingerprint(tool: Tool, args: Dict[str, Any]) -> Tuple:
+        prints = []
+        for name in tool.path_args:
+            path = os.path.abspath(str(args.get(name, ".")))
+            try:
+                st = os.stat(path)
+                prints.append((path, st.st_mtime_ns, st.st_size))
+            except OSError:
+                prints.append((path, None, None))
+        return tuple(prints)
+
+    def lookup(self, key: str, fingerprint: Tuple) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires, cached_print = entry
+                if cached_print == fingerprint and (expires is None or expires > time.monotonic()):
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return True, value
+                del self._entries[key]
+                self.stats["invalidations"] += 1
+            self.stats["misses"] += 1
+            return False, None
+
+    def store(self, key: str, fingerprint: Tuple, value: Any, ttl: Optional[float]) -> None:
+        if self.max_entries <= 0:
+            return
+        expires = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires, fingerprint)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate_path(self, path: str) -> None:
+        """Evicts every entry that read `path`, one of its parents or children."""
+        path = os.path.abspath(path)
+        with self._lock:
+            stale = [
+                key for key, (_, _, prints) in self._entries.items()
+                if any(_overlaps(path, watched) for watched, _, _ in prints)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.stats["invalidations"] += len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "size": len(self._entries), "max_entries": self.max_entries}
+
+def _overlaps(a: str, b: str) -> bool:
+    try:
+        common = os.path.commonpath([a, b])
+    except ValueError:
+        return False
+    return common == a or common == b
+
+# JSON-schema types a flat schema may use, as Python type checks; bool is
+# excluded from the numeric types the way jsonschema excludes it
+_FLAT_TYPES: Dict[str, Callable[[Any], bool]] = {
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "null": lambda v: v is None,
+}
+_ANNOTATIONS = {"description", "default", "title", "examples"}
+
+def _flat_check(schema: Dict[str, Any]) -> Optional[Callable[[Any], bool]]:
+    """
+    Returns a cheap check for a schema made only of `type` (plus
+    annotations), `items` of such a schema, and `additionalProperties: true`,
+    or None if the schema uses anything else (including a list of types
+    or a boolean schema).
+    """
+    if not isinstance(schema, dict) or not isinstance(schema.get("type", ""), str):
+        return None
+    if not set(schema) <= _ANNOTATIONS | {"type", "items", "additionalProperties"}:
+        return None
+    if schema.get("additionalProperties", True) is not True:
+        return None
+    type_check = _FLAT_TYPES.get(schema["type"]) if "type" in schema else (lambda v: True)
+    if type_check is None:
+        return None
+    if "items" not in schema:
+        return type_check
+    item_check = _flat_check(schema["items"])
+    if item_check is None or schema.get("type") != "array":
+        return None
+    return lambda v: type_check(v) and all(item_check(x) for x in v)
+
+def _compile_validator(name: str, schema: Dict[str, Any]) -> Callable[[Dict[str, Any]], None]:
+    """
+    Builds the argument validator for a tool once. Flat object schemas (all
+    current tools) are checked with plain isinstance tests; anything the fast
+    path cannot accept falls through to a precompiled jsonschema validator,
+    so errors read exactly as `jsonschema.validate` would report them.
+    """
+    if jsonschema is None:
+        return lambda args: None
+    try:
+        cls = jsonschema.validators.validator_for(schema)
+        cls.check_schema(schema)
+        validator = cls(schema)
+    except Exception as e:
+        # a broken schema fails every call, as it did when validated per call
+        def _invalid_schema(args: Dict[str, Any], _error=e) -> None:
+            raise ValueError(f"args validation failed for {name}: {_error}")
+        return _invalid_schema
+
+    def _full(args: Dict[str, Any]) -> None:
+        error = jsonschema.exceptions.best_match(validator.iter_errors(args))
+        if error is not None:
+            raise ValueError(f"args validation failed for {name}: {error}")
+
+    fast = None
+    if set(schema) <= _ANNOTATIONS | {"type", "properties", "required"} and schema.get("type") == "object":
+        checks = {prop: _flat_check(sub) for prop, sub in schema.get("properties", {}).items()}
+        if all(check is not None for check in checks.values()):
+            required = tuple(schema.get("required", ()))
+            fast = (checks, required)
+    if fast is None:
+        return _full
+    checks, required = fast
+
+    def _flat(args: Dict[str, Any]) -> None:
+        if (type(args) is dict
+                and all(prop in args for prop in required)
+                and all(check(args[prop]) for prop, check in checks.items() if prop in args)):
+            return
+        _full(args)
+
+    return _flat
 
 class ToolRegistry:
     """A central registry for managing and validating tools."""
-    def __init__(self):
+    def __init__(self, cache: Optional[ToolCache] = None):
         self._registry: Dict[str, Tool] = {}
+        self._validators: Dict[str, Callable[[Dict[str, Any]], None]] = {}
+        self._bound: Dict[str, Tool] = {}
+        self.cache = cache if cache is not None else ToolCache()
 
     def register(self, tool: Tool) -> None:
+        self._validators[tool.name] = _compile_validator(tool.name, tool.parameters)
         self._registry[tool.name] = tool
+        self._bound.pop(tool.name, None)
+
+    def register_lazy(self, tool: Tool, module: str) -> None:
+        """
+        Registers a placeholder for a tool described by the manifest. Its
+        module, which registers the real tool on import, is only imported
+        the first time the tool runs.
+        """
+        if tool.name in self._registry:
+            return
+
+        def _load_and_run(args: Dict[str, Any]) -> str:
+            importlib.import_module(module)
+            real = self._registry[tool.name]
+            if real.run is _load_and_run:
+                raise RuntimeError(f"{module} did not register tool {tool.name}")
+            return real.run(args)
+
+        self.register(replace(tool, run=_load_and_run))
 
     def get(self, name: str) -> Tool:
-        """Return a wrapped Tool that validates args against the JSON schema."""
-        base = self._registry[name]
+        """
+        Return a wrapped Tool that validates args against the JSON schema.
+        The wrapper is built once per registration and reused.
+        """
+        bound = self._bound.get(name)
+        if bound is None:
+            bound = self._bound[name] = self._bind(self._registry[name])
+        return bound
+
+    def describe(self, name: str) -> Tool:
+        """The registered Tool itself, for its metadata; call tools through `get`."""
+        return self._registry[name]
+
+    def _bind(self, base: Tool) -> Tool:
+        _validate = self._validators[base.name]
 
-        def _validated_run(args: Dict[str, Any]) -> str:
-            if jsonschema is not None:
-                try:
-                    jsonschema.validate(args, base.parameters)
-                except Exception as e:
-                    raise ValueError(f"args validation failed for {base.name}: {e}")
-            return base.run(args)
+        # keep coroutine tools recognisable as such, so `invoke` can tell
+        # them apart from blocking ones
+        if asyncio.iscoroutinefunction(base.run):
+            async def _validated_run(args: Dict[str, Any]) -> str:
+                _validate(args)
+                return await base.run(args)
+        elif base.cacheable or base.write_path_args:
+            cache = self.cache
 
-        return Tool(base.name, base.description, base.parameters, _validated_run)
+            def _validated_run(args: Dict[str, Any]) -> str:
+                _validate(args)
+                if base.cacheable:
+                    # fingerprint before running, so a concurrent change is
+                    # never cached under the newer file state
+                    key, fingerprint = cache.key(base, args), cache.fingerprint(base, args)
+                    hit, value = cache.lookup(key, fingerprint)
+                    if hit:
+                        return value
+                result = base.run(args)
+                if base.cacheable:
+                    cache.store(key, fingerprint, result, base.cache_ttl)
+                for arg in base.write_path_args:
+                    if arg in args:
+                        cache.invalidate_path(str(args[arg]))
+                return result
+        else:
+            def _validated_run(args: Dict[str, Any]) -> str:
+                _validate(args)
+                return base.run(args)
+
+        return replace(base, run=_validated_run)
 
     def list_available(self) -> List[Tool]:
         return list(self._registry.values())
 
+    def __contains__(self, name: str) -> bool:
+        return name in self._registry
+
     # note: this is less effective than using tools in system prompt
     def to_openai_def(self, t: Tool) -> Dict[str, Any]:
         """Export Tool metadata as an OpenAI function definition."""
@@ -50,8 +290,13 @@ class ToolRegistry:
         }
 
     async def invoke(self, tool: Tool, args: Dict[str, Any]) -> str:
-        """Run tool.run(), awaiting if it returns a coroutine."""
-        res = tool.run(args)
+        """
+        Run tool.run(), awaiting if it returns a coroutine. Blocking tools are
+        run in a worker thread so they do not stall the event loop.
+        """
+        if asyncio.iscoroutinefunction(tool.run):
+            return await tool.run(args)
+        res = await asyncio.to_thread(tool.run, args)
         return await res if asyncio.iscoroutine(res) else res
 
 # --- Singleton Instance and Global Wrappers ---
@@ -75,5 +320,8 @@ def list_available() -> List[Tool]:
 def to_openai_def(t: Tool) -> Dict[str, Any]:
     return _registry_instance.to_openai_def(t)
 
+def cache_info() -> Dict[str, Any]:
+    return _registry_instance.cache.info()
+
 async def invoke(tool: Tool, args: Dict[str, Any]) -> str:
     return await _registry_instance.invoke(tool, args)
\ No newline at end of file
@@ -35,5 +35,6 @@ register(
             "required": ["url"],
         },
         run=_run,
+        read_only=True,
     )
 )
\ No newline at end of file
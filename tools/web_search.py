@@ -9,25 +9,26 @@ from .tool_base import Tool, register
 def _fetch(query: str, num: int = 5) -> list[dict]:
     """
     Uses the DuckDuckGo Instant Answer API (no API key required).
-    Returns a list of {title, url}.
+    Returns a list of {title, url}. A failed request raises, so that the
+    failure is reported instead of cached as an empty result.
     """
     url = f"https://api.duckduckgo.com/?q={urllib.parse.quote_plus(query)}&format=json"
     try:
         with urllib.request.urlopen(url, timeout=5) as resp:
             data = json.loads(resp.read().decode())
-        
-        results = []
-        if data.get("AbstractURL"):
-            results.append({"title": data.get("Heading"), "url": data.get("AbstractURL")})
+    except (OSError, ValueError) as e:
+        raise RuntimeError(f"web search failed: {e}") from e
 
-        for result in data.get("RelatedTopics", []):
-            if "Text" in result and "FirstURL" in result:
-                results.append({"title": result["Text"], "url": result["FirstURL"]})
-            if len(results) >= num:
-                break
-        return results
-    except Exception:
-        return []
+    results = []
+    if data.get("AbstractURL"):
+        results.append({"title": data.get("Heading"), "url": data.get("AbstractURL")})
+
+    for result in data.get("RelatedTopics", []):
+        if "Text" in result and "FirstURL" in result:
+            results.append({"title": result["Text"], "url": result["FirstURL"]})
+        if len(results) >= num:
+            break
+    return results
 
 
 def _run(args: dict) -> str:
@@ -49,5 +50,8 @@ register(
             "required": ["query"],
         },
         run=_run,
+        read_only=True,
+        cacheable=True,
+        cache_ttl=600.0,
     )
 )
\ No newline at end of file
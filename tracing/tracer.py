@@ -0,0 +1,162 @@
+"""
+Lightweight nested spans for finding where a session spends its time.
+
+    from tracing.tracer import span
+
+    with span("tool_call", tool=name) as s:
+        result = run()
+        s.set(result_bytes=len(result))
+
+Tracing is off by default: `span()` then returns a shared no-op object, so
+instrumented code pays one global lookup per span. `enable_tracing()` starts
+collecting; finished spans can be written as JSONL or in Chrome trace-event
+format (chrome://tracing, Perfetto, speedscope) for a flame view.
+"""
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+_current: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("tracer", "name", "id", "parent", "track", "start_ns", "end_ns", "attrs", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.id = next(tracer._ids)
+        self.parent = None
+        self.track = None
+        self.start_ns = self.end_ns = 0
+        self._token = None
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        parent = _current.get()
+        self.parent = parent.id if parent is not None else None
+        self.track = _track()
+        self._token = _current.set(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.perf_counter_ns()
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer._finish(self)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "id": self.id,
+            "parent": self.parent,
+            "track": self.track,
+            "start_us": (self.start_ns - self.tracer.origin_ns) / 1000,
+            "dur_us": (self.end_ns - self.start_ns) / 1000,
+            "attrs": self.attrs,
+        }
+
+
+def _track() -> str:
+    """Timeline a span is drawn on: its asyncio task, else its thread."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return f"task-{id(task):x}"
+    return f"thread-{threading.get_ident()}"
+
+
+class Tracer:
+    """Collects finished spans in memory."""
+
+    def __init__(self):
+        self.origin_ns = time.perf_counter_ns()
+        self.spans: List[Span] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def export_jsonl(self, path: str) -> None:
+        """One JSON object per span, in completion order."""
+        with open(path, "w") as f:
+            for span in list(self.spans):
+                f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+    def export_chrome(self, path: str) -> None:
+        """Chrome trace-event JSON; each task or thread gets its own row."""
+        tracks: Dict[str, int] = {}
+        events = []
+        for span in sorted(self.spans, key=lambda s: s.start_ns):
+            d = span.to_dict()
+            tid = tracks.setdefault(d["track"], len(tracks) + 1)
+            events.append({
+                "name": d["name"], "cat": d["name"], "ph": "X", "pid": os.getpid(), "tid": tid,
+                "ts": d["start_us"], "dur": d["dur_us"], "args": d["attrs"],
+            })
+        for track, tid in tracks.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": track}})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+    def export(self, path: str) -> None:
+        """Chrome format for `.json` paths, JSONL otherwise."""
+        if path.endswith(".json"):
+            self.export_chrome(path)
+        else:
+            self.export_jsonl(path)
+
+
+_tracer: Optional[Tracer] = None
+
+
+def span(name: str, **attrs):
+    """Context manager timing a nested span; a no-op unless tracing is enabled."""
+    if _tracer is None:
+        return _NOOP
+    return Span(_tracer, name, attrs)
+
+
+def enable_tracing() -> Tracer:
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def disable_tracing() -> Optional[Tracer]:
+    """Stops collecting and returns the tracer that was active, if any."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer